@@ -0,0 +1,290 @@
+# -*- coding: utf-8 -*-
+# /////////////////////////////////////////////////////////////////////////////
+# //
+# // artwork.py
+# //
+# // cover art normalization engine. Decides from the image header if a
+# // cover has to be resized, and resizes it on a process pool using the
+# // JPEG draft mode (reduced decoding) so big covers are never fully decoded.
+# // Results are cached by content (hash of the original cover + settings)
+# // in memory (LRU) and, optionally, on disk.
+# //
+# // 18/10/2026 12:37:52
+# // (c) 2026 Juan M. Casillas <juanm.casillas@gmail.com>
+# //
+# /////////////////////////////////////////////////////////////////////////////
+
+import os
+import time
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from io import BytesIO
+from walker import walk_files
+# PIL and the process pool are imported when a cover is read (or the pool
+# started): most commands never touch one
+
+MAX_IMG_SZ = (450, 450)
+MAX_DPI = (72, 72)
+QUALITY = 50
+
+# normalize results
+SKIP = "skip"
+RESIZE = "resize"
+INVALID = "invalid"
+
+
+def read_header(data):
+    "return the image (only the header is read) or None if it's not a valid image"
+    from PIL import Image
+    try:
+        return Image.open(BytesIO(data))
+    except Exception:
+        return None
+
+
+def needs_resize(im, max_size=MAX_IMG_SZ):
+    width, height = im.size
+    max_width, max_height = max_size
+    return width > max_width or height > max_height
+
+
+def resize_cover(data, max_size=MAX_IMG_SZ, dpi=MAX_DPI, quality=QUALITY):
+    "resize the cover to fit in max_size, return (jpeg bytes or None if invalid, elapsed seconds)"
+    from PIL import Image
+    t0 = time.perf_counter()
+    try:
+        im = Image.open(BytesIO(data))
+        # JPEG can be decoded at 1/2, 1/4 or 1/8 scale, keeping at least max_size.
+        im.draft('RGB', max_size)
+        im.thumbnail(max_size, Image.LANCZOS)
+        im = im.convert('RGB')
+        img_bytes = BytesIO()
+        im.save(img_bytes, format='JPEG', dpi=dpi, optimize=True, quality=quality)
+        result = img_bytes.getvalue()
+    except Exception:
+        # header is fine, but the data is broken
+        result = None
+    return result, time.perf_counter() - t0
+
+
+class ArtworkCache:
+    "resized covers by content: in memory LRU, plus an optional directory on disk"
+
+    MEMORY_LIMIT = 32 * 1024 * 1024
+    # bytes of the key, the record and the LRU node: the SKIP and INVALID entries (no data) count too
+    ENTRY_OVERHEAD = 256
+
+    def __init__(self, memory_limit=MEMORY_LIMIT, cache_dir=None, disk_limit=None):
+        self.lock = threading.Lock()
+        self.memory_limit = memory_limit
+        self.memory_used = 0
+        self.entries = OrderedDict()
+        self.cache_dir = cache_dir
+        self.disk_limit = disk_limit
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if cache_dir and not os.path.exists(cache_dir):
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, data, max_size, dpi, quality):
+        h = hashlib.sha1(data)
+        h.update(("%s|%s|%s" % (tuple(max_size), tuple(dpi), quality)).encode('utf-8'))
+        return h.hexdigest()
+
+    def disk_file(self, key, status):
+        ext = ".jpg" if status == RESIZE else ".%s" % status
+        return os.path.join(self.cache_dir, key[:2], key + ext)
+
+    def get(self, key):
+        "return (status, data) or None"
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry
+
+        entry = self.get_disk(key)
+        if entry:
+            self.put(key, *entry, disk=False)
+            self.disk_hits += 1
+            return entry
+
+        with self.lock:
+            self.misses += 1
+        return None
+
+    def get_disk(self, key):
+        if not self.cache_dir:
+            return None
+        for status in (RESIZE, SKIP, INVALID):
+            fname = self.disk_file(key, status)
+            try:
+                with open(fname, "rb") as fd:
+                    data = fd.read() if status == RESIZE else None
+            except OSError:
+                continue
+            # mark it as used, for the eviction
+            os.utime(fname)
+            return status, data
+        return None
+
+    def entry_size(self, data):
+        return self.ENTRY_OVERHEAD + (len(data) if data else 0)
+
+    def put(self, key, status, data, disk=True):
+        size = self.entry_size(data)
+        with self.lock:
+            if key not in self.entries and size <= self.memory_limit:
+                self.entries[key] = (status, data)
+                self.memory_used += size
+                while self.memory_used > self.memory_limit:
+                    _, (_, old) = self.entries.popitem(last=False)
+                    self.memory_used -= self.entry_size(old)
+
+        if disk and self.cache_dir:
+            fname = self.disk_file(key, status)
+            if not os.path.exists(fname):
+                os.makedirs(os.path.dirname(fname), exist_ok=True)
+                fd, tmp = tempfile.mkstemp(dir=os.path.dirname(fname))
+                with os.fdopen(fd, "wb") as f:
+                    if data:
+                        f.write(data)
+                os.replace(tmp, fname)
+
+    def evict_disk(self):
+        "remove the least recently used files until the disk cache fits in disk_limit"
+        if not self.cache_dir or not self.disk_limit:
+            return 0
+        files = []
+        total = 0
+        for record in walk_files(self.cache_dir, stat=True):
+            files.append((record.mtime_ns, record.size, record.path))
+            total += record.size
+        files.sort()
+        removed = 0
+        for mtime, size, fname in files:
+            if total <= self.disk_limit:
+                break
+            os.remove(fname)
+            total -= size
+            removed += 1
+        return removed
+
+
+class ArtworkStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = { SKIP: 0, RESIZE: 0, INVALID: 0 }
+        self.cached = 0
+        self.timed = 0
+        self.elapsed = 0.0
+        self.max_elapsed = 0.0
+        self.min_elapsed = None
+
+    def add(self, status, elapsed=0.0, cached=False):
+        with self.lock:
+            self.counts[status] += 1
+            if cached:
+                self.cached += 1
+                return
+            if status == RESIZE:
+                self.timed += 1
+                self.elapsed += elapsed
+                self.max_elapsed = max(self.max_elapsed, elapsed)
+                if self.min_elapsed is None or elapsed < self.min_elapsed:
+                    self.min_elapsed = elapsed
+
+    def __str__(self):
+        total = sum(self.counts.values())
+        resized = self.counts[RESIZE]
+        avg = (self.elapsed / self.timed) if self.timed else 0.0
+        return "artwork: %d images (%d from cache), %d resized, %d skipped, %d invalid; resize %.2fs total, %.1fms avg, %.1fms min, %.1fms max" % (
+            total, self.cached, resized, self.counts[SKIP], self.counts[INVALID],
+            self.elapsed, avg * 1000, (self.min_elapsed or 0.0) * 1000, self.max_elapsed * 1000)
+
+
+class ArtworkEngine:
+    "normalize covers. With jobs > 1 the resizes run in a process pool (PIL holds the GIL)"
+
+    def __init__(self, jobs=1, max_size=MAX_IMG_SZ, dpi=MAX_DPI, quality=QUALITY, cache=None):
+        self.jobs = jobs
+        self.max_size = tuple(max_size)
+        self.dpi = tuple(dpi)
+        self.quality = quality
+        self.stats = ArtworkStats()
+        # ArtworkCache, or None
+        self.cache = cache
+        # covers being normalized right now, so the same cover in other thread waits for it
+        self.lock = threading.Lock()
+        self.inflight = {}
+        # started on the first resize: most commands (and most runs) never resize a cover
+        self.executor = None
+
+    def normalize(self, data):
+        "returns (status, data): SKIP with None, RESIZE with the new jpeg, INVALID with None"
+        if not self.cache:
+            return self.process(data)
+
+        key = self.cache.key(data, self.max_size, self.dpi, self.quality)
+        while True:
+            entry = self.cache.get(key)
+            if entry:
+                self.stats.add(entry[0], cached=True)
+                return entry
+
+            with self.lock:
+                event = self.inflight.get(key)
+                if not event:
+                    event = self.inflight[key] = threading.Event()
+                    break
+            # someone else is resizing this cover, use its result
+            event.wait()
+
+        try:
+            status, result = self.process(data)
+            self.cache.put(key, status, result)
+        finally:
+            with self.lock:
+                del self.inflight[key]
+            event.set()
+        return status, result
+
+    def process(self, data):
+        im = read_header(data)
+        if im is None:
+            self.stats.add(INVALID)
+            return INVALID, None
+
+        if not needs_resize(im, self.max_size):
+            self.stats.add(SKIP)
+            return SKIP, None
+
+        if self.jobs > 1:
+            result, elapsed = self.pool().submit(resize_cover, data, self.max_size, self.dpi, self.quality).result()
+        else:
+            result, elapsed = resize_cover(data, self.max_size, self.dpi, self.quality)
+
+        if result is None:
+            self.stats.add(INVALID)
+            return INVALID, None
+
+        self.stats.add(RESIZE, elapsed)
+        return RESIZE, result
+
+    def pool(self):
+        with self.lock:
+            if not self.executor:
+                from concurrent.futures import ProcessPoolExecutor
+                self.executor = ProcessPoolExecutor(self.jobs)
+            return self.executor
+
+    def close(self):
+        if self.cache:
+            self.cache.evict_disk()
+        if self.executor:
+            self.executor.shutdown()
+            self.executor = None
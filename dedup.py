@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+# /////////////////////////////////////////////////////////////////////////////
+# //
+# // dedup.py
+# //
+# // fingerprint of the audio of a mp3: a hash of the bytes between the
+# // tags (ID3v2 at the start, APEv2 and ID3v1 at the end), so the same
+# // song exported with other tags, another cover or another name has the
+# // same one. The migrated copies (covers resized in the tag) keep the
+# // fingerprint of their source. Files are hashed on a thread pool: hashlib
+# // releases the GIL on big buffers, so the threads hash in parallel.
+# //
+# // 18/10/2026 23:52:17
+# // (c) 2026 Juan M. Casillas <juanm.casillas@gmail.com>
+# //
+# /////////////////////////////////////////////////////////////////////////////
+
+import os
+import struct
+import hashlib
+from mp3_header import audio_offset
+
+CHUNK = 1024 * 1024
+ID3V1_SIZE = 128
+APE_FOOTER_SIZE = 32
+
+
+def audio_range(fd, size):
+    "(start, end) of the audio of the open mp3 fd of size bytes"
+    start = audio_offset(fd)
+    fd.seek(start)
+    if fd.read(3) == b"3DI":
+        # footer of the last ID3v2 tag
+        start += 10
+
+    end = size
+    if end - start >= ID3V1_SIZE:
+        fd.seek(end - ID3V1_SIZE)
+        if fd.read(3) == b"TAG":
+            end -= ID3V1_SIZE
+    if end - start >= APE_FOOTER_SIZE:
+        fd.seek(end - APE_FOOTER_SIZE)
+        footer = fd.read(APE_FOOTER_SIZE)
+        if footer[:8] == b"APETAGEX":
+            # the size counts the items and the footer, the flags tell if there's also a header
+            version, tag_size, items, flags = struct.unpack("<IIII", footer[8:24])
+            if flags & 0x80000000:
+                tag_size += APE_FOOTER_SIZE
+            if tag_size <= end - start:
+                end -= tag_size
+    return start, max(start, end)
+
+
+def audio_hash(fname):
+    "hex fingerprint of the audio of fname"
+    h = hashlib.blake2b(digest_size=16)
+    with open(fname, "rb") as fd:
+        start, end = audio_range(fd, os.fstat(fd.fileno()).st_size)
+        fd.seek(start)
+        left = end - start
+        while left > 0:
+            chunk = fd.read(min(CHUNK, left))
+            if not chunk:
+                break
+            h.update(chunk)
+            left -= len(chunk)
+    return h.hexdigest()
+
+
+def safe_audio_hash(fname):
+    "audio_hash, or None if the file can't be read"
+    try:
+        return audio_hash(fname)
+    except OSError:
+        return None
+
+
+def audio_hashes(files, jobs=1):
+    "generator of (file, audio_hash or None) of the files, in order, hashed on jobs threads"
+    if jobs <= 1:
+        for fname in files:
+            yield fname, safe_audio_hash(fname)
+        return
+    # only then: concurrent.futures is slow to import
+    from concurrent.futures import ThreadPoolExecutor
+    files = list(files)
+    with ThreadPoolExecutor(jobs) as pool:
+        yield from zip(files, pool.map(safe_audio_hash, files))
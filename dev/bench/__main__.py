@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+# /////////////////////////////////////////////////////////////////////////////
+# //
+# // __main__.py
+# //
+# // benchmark suite: builds (or reuses) a synthetic library, runs the
+# // commands of gen_playlist_jam.py end to end against a fresh jam, one
+# // process each, and writes the time, peak RSS, stages and counters of
+# // each (from --metrics-json) to a JSON file. The results are compared with a stored run (baseline.json,
+# // or --baseline) and the slower steps reported (exit code 1).
+# //
+# // usage: python3 dev/bench [--tracks N] [--library DIR] [--jobs N] [--runs N]
+# //                          [--out results.json] [--baseline file.json]
+# //                          [--save-baseline file.json]
+# //
+# // 18/10/2026 20:34:12
+# // (c) 2026 Juan M. Casillas <juanm.casillas@gmail.com>
+# //
+# /////////////////////////////////////////////////////////////////////////////
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.abspath(os.path.join(BENCH_DIR, "..", ".."))
+SCRIPT = os.path.join(ROOT, "gen_playlist_jam.py")
+BASELINE = os.path.join(BENCH_DIR, "baseline.json")
+sys.path.insert(0, BENCH_DIR)
+from library import build_library
+
+# slower than the baseline by more than this fraction, and by more than MIN_SECONDS, is a regression
+THRESHOLD = 0.2
+MIN_SECONDS = 0.1
+
+
+def steps(library, work, jobs):
+    "(name, arguments) of each step, in order: each one works on the jam the previous ones left"
+    parallel = [ "--jobs", str(jobs) ] if jobs > 1 else []
+    return [
+        ("migrate", [ "migrate", os.path.join(library, "all.m3u8"), "all" ] + parallel + (["--io-jobs", "2"] if jobs > 1 else [])),
+        ("migrate (on device)", [ "migrate", os.path.join(library, "favorites.m3u8"), "favorites" ]),
+        ("list_songs", [ "list_songs" ]),
+        ("list_playlists", [ "list_playlists" ]),
+        ("list_playlists all", [ "list_playlists", "all" ]),
+        ("process", [ "process", ".", "everything" ] + parallel),
+        ("process (cached)", [ "process", ".", "everything" ] + parallel),
+        ("revert", [ "revert", "all" ]),
+        ("convert", [ "convert", "all" ] + parallel),
+        ("export", [ "export", "favorites", os.path.join(work, "export") ]),
+    ]
+
+
+def git_commit():
+    try:
+        return subprocess.run([ "git", "rev-parse", "--short", "HEAD" ], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_step(name, arguments, jam, work, env):
+    out_file = os.path.join(work, "metrics.json")
+    argv = [ sys.executable, SCRIPT, "--jam-root", jam, "--cache-file", os.path.join(work, "tags.sqlite"),
+             "--metrics-json", out_file ] + arguments
+    t0 = time.perf_counter()
+    proc = subprocess.run(argv, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    seconds = time.perf_counter() - t0
+    if proc.returncode:
+        raise ValueError("step %s failed (%d): %s" % (name, proc.returncode, proc.stderr.strip()))
+    with open(out_file) as fd:
+        result = json.load(fd)
+    result['argv'] = arguments
+    # the command only; seconds is with the interpreter start and the imports, as the user sees it
+    result['script_seconds'] = result['seconds']
+    result['seconds'] = seconds
+    return result
+
+
+def run_suite(library, work, jobs=1):
+    "run the steps once, on a new jam in work"
+    jam = os.path.join(work, "jam")
+    for directory in ("Music", "Playlists"):
+        os.makedirs(os.path.join(jam, directory))
+    env = dict(os.environ)
+    # index snapshots and covers on disk, out of the user cache
+    env['XDG_CACHE_HOME'] = os.path.join(work, "cache")
+
+    return { name: run_step(name, arguments, jam, work, env) for name, arguments in steps(library, work, jobs) }
+
+
+def best_of(library, tmp, jobs=1, runs=1):
+    "run the suite runs times and keep the fastest run of each step (the others are noise)"
+    best = {}
+    for run in range(runs):
+        work = os.path.join(tmp, "work-%d" % run)
+        for name, result in run_suite(library, work, jobs).items():
+            if name not in best or result['seconds'] < best[name]['seconds']:
+                best[name] = result
+        shutil.rmtree(work, ignore_errors=True)
+
+    for name, result in best.items():
+        stages = sorted(result['stages'].items(), key=lambda item: -item[1]['seconds'])
+        print("%-22s %8.2fs %8.1f MB   %s" % (name, result['seconds'], result['rss_mb'] or 0.0,
+              ", ".join("%s %.2fs" % (stage, data['seconds']) for stage, data in stages[:4])))
+    return best
+
+
+def compare(results, baseline, threshold=THRESHOLD, min_seconds=MIN_SECONDS):
+    "print the steps against the baseline, return the names of the slower ones"
+    for key in ('tracks', 'seed', 'jobs'):
+        if baseline['meta'].get(key) != results['meta'][key]:
+            print("Warning: %s is %s in the baseline and %s in this run, not comparing them" % (
+                key, baseline['meta'].get(key), results['meta'][key]))
+            return []
+    print("%-22s %10s %10s %8s" % ("step", "baseline", "now", "change"))
+    regressions = []
+    for name, result in results['results'].items():
+        base = baseline['results'].get(name)
+        if not base:
+            print("%-22s %10s %9.2fs" % (name, "-", result['seconds']))
+            continue
+        change = (result['seconds'] - base['seconds']) / base['seconds'] if base['seconds'] else 0.0
+        slower = change > threshold and result['seconds'] - base['seconds'] > min_seconds
+        print("%-22s %9.2fs %9.2fs %+7.0f%%%s" % (name, base['seconds'], result['seconds'], change * 100,
+                                                 "  REGRESSION" if slower else ""))
+        if slower:
+            regressions.append(name)
+            # where the time went
+            for stage, data in sorted(result['stages'].items()):
+                before = base['stages'].get(stage, {}).get('seconds', 0.0)
+                if data['seconds'] - before > min_seconds:
+                    print("    %-18s %9.2fs %9.2fs" % (stage, before, data['seconds']))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tracks", help="tracks of the synthetic library (e.g. 1000, 10000, 100000) (default 1000)", type=int, default=1000)
+    parser.add_argument("--seed", help="random seed of the library (default 1)", type=int, default=1)
+    parser.add_argument("--library", help="build (or reuse) the library in this directory, instead of a temporary one", default=None)
+    parser.add_argument("--jobs", help="--jobs of migrate, process and convert (default 1)", type=int, default=1)
+    parser.add_argument("--runs", help="run the suite this many times, the best time of each step counts (default 3)", type=int, default=3)
+    parser.add_argument("--out", help="write the results to this JSON file", default=None)
+    parser.add_argument("--baseline", help="compare with this results file (default %s, if it exists)" % os.path.relpath(BASELINE), default=None)
+    parser.add_argument("--save-baseline", help="store the results as the baseline in this file", default=None)
+    parser.add_argument("--threshold", help="slower by this fraction is a regression (default %.2f)" % THRESHOLD, type=float, default=THRESHOLD)
+    opts = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="playlists-bench-")
+    try:
+        library = os.path.abspath(opts.library or os.path.join(tmp, "library"))
+        t0 = time.perf_counter()
+        description = build_library(library, opts.tracks, opts.seed)
+        print("library: %d tracks, %d bytes in %s (%.1fs)" % (opts.tracks, description['counts']['bytes'], library,
+                                                             time.perf_counter() - t0))
+        results = {
+            'meta': {
+                'tracks': opts.tracks,
+                'seed': opts.seed,
+                'jobs': opts.jobs,
+                'runs': opts.runs,
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'cpus': os.cpu_count(),
+                'commit': git_commit(),
+                'date': time.strftime("%Y-%m-%d %H:%M:%S"),
+                'library': description['counts']
+            },
+            'results': best_of(library, tmp, opts.jobs, opts.runs)
+        }
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    for fname in (opts.out, opts.save_baseline):
+        if fname:
+            with open(fname, "w") as fd:
+                json.dump(results, fd, indent=1)
+            print("results written to %s" % fname)
+
+    baseline = opts.baseline or (BASELINE if os.path.exists(BASELINE) and not opts.save_baseline else None)
+    if baseline:
+        with open(baseline) as fd:
+            regressions = compare(results, json.load(fd), opts.threshold)
+        if regressions:
+            print("%d steps slower than %s: %s" % (len(regressions), baseline, ", ".join(regressions)))
+            sys.exit(1)
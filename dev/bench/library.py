@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+# /////////////////////////////////////////////////////////////////////////////
+# //
+# // library.py
+# //
+# // synthetic music library for the benchmarks: tiny but valid mp3 files
+# // (MPEG1 and MPEG2 layer 3 frames), ID3 tags with all, some or none of
+# // the fields, covers of different sizes and formats (and broken ones),
+# // and iTunes (mac) style m3u8 playlists pointing to them. Same seed,
+# // same library.
+# //
+# // usage: python3 dev/bench/library.py target_dir [--tracks N] [--seed S]
+# //
+# // 18/10/2026 19:58:20
+# // (c) 2026 Juan M. Casillas <juanm.casillas@gmail.com>
+# //
+# /////////////////////////////////////////////////////////////////////////////
+
+import os
+import json
+import random
+import argparse
+from io import BytesIO
+from PIL import Image, ImageFilter
+from mutagen.id3 import ID3, TIT2, TPE1, TALB, TCON, APIC
+
+TRACKS_PER_ALBUM = 10
+ALBUMS_PER_ARTIST = 5
+# distinct images of each kind of cover, shared by the albums
+COVER_VARIANTS = 16
+LIBRARY_FILE = ".bench-library.json"
+
+# (first header bytes, frame length): MPEG1 128kbps 44.1kHz and MPEG2 64kbps 22.05kHz, no padding
+FRAMES = {
+    'mpeg1': (b"\xff\xfb\x90\x00", 417),
+    'mpeg2': (b"\xff\xf3\x80\x00", 208)
+}
+
+# kind of cover: weight. The device wants them up to 450x450 jpeg
+COVERS = {
+    'none': 20,
+    'small jpeg': 25,
+    'big jpeg': 25,
+    'png': 10,
+    'big png': 8,
+    'corrupt': 6,
+    'truncated jpeg': 6
+}
+
+# ID3 fields of each track: weight
+TAGS = {
+    'full': 50,
+    'id3v2.3': 10,
+    'no album': 10,
+    'no genre': 10,
+    'title only': 10,
+    'no tag': 5,
+    'empty tag': 5
+}
+
+GENRES = ["Rock", "Pop", "Electronic", "Jazz", "Classical", "Hip-Hop", "Folk", "Metal"]
+
+
+def pick(rnd, weights):
+    return rnd.choices(list(weights.keys()), list(weights.values()))[0]
+
+
+def mp3_audio(rnd):
+    "(audio, seconds): a few valid frames of silence, half a second to two seconds"
+    header, length = FRAMES['mpeg1' if rnd.random() < 0.8 else 'mpeg2']
+    frame = header + b"\x00" * (length - len(header))
+    frames = rnd.randint(20, 80)
+    # 1152 samples at 44.1kHz, or 576 at 22.05kHz
+    return frame * frames, frames * 1152 / 44100.0
+
+
+def image(rnd, size, fmt):
+    "blurred blocks of color: 10-100KB, about what the covers in a real library take"
+    img = Image.new("RGB", (size, size), tuple(rnd.randint(0, 255) for i in range(3)))
+    block = max(8, size // 8)
+    for x in range(0, size, block):
+        for y in range(0, size, block):
+            img.paste(tuple(rnd.randint(0, 255) for i in range(3)), (x, y, x + block, y + block))
+    img = img.filter(ImageFilter.GaussianBlur(size / 100.0))
+    data = BytesIO()
+    img.save(data, format=fmt, quality=85)
+    return data.getvalue()
+
+
+def make_cover(rnd, kind):
+    "(mime, data) of a cover of this kind"
+    if kind == 'small jpeg':
+        return "image/jpeg", image(rnd, rnd.randint(200, 450), "JPEG")
+    if kind == 'big jpeg':
+        return "image/jpeg", image(rnd, rnd.randint(800, 1600), "JPEG")
+    if kind == 'png':
+        return "image/png", image(rnd, rnd.randint(300, 600), "PNG")
+    if kind == 'big png':
+        return "image/png", image(rnd, rnd.randint(1000, 1500), "PNG")
+    if kind == 'corrupt':
+        return "image/jpeg", b"\xff\xd8\xff\xe0" + bytes(rnd.getrandbits(8) for i in range(2048))
+    if kind == 'truncated jpeg':
+        data = image(rnd, 900, "JPEG")
+        return "image/jpeg", data[:len(data) // 3]
+    return None, None
+
+
+def make_tags(profile, title, artist, album, genre, cover):
+    "the ID3 tag of a track, or None (no tag at all)"
+    if profile == 'no tag':
+        return None
+    tags = ID3()
+    if profile == 'empty tag':
+        return tags
+    tags.add(TIT2(encoding=3, text=title))
+    if profile != 'title only':
+        tags.add(TPE1(encoding=3, text=artist))
+        if profile != 'no album':
+            tags.add(TALB(encoding=3, text=album))
+        if profile != 'no genre':
+            tags.add(TCON(encoding=3, text=genre))
+    mime, data = cover
+    if data:
+        # as iTunes writes them (no description), the key fix_artwork looks for
+        tags.add(APIC(encoding=3, mime=mime, type=3, desc=u'', data=data))
+    return tags
+
+
+def write_playlist(fname, tracks):
+    "as iTunes exports them on a mac: \\r, absolute paths"
+    with open(fname, "w", encoding='utf-8', newline='') as fd:
+        fd.write("#EXTM3U\r")
+        for path, title, artist, duration in tracks:
+            fd.write("#EXTINF:%d,%s - %s\r" % (duration, title, artist))
+            fd.write("%s\r" % path)
+
+
+def build_library(root, tracks=1000, seed=1, verbose=False):
+    """write the library in root (Music/ and the playlists) and return its description.
+    Reused if root already has the same one"""
+    root = os.path.abspath(root)
+    description_file = os.path.join(root, LIBRARY_FILE)
+    if os.path.exists(description_file):
+        with open(description_file) as fd:
+            description = json.load(fd)
+        if description['tracks'] == tracks and description['seed'] == seed:
+            return description
+
+    rnd = random.Random(seed)
+    covers = {}
+    for kind in COVERS.keys():
+        covers[kind] = [ make_cover(rnd, kind) for i in range(COVER_VARIANTS if kind != 'none' else 1) ]
+
+    music = os.path.join(root, "Music")
+    songs = []
+    counts = {'covers': dict.fromkeys(COVERS.keys(), 0), 'tags': dict.fromkeys(TAGS.keys(), 0), 'bytes': 0}
+    album_cover = album_kind = None
+    for i in range(tracks):
+        album_id = i // TRACKS_PER_ALBUM
+        artist = "Artist %d" % (album_id // ALBUMS_PER_ARTIST)
+        # some names the mac stores decomposed
+        album = ("Álbum %d" if album_id % 7 == 0 else "Album %d") % album_id
+        if i % TRACKS_PER_ALBUM == 0:
+            album_dir = os.path.join(music, artist, album)
+            os.makedirs(album_dir, exist_ok=True)
+            album_kind = pick(rnd, COVERS)
+            album_cover = rnd.choice(covers[album_kind])
+            genre = rnd.choice(GENRES)
+            if verbose and album_id % 100 == 0:
+                print("%d tracks" % i)
+        number = i % TRACKS_PER_ALBUM + 1
+        title = ("Canción %d" if i % 11 == 0 else "Song %d") % i
+        fname = os.path.join(album_dir, "%02d - %s.mp3" % (number, title))
+
+        audio, duration = mp3_audio(rnd)
+        profile = pick(rnd, TAGS)
+        tags = make_tags(profile, title, artist, album, genre, album_cover)
+        with open(fname, "wb") as fd:
+            fd.write(audio)
+        if tags is not None:
+            tags.save(fname, v2_version=3 if profile == 'id3v2.3' else 4)
+
+        counts['covers'][album_kind] += 1
+        counts['tags'][profile] += 1
+        counts['bytes'] += os.path.getsize(fname)
+        songs.append((fname, title, artist, duration))
+
+    playlists = {
+        'all': songs,
+        'favorites': [ s for s in songs if rnd.random() < 0.2 ],
+        'running': [ s for s in songs if rnd.random() < 0.1 ],
+    }
+    for name, items in playlists.items():
+        write_playlist(os.path.join(root, "%s.m3u8" % name), items)
+
+    description = {
+        'tracks': tracks,
+        'seed': seed,
+        'music': music,
+        'playlists': { name: len(items) for name, items in playlists.items() },
+        'counts': counts
+    }
+    with open(description_file, "w") as fd:
+        json.dump(description, fd, indent=1)
+    return description
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("target", help="directory of the library")
+    parser.add_argument("--tracks", help="number of tracks (default 1000)", type=int, default=1000)
+    parser.add_argument("--seed", help="random seed (default 1)", type=int, default=1)
+    opts = parser.parse_args()
+
+    print(json.dumps(build_library(opts.target, opts.tracks, opts.seed, verbose=True), indent=1))
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+# /////////////////////////////////////////////////////////////////////////////
+# //
+# // bench_m3u.py
+# //
+# // parse time and memory of a big playlist: m3u8.load (the HLS parser
+# // read_playlist used) vs the m3u reader, streamed and as a list. Also
+# // the time to write it back with write_m3u.
+# //
+# // usage: python3 dev/bench_m3u.py [entries]
+# //
+# // 18/10/2026 17:05:44
+# // (c) 2026 Juan M. Casillas <juanm.casillas@gmail.com>
+# //
+# /////////////////////////////////////////////////////////////////////////////
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from m3u import read_m3u, write_m3u
+
+
+def build_playlist(fname, entries, newline):
+    "same shape as the iTunes exports (mac: \\r) and the jam playlists (\\r\\n)"
+    with open(fname, "w", encoding='utf-8', newline='') as fd:
+        fd.write("#EXTM3U" + newline)
+        for i in range(entries):
+            fd.write("#EXTINF:%d,Canción %d - Artist %d%s" % (180 + i % 120, i, i // 10, newline))
+            fd.write("/Users/me/Music/iTunes/iTunes Media/Music/Artist %d/Album %d/%05d Canción.mp3%s" % (i // 10, i // 10, i, newline))
+
+
+def measure(label, parse):
+    # timed without tracemalloc, it slows the allocations a lot
+    t0 = time.perf_counter()
+    count = parse()
+    elapsed = time.perf_counter() - t0
+    tracemalloc.start()
+    parse()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print("%-28s %8d entries %8.3fs %10.1f MB peak" % (label, count, elapsed, peak / (1024 * 1024)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("entries", help="number of entries", type=int, nargs="?", default=100000)
+    opts = parser.parse_args()
+
+    try:
+        import m3u8
+    except ImportError:
+        m3u8 = None
+        print("m3u8 is not installed, only the m3u reader is measured")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, newline in (("itunes mac (\\r)", "\r"), ("jam (\\r\\n)", "\r\n")):
+            fname = os.path.join(tmp, "bench.m3u8")
+            build_playlist(fname, opts.entries, newline)
+            print("%s: %d entries, %d bytes" % (name, opts.entries, os.path.getsize(fname)))
+            if m3u8:
+                measure("m3u8.load", lambda: len(m3u8.load(fname).segments))
+            measure("read_m3u (list)", lambda: len(list(read_m3u(fname))))
+            measure("read_m3u (streamed)", lambda: sum(1 for entry in read_m3u(fname)))
+            target = os.path.join(tmp, "out.m3u")
+            measure("read_m3u + write_m3u", lambda: write_m3u(target, read_m3u(fname)))
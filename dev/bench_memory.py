@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+# /////////////////////////////////////////////////////////////////////////////
+# //
+# // bench_memory.py
+# //
+# // peak RSS of a big playlist: entries as dicts (before track.Track),
+# // as a list of Tracks, and streamed from the reader (or the directory
+# // walk of process) to the writer. Each case runs in its own process.
+# //
+# // usage: python3 dev/bench_memory.py [entries] [--files N]
+# //
+# // 18/10/2026 19:31:08
+# // (c) 2026 Juan M. Casillas <juanm.casillas@gmail.com>
+# //
+# /////////////////////////////////////////////////////////////////////////////
+
+import os
+import sys
+import time
+import argparse
+import resource
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from m3u import read_m3u, write_m3u
+from track import Track
+from mutagen.id3 import ID3, TIT2, TPE1
+
+# a short CBR mp3 (MPEG1 layer 3, 128kbps, 44.1kHz): 40 silent frames
+FRAME = b"\xff\xfb\x90\x00" + b"\x00" * 413
+
+
+def peak_rss():
+    "MB. Linux gives KB, mac bytes"
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        rss //= 1024
+    return rss / 1024.0
+
+
+def build_playlist(fname, entries):
+    with open(fname, "w", encoding='utf-8', newline='') as fd:
+        fd.write("#EXTM3U\r\n")
+        for i in range(entries):
+            fd.write("#EXTINF:%d, Artist %d - Song %d\r\n" % (180 + i % 120, i // 10, i))
+            fd.write("..\\Music\\Genre %d\\Artist %d\\Album %d\\%06d Song.mp3\r\n" % (i % 20, i // 10, i // 10, i))
+
+
+def build_tree(root, files):
+    music = os.path.join(root, "Music")
+    for i in range(files):
+        album = os.path.join(music, "Artist %d" % (i // 100), "Album %d" % (i // 10))
+        if i % 10 == 0:
+            os.makedirs(album, exist_ok=True)
+        fname = os.path.join(album, "%06d Song.mp3" % i)
+        with open(fname, "wb") as fd:
+            fd.write(FRAME * 40)
+        tags = ID3()
+        tags.add(TIT2(encoding=3, text="Song %d" % i))
+        tags.add(TPE1(encoding=3, text="Artist %d" % (i // 100)))
+        tags.save(fname)
+    os.makedirs(os.path.join(root, "Playlists"), exist_ok=True)
+
+
+def as_dict(track):
+    # what read_playlist returned before track.Track
+    return { 'title': track.title, 'file': track.file, 'path': track.path, 'duration': track.duration }
+
+
+def from_dicts(entries):
+    # the writers take Tracks now
+    for d in entries:
+        yield Track(d['title'], d['file'], d['path'], d['duration'])
+
+
+def run_case(case, source, target):
+    if case == "baseline":
+        return 0
+    if case == "m3u dicts":
+        return write_m3u(target, from_dicts([ as_dict(t) for t in read_m3u(source) ]))
+    if case == "m3u Tracks":
+        return write_m3u(target, list(read_m3u(source)))
+    if case == "m3u streamed":
+        return write_m3u(target, read_m3u(source))
+
+    import gen_playlist_jam
+    pm = gen_playlist_jam.PlayListManager(verbose=0)
+    pm.check_platform(source)
+    pm.use_manifest = False
+    if case == "process baseline":
+        return 0
+    if case == "process dicts":
+        return pm.store_playlist(from_dicts([ as_dict(t) for t in pm.build_playlist_from_directory(".") ]), "bench")
+    if case == "process Tracks":
+        return pm.store_playlist(list(pm.build_playlist_from_directory(".")), "bench")
+    if case == "process streamed":
+        return pm.store_playlist(pm.build_playlist_from_directory("."), "bench")
+    raise ValueError("unknown case %s" % case)
+
+
+def measure(case, source, target):
+    out = subprocess.run([sys.executable, os.path.abspath(__file__), "--case", case, source, target],
+                         check=True, capture_output=True, text=True).stdout
+    count, elapsed, rss = out.split()
+    return int(count), float(elapsed), float(rss)
+
+
+def report(baseline, cases, source, target):
+    # the interpreter and the modules, before any entry
+    base = measure(baseline, source, target)[2]
+    for case in cases:
+        count, elapsed, rss = measure(case, source, target)
+        print("%-18s %8d entries %8.2fs %8.1f MB peak (%6.1f MB over the baseline)" % (case, count, elapsed, rss, rss - base))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("entries", help="entries of the playlist", type=int, nargs="?", default=200000)
+    parser.add_argument("--files", help="mp3 files for the process cases (0: skip them)", type=int, default=20000)
+    # case, source, target: run one case (in the child process)
+    parser.add_argument("--case", help=argparse.SUPPRESS, nargs=3, default=None)
+    opts = parser.parse_args()
+
+    if opts.case:
+        t0 = time.perf_counter()
+        count = run_case(*opts.case)
+        print(count, time.perf_counter() - t0, peak_rss())
+        sys.exit(0)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "bench.m3u")
+        build_playlist(source, opts.entries)
+        print("playlist: %d entries, %d bytes" % (opts.entries, os.path.getsize(source)))
+        report("baseline", ("m3u dicts", "m3u Tracks", "m3u streamed"), source, os.path.join(tmp, "out.m3u"))
+
+        if opts.files:
+            jam = os.path.join(tmp, "jam")
+            build_tree(jam, opts.files)
+            print("process: %d files (no tag cache)" % opts.files)
+            report("process baseline", ("process dicts", "process Tracks", "process streamed"), jam, "")
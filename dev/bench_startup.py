@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+# /////////////////////////////////////////////////////////////////////////////
+# //
+# // bench_startup.py
+# //
+# // startup time of each command of gen_playlist_jam.py on a tiny jam
+# // (a few songs, one playlist), so it's the interpreter, the imports and
+# // the setup that count. Each one runs with -X importtime: the time of
+# // the imports and the slowest modules are shown next to the total.
+# //
+# // usage: python3 dev/bench_startup.py [--runs N] [--out results.json]
+# //
+# // 18/10/2026 21:47:16
+# // (c) 2026 Juan M. Casillas <juanm.casillas@gmail.com>
+# //
+# /////////////////////////////////////////////////////////////////////////////
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from mutagen.id3 import ID3, TIT2, TPE1, TALB, TCON
+
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "gen_playlist_jam.py")
+# a short CBR mp3 (MPEG1 layer 3, 128kbps, 44.1kHz): 40 silent frames
+FRAME = b"\xff\xfb\x90\x00" + b"\x00" * 413
+SONGS = 5
+
+
+def build_jam(root):
+    "a jam with SONGS songs in Music (hashed dirs), and the same songs in a playlist outside, to migrate"
+    source = os.path.join(root, "source")
+    os.makedirs(source)
+    for directory in ("Music", "Playlists"):
+        os.makedirs(os.path.join(root, "jam", directory))
+    with open(os.path.join(source, "mix.m3u8"), "w", encoding='utf-8') as fd:
+        fd.write("#EXTM3U\n")
+        for i in range(SONGS):
+            fname = os.path.join(source, "%02d Song.mp3" % i)
+            with open(fname, "wb") as mp3:
+                mp3.write(FRAME * 40)
+            tags = ID3()
+            tags.add(TIT2(encoding=3, text="Song %d" % i))
+            tags.add(TPE1(encoding=3, text="Artist"))
+            tags.add(TALB(encoding=3, text="Album"))
+            tags.add(TCON(encoding=3, text="Rock"))
+            tags.save(fname)
+            # absolute, as iTunes writes them
+            fd.write("#EXTINF:1,Artist - Song %d\n%s\n" % (i, fname))
+    return os.path.join(root, "jam"), os.path.join(source, "mix.m3u8")
+
+
+def commands(source, work):
+    "(name, arguments): the listings first, the ones that read tags or copy after"
+    return [
+        ("--help", [ "--help" ]),
+        ("list_songs", [ "list_songs" ]),
+        ("list_playlists", [ "list_playlists" ]),
+        ("list_playlists mix", [ "list_playlists", "mix" ]),
+        ("verify", [ "verify" ]),
+        ("process", [ "process", ".", "startup" ]),
+        ("migrate (on device)", [ "migrate", source, "mix" ]),
+        ("export", [ "export", "mix", os.path.join(work, "export") ]),
+        ("revert + convert", None),
+    ]
+
+
+def import_times(stderr):
+    "(total us, [(us, module)] of the top level imports) from the -X importtime output"
+    top = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        fields = line.split("|")
+        # nested imports are indented
+        if not fields[2].startswith("  "):
+            top.append((int(fields[1]), fields[2].strip()))
+    return sum(us for us, name in top), sorted(top, reverse=True)
+
+
+def run(arguments, jam, work, env):
+    argv = [ sys.executable, "-X", "importtime", SCRIPT, "--jam-root", jam,
+             "--cache-file", os.path.join(work, "tags.sqlite") ] + arguments
+    t0 = time.perf_counter()
+    proc = subprocess.run(argv, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    seconds = time.perf_counter() - t0
+    if proc.returncode:
+        raise ValueError("%s failed (%d): %s" % (" ".join(arguments), proc.returncode, proc.stderr[-2000:]))
+    return seconds, import_times(proc.stderr)
+
+
+def measure(runs=5):
+    "best of runs of each command: {name: {seconds, imports, slowest}}"
+    results = {}
+    with tempfile.TemporaryDirectory() as work:
+        jam, source = build_jam(work)
+        env = dict(os.environ)
+        env['XDG_CACHE_HOME'] = os.path.join(work, "cache")
+        # the songs in the device, and its manifest, for the listings
+        run([ "migrate", source, "mix" ], jam, work, env)
+        run([ "reindex" ], jam, work, env)
+
+        for name, arguments in commands(source, work):
+            steps = [ [ "revert", "mix" ], [ "convert", "mix" ] ] if arguments is None else [ arguments ]
+            best = None
+            for i in range(runs):
+                seconds, imports, slowest = 0.0, 0, []
+                for step in steps:
+                    elapsed, (us, top) = run(step, jam, work, env)
+                    seconds += elapsed
+                    imports += us
+                    slowest = top
+                if best is None or seconds < best['seconds']:
+                    best = { 'seconds': seconds, 'imports': imports / 1e6, 'slowest': [ (module, us / 1e6) for us, module in slowest[:4] ] }
+            results[name] = best
+            print("%-22s %7.1fms  imports %6.1fms   %s" % (name, best['seconds'] * 1000, best['imports'] * 1000,
+                  ", ".join("%s %.1fms" % (module, seconds * 1000) for module, seconds in best['slowest'])))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", help="runs of each command, the best counts (default 5)", type=int, default=5)
+    parser.add_argument("--out", help="write the results to this JSON file", default=None)
+    opts = parser.parse_args()
+
+    # the interpreter alone, to compare with
+    t0 = time.perf_counter()
+    for i in range(opts.runs):
+        subprocess.run([ sys.executable, "-c", "pass" ], check=True)
+    print("%-22s %7.1fms" % ("python -c pass", (time.perf_counter() - t0) / opts.runs * 1000))
+
+    results = measure(opts.runs)
+    if opts.out:
+        with open(opts.out, "w") as fd:
+            json.dump(results, fd, indent=1)
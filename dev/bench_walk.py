@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+# /////////////////////////////////////////////////////////////////////////////
+# //
+# // bench_walk.py
+# //
+# // listing a music tree: the old list_dir (os.walk, join, relative_to,
+# // getsize) vs walker.walk_files, with and without stat, sorted and
+# // with directories listed ahead in threads.
+# //
+# // usage: python3 dev/bench_walk.py [files] [--root DIR]
+# //
+# // 18/10/2026 17:52:10
+# // (c) 2026 Juan M. Casillas <juanm.casillas@gmail.com>
+# //
+# /////////////////////////////////////////////////////////////////////////////
+
+import os
+import sys
+import time
+import pathlib
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from walker import walk_files
+
+EXTENSIONS = ('.mp3', )
+
+
+def build_tree(root, files):
+    "Genre/Artist/Album/NN - Song.mp3, plus a cover and a text file in each album"
+    albums = max(1, files // 12)
+    count = 0
+    for i in range(albums):
+        album = os.path.join(root, "Genre %d" % (i % 20), "Artist %d" % (i // 4), "Album %d" % i)
+        os.makedirs(album, exist_ok=True)
+        for name in ["%02d - Song %d.mp3" % (t, t) for t in range(10)] + ["cover.jpg", "notes.txt"]:
+            open(os.path.join(album, name), "w").close()
+            count += 1
+    return count
+
+
+def old_list_dir(directory, ext=None):
+    "list_dir before walker"
+    items = []
+    for path, dirc, files in os.walk(directory):
+        for name in files:
+            if ext and name.lower().endswith(ext):
+                full_fname = os.path.sep.join([path] + [name])
+                local_fname = pathlib.Path(full_fname).relative_to(directory)
+                items.append(local_fname)
+    return items
+
+
+def old_list_dir_sizes(directory, ext=None):
+    "what reindex did: list_dir, then join and getsize each file"
+    return [ os.path.getsize(os.path.join(directory, local_fname)) for local_fname in old_list_dir(directory, ext) ]
+
+
+def measure(label, walk, runs=3):
+    best = None
+    for i in range(runs):
+        t0 = time.perf_counter()
+        count = walk()
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    print("%-34s %8d files %8.3fs" % (label, count, best))
+
+
+def run(root):
+    measure("os.walk + relative_to (list_dir)", lambda: len(old_list_dir(root, EXTENSIONS)))
+    measure("  + getsize (reindex)", lambda: len(old_list_dir_sizes(root, EXTENSIONS)))
+    measure("walk_files", lambda: sum(1 for r in walk_files(root, EXTENSIONS)))
+    measure("walk_files sorted", lambda: sum(1 for r in walk_files(root, EXTENSIONS, sort=True)))
+    measure("walk_files stat", lambda: sum(1 for r in walk_files(root, EXTENSIONS, stat=True)))
+    measure("walk_files stat, 4 threads", lambda: sum(1 for r in walk_files(root, EXTENSIONS, stat=True, jobs=4)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("files", help="number of files in the synthetic tree", type=int, nargs="?", default=50000)
+    parser.add_argument("--root", help="walk this directory (e.g. the jam Music folder) instead", default=None)
+    opts = parser.parse_args()
+
+    if opts.root:
+        run(opts.root)
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            count = build_tree(tmp, opts.files)
+            print("%d files in %s" % (count, tmp))
+            run(tmp)
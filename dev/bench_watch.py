@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+# /////////////////////////////////////////////////////////////////////////////
+# //
+# // bench_watch.py
+# //
+# // cost of the watch command: CPU used while nothing changes (inotify and
+# // polling), and the time from a change (a song retagged, a playlist
+# // edited) to the end of its sync. Runs watch on the synthetic library of
+# // dev/bench (favorites and running playlists, its Music as --music).
+# // Linux only: the CPU time comes from /proc.
+# //
+# // usage: python3 dev/bench_watch.py [--tracks N] [--library DIR]
+# //                                   [--idle SECONDS] [--out results.json]
+# //
+# // 18/10/2026 23:31:05
+# // (c) 2026 Juan M. Casillas <juanm.casillas@gmail.com>
+# //
+# /////////////////////////////////////////////////////////////////////////////
+
+import os
+import sys
+import json
+import time
+import queue
+import signal
+import argparse
+import tempfile
+import threading
+import subprocess
+
+DEV_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRIPT = os.path.join(DEV_DIR, "..", "jam_cli.py")
+sys.path.insert(0, os.path.join(DEV_DIR, "bench"))
+from library import build_library
+from mutagen.id3 import ID3, TIT2, ID3NoHeaderError
+
+
+def cpu_seconds(pid):
+    "user + system CPU time of the process"
+    with open("/proc/%d/stat" % pid) as fd:
+        # the fields after the command name, that may have spaces
+        fields = fd.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def playlist_songs(playlist_file):
+    with open(playlist_file, encoding='utf-8') as fd:
+        return [ line for line in fd.read().splitlines() if line and not line.startswith("#") ]
+
+
+class Watch:
+    "the watch command running in a process, its output lines in a queue"
+
+    def __init__(self, library, work, poll=False):
+        jam = os.path.join(work, "jam")
+        for directory in ("Music", "Playlists"):
+            os.makedirs(os.path.join(jam, directory), exist_ok=True)
+        argv = [ sys.executable, "-u", SCRIPT, "--jam-root", jam, "--progress", "none",
+                 "--cache-file", os.path.join(work, "tags.sqlite"), "watch",
+                 os.path.join(library, "favorites.m3u8"), os.path.join(library, "running.m3u8"),
+                 "--music", os.path.join(library, "Music") ]
+        if poll:
+            argv.append("--poll")
+        self.proc = subprocess.Popen(argv, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+        self.lines = queue.Queue()
+        threading.Thread(target=self.read, daemon=True).start()
+
+    def read(self):
+        for line in self.proc.stdout:
+            self.lines.put(line)
+
+    def wait_for(self, prefix, timeout=600):
+        "seconds until a line starting with prefix is printed"
+        t0 = time.perf_counter()
+        while True:
+            try:
+                line = self.lines.get(timeout=max(0, timeout - (time.perf_counter() - t0)))
+            except queue.Empty:
+                raise ValueError("watch didn't print %s in %ds" % (prefix, timeout))
+            if line.startswith(prefix):
+                return time.perf_counter() - t0
+
+    def stop(self):
+        self.proc.send_signal(signal.SIGINT)
+        self.proc.wait(60)
+
+
+def measure(library, idle=30.0):
+    "{mode: {idle cpu %, retag seconds, playlist seconds, initial sync seconds}}"
+    results = {}
+    favorites = os.path.join(library, "favorites.m3u8")
+    for mode in ("inotify", "poll"):
+        with tempfile.TemporaryDirectory() as work:
+            watch = Watch(library, work, poll=mode == "poll")
+            try:
+                initial = watch.wait_for("watching")
+                cpu0, t0 = cpu_seconds(watch.proc.pid), time.perf_counter()
+                time.sleep(idle)
+                cpu = (cpu_seconds(watch.proc.pid) - cpu0) / (time.perf_counter() - t0) * 100
+
+                # a song of favorites retagged: the copy on the device is replaced
+                song = playlist_songs(favorites)[0]
+                try:
+                    tags = ID3(song)
+                except ID3NoHeaderError:
+                    tags = ID3()
+                tags.add(TIT2(encoding=3, text="Retagged %s" % mode))
+                tags.save(song)
+                retag = watch.wait_for("sync:")
+
+                # the playlist edited (the last song dropped)
+                with open(favorites, encoding='utf-8', newline='') as fd:
+                    text = fd.read()
+                with open(favorites, "w", encoding='utf-8', newline='') as fd:
+                    fd.write(text[:text.rstrip("\r").rfind("#EXTINF")])
+                edit = watch.wait_for("sync:")
+                with open(favorites, "w", encoding='utf-8', newline='') as fd:
+                    fd.write(text)
+                watch.wait_for("sync:")
+            finally:
+                watch.stop()
+        results[mode] = { 'initial sync': initial, 'idle cpu %': cpu, 'retag': retag, 'playlist edit': edit }
+        print("%-8s initial sync %6.2fs  idle CPU %5.2f%%  retag -> synced %5.2fs  playlist edit -> synced %5.2fs" % (
+              mode, initial, cpu, retag, edit))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tracks", help="tracks of the library (default 1000)", type=int, default=1000)
+    parser.add_argument("--library", help="keep the library in this directory (it's modified: a song is retagged)", default=None)
+    parser.add_argument("--idle", help="seconds measuring the idle CPU (default 30)", type=float, default=30.0)
+    parser.add_argument("--out", help="write the results to this JSON file", default=None)
+    opts = parser.parse_args()
+
+    if not os.path.exists("/proc/self/stat"):
+        raise ValueError("bench_watch needs /proc (linux)")
+    with tempfile.TemporaryDirectory() as tmp:
+        library = opts.library or os.path.join(tmp, "library")
+        build_library(library, opts.tracks)
+        results = measure(library, opts.idle)
+    if opts.out:
+        with open(opts.out, "w") as fd:
+            json.dump(results, fd, indent=1)
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+# /////////////////////////////////////////////////////////////////////////////
+# //
+# // bench_write_once.py
+# //
+# // bytes written to the device by migrate, copy + rewrite on device vs
+# // transform-then-write-once. Linux only (uses /proc/self/io)
+# //
+# // usage: python3 dev/bench_write_once.py [tracks] [cover_size]
+# //
+# // 18/10/2026 11:20:05
+# // (c) 2026 Juan M. Casillas <juanm.casillas@gmail.com>
+# //
+# /////////////////////////////////////////////////////////////////////////////
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+from io import BytesIO
+from PIL import Image
+from mutagen.id3 import ID3, TIT2, TPE1, TALB, TCON, APIC
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import gen_playlist_jam
+from gen_playlist_jam import PlayListManager
+
+# one MPEG1 Layer III frame, 128kbps 44100Hz, no padding
+MP3_FRAME = b'\xff\xfb\x90\x00' + b'\x00' * 413
+
+
+def io_counters():
+    counters = {}
+    with open("/proc/self/io") as fd:
+        for line in fd:
+            k, v = line.split(":")
+            counters[k] = int(v)
+    return counters
+
+
+def build_library(root, tracks, cover_size):
+    cover = BytesIO()
+    Image.new('RGB', (cover_size, cover_size), (120, 40, 200)).save(cover, format='JPEG', quality=95)
+    lines = ["#EXTM3U"]
+    for i in range(tracks):
+        fname = os.path.join(root, "%05d - Song.mp3" % i)
+        with open(fname, "wb") as fd:
+            fd.write(MP3_FRAME * 1000)
+        tags = ID3()
+        tags.add(TIT2(encoding=3, text="Song %d" % i))
+        tags.add(TPE1(encoding=3, text="Artist %d" % (i // 10)))
+        tags.add(TALB(encoding=3, text="Album %d" % (i // 10)))
+        tags.add(TCON(encoding=3, text="Rock"))
+        tags.add(APIC(encoding=3, mime='image/jpeg', type=3, desc='', data=cover.getvalue()))
+        tags.save(fname)
+        lines.append("#EXTINF:26,Song %d - Artist %d" % (i, i // 10))
+        lines.append(fname)
+    playlist = os.path.join(root, "bench.m3u8")
+    with open(playlist, "w", newline='') as fd:
+        fd.write("\r".join(lines) + "\r")
+    return playlist
+
+
+def run(playlist, jam_root, write_once):
+    shutil.rmtree(jam_root, ignore_errors=True)
+    os.makedirs(os.path.join(jam_root, PlayListManager.PLAYLIST_DIR))
+    pm = PlayListManager(verbose=0)
+    pm.check_platform(jam_root)
+    data = pm.read_playlist(playlist)
+
+    before = io_counters()
+    t0 = time.time()
+    pm.migrate_playlist(data, "bench", playlist, write_once=write_once)
+    elapsed = time.time() - t0
+    after = io_counters()
+    return after['wchar'] - before['wchar'], elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("tracks", help="number of tracks", type=int, nargs="?", default=200)
+    parser.add_argument("cover_size", help="cover size in pixels (square)", type=int, nargs="?", default=1500)
+    opts = parser.parse_args()
+
+    # migrate_playlist reads the verbose level from the cli args
+    gen_playlist_jam.args = argparse.Namespace(verbose=0)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "source")
+        os.makedirs(source)
+        playlist = build_library(source, opts.tracks, opts.cover_size)
+        source_bytes = sum(os.path.getsize(os.path.join(source, f)) for f in os.listdir(source))
+
+        jam_root = os.path.join(tmp, "jam")
+        print("%d tracks, %d bytes in source, %dx%d covers" % (opts.tracks, source_bytes, opts.cover_size, opts.cover_size))
+        for label, write_once in (("copy + rewrite on device", False), ("write once", True)):
+            written, elapsed = run(playlist, jam_root, write_once)
+            print("%-26s %12d bytes written (%.2fx source) %8.2fs" % (label, written, written / source_bytes, elapsed))
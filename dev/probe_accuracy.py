@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+# /////////////////////////////////////////////////////////////////////////////
+# //
+# // probe_accuracy.py
+# //
+# // accuracy and time of the header-only duration (mp3_header, --fast-probe)
+# // against the full mutagen parse. Uses a synthetic library with every kind
+# // of header (CBR, Xing, Info + LAME, VBRI, MPEG2, layer 2, stacked ID3,
+# // garbage before the audio), or the mp3 files under --root.
+# //
+# // usage: python3 dev/probe_accuracy.py [--root DIR] [--copies N]
+# //
+# // 18/10/2026 18:40:02
+# // (c) 2026 Juan M. Casillas <juanm.casillas@gmail.com>
+# //
+# /////////////////////////////////////////////////////////////////////////////
+
+import os
+import sys
+import time
+import struct
+import argparse
+import tempfile
+from mutagen.mp3 import MP3
+from mutagen.id3 import ID3, TIT2
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from mp3_header import mp3_duration, frame_header
+from walker import walk_files
+
+# a difference bigger than this is reported as a mismatch
+TOLERANCE = 0.001
+
+
+def frame(b2, bitrate, sample_rate=0, mode=0, padding=0):
+    header = bytes([0xff, b2, (bitrate << 4) | (sample_rate << 2) | (padding << 1), mode << 6])
+    length = frame_header(header, 0)['length']
+    return bytearray(header + b"\x00" * (length - 4))
+
+
+def xing_frame(b2, bitrate, frames, tag=b"Xing", lame=None, flags=0x3, mode=0):
+    data = frame(b2, bitrate, mode=mode)
+    mpeg1 = b2 & 0x18 == 0x18
+    offset = (21 if mode == 3 else 36) if mpeg1 else (13 if mode == 3 else 21)
+    body = tag + struct.pack(">I", flags)
+    if flags & 0x1:
+        body += struct.pack(">I", frames)
+    if flags & 0x2:
+        body += struct.pack(">I", frames * len(data))
+    if flags & 0x4:
+        body += bytes(range(100))
+    if flags & 0x8:
+        body += struct.pack(">I", 50)
+    if lame:
+        delay, padding = lame
+        payload = bytearray(27)
+        payload[12] = delay >> 4
+        payload[13] = ((delay & 0xf) << 4) | (padding >> 8)
+        payload[14] = padding & 0xff
+        body += b"LAME3.100" + bytes(payload)
+    data[offset:offset + len(body)] = body
+    return data
+
+
+def vbri_frame(b2, bitrate, frames):
+    data = frame(b2, bitrate)
+    body = b"VBRI" + struct.pack(">HHHIIHHHH", 1, 0, 75, frames * len(data), frames, 2, 1, 2, 1) + b"\x00\x10\x00\x10"
+    data[36:36 + len(body)] = body
+    return data
+
+
+def id3(title):
+    tags = ID3()
+    tags.add(TIT2(encoding=3, text=title))
+    return tags
+
+
+def build_library(root, copies):
+    "(kind, file) of the synthetic library"
+    MPEG1_L3, MPEG2_L3, MPEG1_L2 = 0xfb, 0xf3, 0xfd
+    kinds = {
+        'cbr': lambda: bytes(frame(MPEG1_L3, 9)) * 2000,
+        'cbr mono': lambda: bytes(frame(MPEG1_L3, 5, mode=3)) * 1500,
+        'cbr + id3v1': lambda: bytes(frame(MPEG1_L3, 9)) * 1000 + b"TAG" + b"\x00" * 125,
+        'mpeg2 cbr': lambda: bytes(frame(MPEG2_L3, 8)) * 3000,
+        'layer 2': lambda: bytes(frame(MPEG1_L2, 10)) * 800,
+        'garbage first': lambda: b"\xff\x00junk\xff\xfb" + bytes(frame(MPEG1_L3, 9)) * 1000,
+        'xing vbr': lambda: bytes(xing_frame(MPEG1_L3, 9, 3000)) + bytes(frame(MPEG1_L3, 5)) * 1500 + bytes(frame(MPEG1_L3, 14)) * 1499,
+        'xing no frames': lambda: bytes(xing_frame(MPEG1_L3, 9, 0, flags=0x2)) + bytes(frame(MPEG1_L3, 9)) * 1000,
+        'info + lame': lambda: bytes(xing_frame(MPEG1_L3, 9, 2000, tag=b"Info", lame=(576, 1200), flags=0xf)) + bytes(frame(MPEG1_L3, 9)) * 1999,
+        'xing mpeg2 mono': lambda: bytes(xing_frame(MPEG2_L3, 8, 2500, mode=3)) + bytes(frame(MPEG2_L3, 8, mode=3)) * 2499,
+        'vbri': lambda: bytes(vbri_frame(MPEG1_L3, 9, 2500)) + bytes(frame(MPEG1_L3, 11)) * 2499,
+    }
+    files = []
+    for n in range(copies):
+        for kind, audio in kinds.items():
+            fname = os.path.join(root, "%03d %s.mp3" % (n, kind))
+            with open(fname, "wb") as fd:
+                fd.write(audio())
+            id3("%s %d" % (kind, n)).save(fname)
+            if kind == 'cbr' and n % 2:
+                # WMP writes more than one tag
+                with open(fname, "rb") as fd:
+                    data = fd.read()
+                with open(fname, "wb") as fd:
+                    # an empty (16 bytes of padding) ID3v2.3 tag
+                    fd.write(b"ID3\x03\x00\x00\x00\x00\x00\x10" + b"\x00" * 16 + data)
+            files.append((kind, fname))
+    return files
+
+
+def report(files):
+    rows = {}
+    full_time = fast_time = 0.0
+    fallbacks = 0
+    for kind, fname in files:
+        t0 = time.perf_counter()
+        try:
+            full = MP3(fname).info.length
+        except Exception:
+            full = None
+        t1 = time.perf_counter()
+        fast = mp3_duration(fname)
+        t2 = time.perf_counter()
+        full_time += t1 - t0
+        fast_time += t2 - t1
+        if fast is None:
+            # --fast-probe parses this one in full
+            fallbacks += 1
+            fast = full
+        row = rows.setdefault(kind, [0, 0, 0.0])
+        row[0] += 1
+        if full is None or fast is None:
+            if full != fast:
+                row[1] += 1
+            continue
+        diff = abs(full - fast)
+        row[2] = max(row[2], diff)
+        if diff > TOLERANCE:
+            row[1] += 1
+            print("mismatch %s: full %.3fs, fast %.3fs" % (fname, full, fast))
+
+    print("%-18s %6s %10s %12s" % ("kind", "files", "mismatch", "max diff"))
+    for kind, (count, mismatches, max_diff) in sorted(rows.items()):
+        print("%-18s %6d %10d %11.6fs" % (kind, count, mismatches, max_diff))
+    print("%d files, %d needed the full parse; full parse %.3fs, headers only %.3fs (%.1fx)" % (
+        len(files), fallbacks, full_time, fast_time, full_time / fast_time if fast_time else 0))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--root", help="compare the mp3 files in this directory (e.g. the jam Music folder)", default=None)
+    parser.add_argument("--copies", help="files of each kind in the synthetic library", type=int, default=20)
+    opts = parser.parse_args()
+
+    if opts.root:
+        report([ (os.path.dirname(record.rel) or ".", record.path) for record in walk_files(opts.root, ('.mp3', )) ])
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            report(build_library(tmp, opts.copies))
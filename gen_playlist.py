@@ -23,8 +23,9 @@ import sys
 import glob
 import os 
 import pathlib
-import m3u8
 import shutil
+from track import Track
+from m3u import read_m3u
 
 class PlayListManager:
     def __init__(self, verbose=False):
@@ -55,8 +56,7 @@ class PlayListManager:
 
 
     def build_playlist_from_directory(self, directory):
-        
-        playlist = []
+        "generator of the Tracks of the music under directory"
 
         for path, dirc, files in os.walk(directory):
             for name in files:
@@ -71,18 +71,12 @@ class PlayListManager:
                     except Exception as e:
                         if self.verbose:
                             print("Invalid file: %s (%s)" % (full_fname,e))
-                
-                    playlist.append({
-                        'title': playlist_entry,
-                        'file': local_fname,
-                        'path': full_fname,
-                        'duration': audio.info.length
-                    })
+                        continue
+
+                    yield Track(playlist_entry, str(local_fname), full_fname, audio.info.length)
                 else:
                     if self.verbose:
                         print("Warning: Unknown file extension for %s, skipping" % name)
-        
-        return playlist
 
     def store_playlist(self, playlist, directory, plname, format='m3u8'):
         return self.playlist_formatters[format](playlist, directory, plname)
@@ -99,35 +93,27 @@ class PlayListManager:
         if self.verbose:
             print("generating m3u8 playlist: %s" % target)
         
+        # playlist can be a generator: entries are written as they come
+        count = 0
         with open(target,"w",encoding='utf-8') as fd:
             for item in playlist:
-                fd.write("#EXTINF:%d, %s\n" % (item['duration'], item['title']))
-                fd.write("%s\n\n" % item['file'])
+                fd.write("#EXTINF:%d, %s\n" % (item.duration, item.title))
+                fd.write("%s\n\n" % item.file)
+                count += 1
 
-        return len(playlist)
+        return count
 
     def read_playlist(self, directory, playlist_file):
-        
+        "generator of the Tracks of playlist_file, their paths under directory"
         if not os.path.exists(playlist_file):
             raise ValueError("playlist file %s doesn't exists" % playlist_file)
         
-        playlist = []
-        dir_path = pathlib.Path(directory)
-        try:
-            data = m3u8.load(playlist_file)
-        except Exception as e:
-            raise(e)
-        
-        if data:
-            for i in data.segments:
-                playlist.append({
-                    'title': i.title,
-                    'file': i.uri,
-                    'path': str(dir_path / pathlib.Path(i.uri)),
-                    'duration': i.duration
-                })
-           
-        return playlist
+        return self.playlist_tracks(pathlib.Path(directory), playlist_file)
+
+    def playlist_tracks(self, dir_path, playlist_file):
+        for item in read_m3u(playlist_file):
+            item.path = str(dir_path / item.path)
+            yield item
 
     def migrate_playlist(self, playlist_data, playlist, from_dir=None, to_dir=None):
         if not from_dir or not to_dir or \
@@ -150,7 +136,7 @@ class PlayListManager:
             # check if the path is absolute.
             # if so, just copy the file (check the intermediate paths)
             # else, build the abs path and do it.
-            src_file = pathlib.Path(item['file'])
+            src_file = pathlib.Path(item.file)
 
             if not src_file.is_absolute():
                 tgt_file = src_file
@@ -171,7 +157,7 @@ class PlayListManager:
             except shutil.SameFileError:
                 pass
 
-            item['file'] = str(tgt_file)
+            item.file = str(tgt_file)
             new_playlist.append(item)
 
         self.gen_m3u8_playlist(new_playlist, to_dir, pathlib.Path(playlist).name)
@@ -14,21 +14,27 @@
 # find D:\\ -iname ".\*" -exec rm -rf "{}" ";"
 # https://github.com/globocom/m3u8
 
-import argparse
-import mutagen
-from mutagen.easyid3 import EasyID3
-from mutagen.mp3 import MP3
-from mutagen.id3 import ID3,APIC
-import argparse
-import sys
 import glob
 import os
 import pathlib
-import m3u8
 import shutil
 import platform
-from PIL import Image
+import hashlib
+import functools
+import time
 from io import BytesIO
+# cheap to import: mutagen, PIL, sqlite and the pools are only loaded
+# when a command reads tags, covers or the tag cache (see jam_cli)
+from track_probe import TrackProbe, probe_pool
+from track import Track
+import artwork
+from artwork import ArtworkEngine
+from music_index import MusicIndex, normalize_name
+from manifest import JamManifest
+from journal import Journal
+from m3u import read_m3u, write_m3u
+from walker import walk_files
+from progress import Progress
 
 class PlayListManager:
     # platform.system()
@@ -46,14 +52,86 @@ class PlayListManager:
     UNKNOWN_ARTIST = "Unknown Artist"
     UNKNOWN_ALBUM = "Unknown Album"
     UNKNOWN_ALL = (UNKNOWN_GENRE, UNKNOWN_ARTIST, UNKNOWN_ALBUM)
+    COPY_CHUNK = 1024 * 1024
+    PART_SUFFIX = ".part"
 
-    def __init__(self, verbose=False):
+    def __init__(self, verbose=False, cache=None, artwork=None, metrics=None):
         self.verbose = verbose
         self.extensions = ('.mp3', )
         self.playlist_formatters = {
             'm3u': self.gen_m3u_playlist
         }
         self.jam_root = None
+        # TagCache instance, or None to always parse the files
+        self.cache = cache
+        if not artwork:
+            artwork = ArtworkEngine(max_size=self.MAX_IMG_SZ, dpi=self.MAX_DPI)
+        self.artwork = artwork
+        # filename index of JAM_ROOT/Music (see music_index), loaded when needed,
+        # and where to keep its snapshot between runs (None: build it each run)
+        self.index = None
+        self.index_file = None
+        # manifest of the device (see manifest). Listings use it when use_manifest
+        self.manifest = None
+        self.use_manifest = True
+        # threads listing directories ahead when walking the device (see walker)
+        self.scan_jobs = 1
+        # read the durations from the MPEG headers only (see mp3_header)
+        self.fast_probe = False
+        # processes probing the tags of the files not in the tag cache (see probe_files),
+        # and the info they found, for get_track_info
+        self.jobs = 1
+        self.probed = {}
+        # stage times and counters of the run (see metrics)
+        if metrics is None:
+            # only here: the command line gives its own
+            from metrics import Metrics
+            metrics = Metrics()
+        self.metrics = metrics
+        # progress of the copies and moves (see start_progress): how it's shown
+        self.progress_mode = "none"
+        self.progress_interval = None
+        self.progress = Progress()
+        # playlist file -> source files of its songs, of the playlists being watched (see watch)
+        self.watched = {}
+        # store each audio once (see dedup_target): audio fingerprint -> track in Music, loaded
+        # when needed, and the fingerprints of the tracks being copied, for the manifest
+        self.dedup = False
+        self.audio = None
+        self.planned_audio = {}
+
+    def close(self):
+        self.flush()
+        if self.cache:
+            self.cache.close()
+        self.artwork.close()
+
+    def flush(self):
+        "end of a command: count the cache stats, save the index and the manifest. The caches stay open (see jam_server)"
+        if self.cache:
+            if self.verbose:
+                print(self.cache.stats())
+            self.metrics.count('tag cache hits', self.cache.hits)
+            self.metrics.count('tag cache misses', self.cache.misses)
+        if self.verbose:
+            print(self.artwork.stats)
+        stats = self.artwork.stats
+        self.metrics.count('covers resized', stats.counts[artwork.RESIZE])
+        self.metrics.count('covers skipped', stats.counts[artwork.SKIP])
+        self.metrics.count('covers invalid', stats.counts[artwork.INVALID])
+        self.metrics.count('covers from cache', stats.cached)
+        self.save()
+
+    def save(self):
+        "save the tag cache, the index and the manifest as they are now"
+        if self.cache:
+            self.cache.commit()
+        if self.index:
+            with self.metrics.stage("index"):
+                self.index.save()
+        if self.manifest:
+            with self.metrics.stage("manifest"):
+                self.manifest.save()
 
     def check_platform(self, jam_root):
 
@@ -70,14 +148,11 @@ class PlayListManager:
         self.playlist_path = self.jam_playlist_dir()
         return self.jam_root
 
-    def generate_playlist_entry(self, id3, name):
+    def generate_playlist_entry(self, info, name):
         "if we have id3 tag, use the id3 title and artist keys, else use the name of the file"
-        id3_tags = set([ 'title', 'artist'])
-        id3_items = set(id3.keys())
-
-        if id3_tags.issubset(id3_items):
+        if info.get('title') is not None and info.get('artist') is not None:
             # keys are contained in id3 keys, so use it.
-            ret = "%s - %s" % (id3['artist'][0], id3['title'][0])
+            ret = "%s - %s" % (info['artist'], info['title'])
         else:
             ret = name
             # remove extensions
@@ -124,88 +199,82 @@ class PlayListManager:
         return p
 
     def build_playlist_from_directory(self, directory):
-
-        orig_dir = directory
+        "generator of the Tracks of the music under directory (inside JAM_ROOT/Music), walked as they are written"
         directory = self.jam_music_dir(directory)
-        playlist = []
-
-        for path, dirc, files in os.walk(directory):
-            for name in files:
-                if name.lower().endswith(self.extensions):
-                    # build the relative path in this platform
-                    full_fname =  os.path.sep.join([path] + [name])
-                    local_fname = pathlib.Path(full_fname).relative_to(directory)
-                    try:
-                        mt = EasyID3(full_fname)
-                        playlist_entry = self.generate_playlist_entry(mt, name)
-                        audio = MP3(full_fname)
-                    except Exception as e:
-                        if self.verbose:
-                            print("Invalid file: %s (%s)" % (full_fname,e))
-
-                    playlist.append({
-                        'title': playlist_entry,
-                        'file': self.jam_music_entry_dir(full_fname),
-                        'path': full_fname,
-                        'duration': audio.info.length
-                    })
-                else:
-                    if self.verbose:
-                        print("Warning: Unknown file extension for %s, skipping" % name)
 
-        return playlist
+        invalid = 0
+        for full_fname, info in self.probe_files(self.music_files(directory)):
+            if info['duration'] is None:
+                invalid += 1
+                self.metrics.count('files skipped')
+                if self.verbose:
+                    print("Invalid file: %s (%s)" % (full_fname, info['error']))
+                continue
+
+            yield Track(self.generate_playlist_entry(info, os.path.basename(full_fname)),
+                        self.jam_music_entry_dir(full_fname), full_fname, info['duration'])
+
+        if invalid and not self.verbose:
+            print("Warning: %d invalid files skipped (-v lists them)" % invalid)
+
+    def music_files(self, directory):
+        "generator of the music files under directory"
+        # the other files are only needed to warn about them
+        ext = None if self.verbose else self.extensions
+        for record in self.metrics.timed("walk", walk_files(directory, ext, jobs=self.scan_jobs)):
+            if record.path.lower().endswith(self.extensions):
+                yield record.path
+            elif self.verbose:
+                print("Warning: Unknown file extension for %s, skipping" % os.path.basename(record.path))
 
     def store_playlist(self, playlist, plname, format='m3u'):
         return self.playlist_formatters[format](playlist, plname)
 
-    def gen_m3u_playlist(self, playlist, plname):
-
+    def jam_playlist_target(self, plname):
         target = self.jam_playlist_dir(plname)
         path =  pathlib.Path(target)
         if path.suffix in ('.m3u8', '.m3u'):
             pass
         else:
             target = "%s.m3u" % target
+        return target
+
+    def gen_m3u_playlist(self, playlist, plname):
+
+        target = self.jam_playlist_target(plname)
 
         if self.verbose:
             print("generating m3u playlist: %s" % target)
 
-        with open(target,"w",encoding='utf-8', newline='') as fd:
-            fd.write("#EXTM3U\r\n")
-            for item in playlist:
-                if self.verbose:
-                    print("* adding: %s" % item['file'])
-                fd.write("#EXTINF:%d, %s\r\n" % (item['duration'], item['title']))
-                fd.write("%s\r\n" % item['file'])
+        manifest = self.jam_manifest()
+        rels = []
+        def added(item):
+            if self.verbose:
+                print("* adding: %s" % item.file)
+            if manifest:
+                rels.append(self.jam_entry_relpath(item.file))
+
+        # playlist can be a generator: entries are written as they come.
+        # The time spent producing them is counted in their own stages
+        with self.metrics.stage("write playlist"):
+            count = write_m3u(target, playlist, added)
+        self.metrics.count('playlist entries', count)
+        if manifest:
+            manifest.set_playlist(os.path.basename(target), rels)
 
         if self.verbose:
-            print("Added %d files" % len(playlist))
-        return len(playlist)
+            print("Added %d files" % count)
+        return count
 
 
     
 
 
     def read_playlist(self, playlist_file):
-
+        "generator of the entries (Track) of the playlist, read one at a time"
         if not os.path.exists(playlist_file):
             raise ValueError("playlist file %s doesn't exists" % playlist_file)
-
-        playlist = []
-        try:
-            data = m3u8.load(playlist_file)
-        except Exception as e:
-            raise(e)
-
-        if data:
-            for i in data.segments:
-                playlist.append({
-                    'title': i.title,
-                    'file': i.uri,
-                    'path': str(pathlib.Path(i.uri)),
-                    'duration': i.duration
-                })
-        return playlist
+        return self.metrics.timed("read playlist", read_m3u(playlist_file))
     
     def read_jam_playlist(self, playlist_name):
         directory = self.jam_playlist_dir()
@@ -227,11 +296,12 @@ class PlayListManager:
         # move then to the relative directory, and change the path else
         # move the files. Then write the playlist in the right place
         # with the pointers moved.
+        copies = []
         for item in playlist_data:
             # check if the path is absolute.
             # if so, just copy the file (check the intermediate paths)
             # else, build the abs path and do it.
-            src_file = pathlib.Path(item['file'])
+            src_file = pathlib.Path(item.file)
 
             if not src_file.is_absolute():
                 tgt_file = src_file
@@ -242,21 +312,36 @@ class PlayListManager:
             # convert to export path
             tgt_file = to_dir_path / pathlib.Path(self.from_jam_path(str(tgt_file))).name 
             src_file = self.from_jam_path(str(src_file))
-            # create target structure.
-            tgt_path = tgt_file.parent
-            if  not os.path.exists(tgt_path):
-                os.makedirs(tgt_path, exist_ok=True)
+            if not os.path.exists(src_file):
+                # moved by a convert/revert, find it by name
+                src_file = self.find_in_music_dir(tgt_file.name) or src_file
+            copies.append((src_file, tgt_file))
 
-            if args.verbose:
-                print("copying %s -> %s" % (src_file, tgt_file))
+        # all the sizes are known before the first copy, for the ETA
+        self.start_progress("exporting", (self.source_size(src_file) for src_file, tgt_file in copies))
+        try:
+            for src_file, tgt_file in copies:
+                # create target structure.
+                tgt_path = tgt_file.parent
+                if  not os.path.exists(tgt_path):
+                    os.makedirs(tgt_path, exist_ok=True)
 
-            try:
-                if not os.path.exists(tgt_file):
-                    shutil.copyfile(src_file, tgt_file)
-            except shutil.SameFileError:
-                pass
+                if self.verbose:
+                    print("copying %s -> %s" % (src_file, tgt_file))
+
+                try:
+                    if not os.path.exists(tgt_file):
+                        self.plain_copy(src_file, tgt_file)
+                    else:
+                        self.metrics.count('files on device')
+                        self.skipped(src_file)
+                except shutil.SameFileError:
+                    self.skipped(src_file)
+        finally:
+            self.end_progress()
 
-    def migrate_playlist(self, playlist_data, playlist_name, from_playlist, create_dir=False, use_hash=True):
+    def migrate_playlist(self, playlist_data, playlist_name, from_playlist, create_dir=False, use_hash=True, write_once=True,
+                         jobs=1, io_jobs=1, max_inflight=None, resume=False):
 
         new_playlist = []
 
@@ -273,169 +358,758 @@ class PlayListManager:
         from_dir_path = pathlib.Path(from_playlist).parent
         to_dir_path   = pathlib.Path(to_dir  )
 
+        journal = self.open_journal("migrate", playlist_name, resume, source=str(from_playlist))
+        new_playlist = self.copy_tracks(playlist_data, from_dir_path, to_dir_path, journal, use_hash=use_hash, write_once=write_once,
+                                        jobs=jobs, io_jobs=io_jobs, max_inflight=max_inflight)
+        self.gen_m3u_playlist(new_playlist, playlist_name)
+        journal.end()
+
+    def copy_tracks(self, playlist_data, from_dir_path, to_dir_path, journal, use_hash=True, write_once=True,
+                    jobs=1, io_jobs=1, max_inflight=None):
+        "copy the tracks of playlist_data to the device, return them pointing to the device (same order)"
+        # copies finished by the interrupted run: don't read their tags again
+        copied = journal.completed("copy")
+
+        playlist_data = list(playlist_data)
+        self.start_progress("copying", (self.source_size(self.item_source(item, from_dir_path)) for item in playlist_data))
+        try:
+            if write_once and (jobs > 1 or io_jobs > 1):
+                # probe & plan here, artwork and copies in worker threads
+                # only here: the sequential copies don't need the threads
+                from pipeline import MigrationPipeline
+                pipeline = MigrationPipeline(self, jobs=jobs, io_jobs=io_jobs, max_inflight=max_inflight or MigrationPipeline.MAX_INFLIGHT)
+                return pipeline.migrate(playlist_data, from_dir_path, to_dir_path, use_hash, journal, copied)
+            return self.copy_tracks_sequential(playlist_data, from_dir_path, to_dir_path, journal, copied, use_hash, write_once)
+        finally:
+            self.end_progress()
+
+    def copy_tracks_sequential(self, playlist_data, from_dir_path, to_dir_path, journal, copied, use_hash=True, write_once=True):
+        "copy_tracks one track at a time, in this thread"
+        new_playlist = []
         # process the source data in playlist_data. If copy_files false
         # move then to the relative directory, and change the path else
         # move the files. Then write the playlist in the right place
         # with the pointers moved.
-        for item in playlist_data:
-            # check if the path is absolute.
-            # if so, just copy the file (check the intermediate paths)
-            # else, build the abs path and do it.
-            src_file = pathlib.Path(item['file'])
+        for start in range(0, len(playlist_data), journal.SYNC_EVERY):
+            # the copies of a batch are in the journal (on disk) before the first one is done
+            batch = []
+            for item in playlist_data[start:start + journal.SYNC_EVERY]:
+                tgt_file = self.resumed_copy(item, from_dir_path, copied)
+                if tgt_file:
+                    batch.append((item, None, tgt_file, None, None))
+                    continue
+                src_file, tgt_file, probe = self.plan_track(item, from_dir_path, to_dir_path, use_hash)
+                plan_id = None
+                if not os.path.exists(tgt_file) and tgt_file not in (planned[2] for planned in batch):
+                    plan_id = journal.plan("copy", src_file, tgt_file)
+                batch.append((item, src_file, tgt_file, probe, plan_id))
+            with self.metrics.stage("journal"):
+                journal.sync()
+
+            for item, src_file, tgt_file, probe, plan_id in batch:
+                if src_file is None:
+                    self.skipped(self.item_source(item, from_dir_path))
+                else:
+                    self.copy_planned(journal, plan_id, src_file, tgt_file, probe, write_once)
+                item.file = self.jam_music_entry_dir(tgt_file)
+                new_playlist.append(item)
 
-            if not src_file.is_absolute():
-                tgt_file = src_file
-                src_file = from_dir_path / src_file
-            else:
-                tgt_file = to_dir_path / src_file.name
+        return new_playlist
 
-            # add hash here
-            if use_hash:
-                # use src file to get the mp3info.
-                tgt_file = pathlib.Path(self.gen_hash(tgt_file,src=src_file))
+    def copy_planned(self, journal, plan_id, src_file, tgt_file, probe, write_once=True):
+        "copy a track planned by copy_tracks_sequential (plan_id None: it's already on the device)"
+        if self.verbose:
+            print("copying %s -> %s" % (src_file, tgt_file))
 
-            # create target structure.
-            tgt_path = tgt_file.parent
-            if  not os.path.exists(tgt_path):
-                os.makedirs(tgt_path, exist_ok=True)
+        try:
+            if plan_id is not None:
+                if write_once:
+                    self.write_track(src_file, tgt_file, self.prepare_track(src_file, probe), probe.cached)
+                else:
+                    self.plain_copy(src_file, tgt_file)
+                    if self.get_track_info(src_file, probe)['artwork']:
+                        self.check_artwork(tgt_file, probe)
+                    self.manifest_track(tgt_file, os.path.getsize(tgt_file), probe.cached)
+                # only once it's there: an interrupted copy leaves nothing in the index
+                self.index_added(tgt_file)
+                journal.done(plan_id)
+            else:
+                self.metrics.count('files on device')
+                self.skipped(src_file)
+                self.manifest_track(tgt_file, None, probe.cached)
+        except shutil.SameFileError:
+            self.skipped(src_file)
+
+    def playlist_sources(self, sources):
+        "expand directories (their playlists), globs and file=name into [(playlist file, playlist name)]"
+        found = []
+        for source in sources:
+            name = None
+            if "=" in source and not os.path.exists(source):
+                source, name = source.rsplit("=", 1)
+            if os.path.isdir(source):
+                files = sorted(os.path.join(source, f) for f in os.listdir(source) if f.lower().endswith(('.m3u', '.m3u8')))
+            elif os.path.exists(source):
+                files = [ source ]
+            else:
+                files = sorted(glob.glob(source))
+                if not files:
+                    raise ValueError("no playlists found in %s" % source)
+            for f in files:
+                found.append((f, name if name and len(files) == 1 else pathlib.Path(f).stem))
+
+        names = {}
+        for f, name in found:
+            if name in names and names[name] != f:
+                raise ValueError("playlists %s and %s are both stored as %s" % (names[name], f, name))
+            names[name] = f
+        return [ (f, name) for name, f in names.items() ]
+
+    def migrate_all(self, sources, **kwargs):
+        "migrate the playlist files (see playlist_sources) at once"
+        def read_sources():
+            for playlist_file, playlist_name in self.playlist_sources(sources):
+                if self.verbose:
+                    print("reading %s" % playlist_file)
+                yield playlist_name, list(self.read_playlist(playlist_file)), pathlib.Path(playlist_file).parent
+        return self.migrate_playlists(read_sources(), **kwargs)
+
+    def migrate_library(self, library_file, names=None, **kwargs):
+        "migrate the playlists in names (default: all) of the iTunes Library.xml at once, with the tags from the library"
+        from itunes_library import ItunesLibrary
+        library = ItunesLibrary(library_file, self.verbose)
+        def read_library():
+            seen = set()
+            found = set()
+            for playlist_name, playlist_data in library.playlists(names):
+                found.add(playlist_name)
+                # the device doesn't like them in the name, and iTunes allows duplicated names
+                playlist_name = playlist_name.replace("/", "-").replace("\\", "-")
+                if playlist_name in seen:
+                    print("Warning: there's already a playlist called %s, skipping it" % playlist_name)
+                    continue
+                seen.add(playlist_name)
+                yield playlist_name, playlist_data, pathlib.Path(library_file).parent
+            for name in sorted(set(names or ()) - found):
+                print("Warning: playlist %s not found in %s" % (name, library_file))
+        return self.migrate_playlists(read_library(), **kwargs)
+
+    def migrate_playlists(self, sources, use_hash=True, write_once=True, jobs=1, io_jobs=1,
+                          max_inflight=None, resume=False):
+        "migrate (name, playlist_data, from_dir_path) at once: each distinct track is read and copied once, the playlists written at the end"
+        t0 = time.perf_counter()
+        playlists = []
+        union = {}
+        entries = 0
+        for playlist_name, playlist_data, from_dir_path in sources:
+            for item in playlist_data:
+                # the same song in many playlists (maybe with different relative paths) is the same source file
+                src_file = pathlib.Path(item.file)
+                if not src_file.is_absolute():
+                    src_file = from_dir_path / src_file
+                item.src = os.path.abspath(src_file)
+                if item.src not in union:
+                    union[item.src] = item.copy(file=item.src)
+            entries += len(playlist_data)
+            playlists.append((playlist_name, playlist_data))
+            if self.verbose:
+                print("read %s: %d songs" % (playlist_name, len(playlist_data)))
+        t_read = time.perf_counter()
+
+        to_dir = self.jam_music_dir()
+        if  not os.path.exists(to_dir):
+            os.makedirs(to_dir, exist_ok=True)
 
-            if args.verbose:
-                print("copying %s -> %s" % (src_file, tgt_file))
+        journal = self.open_journal("migrate-all", ",".join(name for name, data in playlists), resume)
+        planned = len(journal.plans)
+        tracks = self.copy_tracks(list(union.values()), pathlib.Path(to_dir), pathlib.Path(to_dir), journal, use_hash=use_hash,
+                                  write_once=write_once, jobs=jobs, io_jobs=io_jobs, max_inflight=max_inflight)
+        copies = len(journal.plans) - planned
+        t_copy = time.perf_counter()
+
+        # copy_tracks keeps the order
+        targets = dict(zip(union.keys(), (item.file for item in tracks)))
+        for playlist_name, playlist_data in playlists:
+            new_playlist = []
+            for item in playlist_data:
+                item.file = targets[item.src]
+                item.src = None
+                new_playlist.append(item)
+            self.gen_m3u_playlist(new_playlist, playlist_name)
+        journal.end()
+        t_end = time.perf_counter()
+
+        print("migrated %d playlists: %d songs, %d distinct tracks, %d copied, %d already in the device" % (
+            len(playlists), entries, len(union), copies, len(union) - copies))
+        print("read playlists %.2fs, tags and copies %.2fs, write playlists %.2fs, total %.2fs" % (
+            t_read - t0, t_copy - t_read, t_end - t_copy, t_end - t0))
+        return len(playlists)
+
+    def item_source(self, item, from_dir_path):
+        "source file of a playlist item (its path, relative to the playlist)"
+        src_file = pathlib.Path(item.file)
+        if not src_file.is_absolute():
+            src_file = from_dir_path / src_file
+        return src_file
+
+    def resumed_copy(self, item, from_dir_path, copied):
+        "target of the item if an interrupted run already copied it, else None"
+        if not copied:
+            return None
+        src_file = self.item_source(item, from_dir_path)
+        tgt_file = copied.get(str(src_file))
+        if tgt_file and os.path.exists(tgt_file):
+            return pathlib.Path(tgt_file)
+        return None
 
-            try:
-                if not os.path.exists(tgt_file):
-                    shutil.copyfile(src_file, tgt_file)
-                    self.check_artwork(tgt_file)
-            except shutil.SameFileError:
-                pass
+    def open_journal(self, command, playlist_name, resume=False, **params):
+        """start the journal of command, or continue the unfinished one with resume. Refuses to start over another
+        unfinished one: its moves and copies would be lost"""
+        journal = Journal(self.jam_root).load()
+        if journal.unfinished():
+            if resume and journal.command == command and journal.params.get('playlist') == playlist_name:
+                print("resuming %s of %s (%d of %d operations done)" % (command, playlist_name, len(journal.done_ids), len(journal.plans)))
+                journal.reopen()
+                return journal
+            raise ValueError("found an unfinished %s of %s, finish it (--resume) or rollback before %s" % (
+                             journal.command, journal.params.get('playlist'), command))
+        if resume:
+            print("nothing to resume, starting %s of %s" % (command, playlist_name))
+        journal.begin(command, playlist=playlist_name, **params)
+        return journal
+
+    def rollback(self):
+        "undo the operations of the unfinished migrate/convert/revert in the journal. Returns how many"
+        journal = Journal(self.jam_root).load()
+        if not journal.unfinished():
+            raise ValueError("nothing to roll back in %s" % self.jam_root)
+
+        manifest = self.jam_manifest()
+        referenced = manifest.referenced() if manifest else set()
+        undone = 0
+        # the directories we took files from, that may be left empty
+        emptied = set()
+        for plan_id in sorted(journal.plans.keys(), reverse=True):
+            plan = journal.plans[plan_id]
+            src, tgt = plan['src'], plan['tgt']
+            if plan['kind'] == "move":
+                if os.path.exists(tgt) and not os.path.exists(src):
+                    if self.verbose:
+                        print("moving back %s -> %s" % (tgt, src))
+                    os.makedirs(os.path.dirname(src), exist_ok=True)
+                    shutil.move(tgt, src)
+                    self.track_moved(tgt, src)
+                    emptied.add(os.path.dirname(tgt))
+                    undone += 1
+            elif plan['kind'] == "copy":
+                # only copied if it wasn't there, so it's ours
+                part = "%s%s" % (tgt, self.PART_SUFFIX)
+                if os.path.exists(part):
+                    os.remove(part)
+                if os.path.exists(tgt) and self.music_relpath(tgt) not in referenced:
+                    if self.verbose:
+                        print("removing %s" % tgt)
+                    os.remove(tgt)
+                    if manifest:
+                        manifest.remove_track(self.music_relpath(tgt))
+                    if self.index is not None:
+                        self.index.remove(tgt)
+                    emptied.add(os.path.dirname(tgt))
+                    undone += 1
+
+        self.remove_empty_dirs(emptied)
+        print("rolled back %s of %s: %d operations" % (journal.command, journal.params.get('playlist'), undone))
+        journal.discard()
+        return undone
+
+    def remove_empty_dirs(self, directories):
+        "remove the empty ones of directories and their parents, bottom-up, up to Music (as gc)"
+        music_dir = os.path.abspath(self.jam_music_dir())
+        # the deepest first, so the parents are empty when we get to them
+        for directory in sorted(directories, key=lambda d: -len(os.path.abspath(d))):
+            while os.path.abspath(directory).startswith(music_dir + os.path.sep):
+                try:
+                    os.rmdir(directory)
+                except OSError:
+                    # not empty (or already gone)
+                    break
+                if self.index is not None:
+                    self.index.remove_dir(directory)
+                if self.verbose:
+                    print("empty directory: %s" % directory)
+                directory = os.path.dirname(directory)
+
+    def plan_track(self, item, from_dir_path, to_dir_path, use_hash=True):
+        "resolve the source and target file of a playlist item, and create the target structure"
+        # check if the path is absolute.
+        # if so, just copy the file (check the intermediate paths)
+        # else, build the abs path and do it.
+        src_file = pathlib.Path(item.file)
+
+        if not src_file.is_absolute():
+            tgt_file = src_file
+            src_file = from_dir_path / src_file
+        else:
+            tgt_file = to_dir_path / src_file.name
+
+        # parse the source only once, and share it with gen_hash and check_artwork
+        probe = TrackProbe(src_file)
+        if item.info:
+            # tags from the iTunes library, the file is only read to check the artwork
+            probe.cached = item.info
+
+        # add hash here
+        if use_hash:
+            # use src file to get the mp3info.
+            tgt_file = pathlib.Path(self.gen_hash(tgt_file,src=src_file,probe=probe))
+
+        if self.dedup and not os.path.exists(tgt_file):
+            # the same song may be in the device already, with other tags or name
+            tgt_file = self.dedup_target(src_file, tgt_file)
+
+        # create target structure.
+        tgt_path = tgt_file.parent
+        if  not os.path.exists(tgt_path):
+            os.makedirs(tgt_path, exist_ok=True)
+
+        # tags are needed later (artwork, manifest), keep them in the probe
+        self.get_track_info(src_file, probe)
+        return src_file, tgt_file, probe
+
+    def sync_playlist(self, playlist_data, playlist_name, from_playlist, check='mtime', prune=False, use_hash=True):
+        "like migrate, but only copy the new or changed tracks. With prune remove the dropped ones no playlist uses"
+        manifest = self.jam_manifest()
+        if not manifest:
+            print("%s doesn't have a manifest, building it" % self.jam_root)
+            manifest = self.reindex(hashed=False)
+
+        music_dir = self.jam_music_dir()
+        if  not os.path.exists(music_dir):
+            os.makedirs(music_dir, exist_ok=True)
+        from_dir_path = pathlib.Path(from_playlist).parent
+        to_dir_path   = pathlib.Path(music_dir)
 
-            item['file'] = self.jam_music_entry_dir(tgt_file)
-            new_playlist.append(item)
+        name = os.path.basename(self.jam_playlist_target(playlist_name))
+        dropped = set(manifest.playlists.get(name, []))
+        sources = manifest.sources()
+        counts = dict.fromkeys(('new', 'changed', 'unchanged', 'removed'), 0)
+        copied = saved = 0
+        new_playlist = []
+
+        playlist_data = list(playlist_data)
+        self.start_progress("copying", (self.source_size(self.item_source(item, from_dir_path)) for item in playlist_data))
+        try:
+            for item in playlist_data:
+                src_file = self.item_source(item, from_dir_path)
+                try:
+                    st = os.stat(src_file)
+                except OSError as e:
+                    # the rest of the playlist is synced anyway
+                    print("Warning: can't read %s, skipping it: %s" % (src_file, e.strerror))
+                    continue
+
+                # unchanged source: reuse the copy we have, without reading its tags
+                rel = sources.get(os.path.abspath(str(src_file)))
+                entry = manifest.tracks.get(rel) if rel else None
+                if entry and os.path.exists(os.path.join(music_dir, rel)) and \
+                    self.source_unchanged(rel, entry, src_file, st, check):
+                    counts['unchanged'] += 1
+                    saved += st.st_size
+                    self.skipped(src_file)
+                    item.file = self.jam_music_entry_dir(os.path.join(music_dir, rel))
+                    new_playlist.append(item)
+                    continue
+
+                src_file, tgt_file, probe = self.plan_track(item, from_dir_path, to_dir_path, use_hash)
+                if not entry and os.path.exists(tgt_file):
+                    # copied before we tracked the sources (e.g. by migrate), adopt it
+                    counts['unchanged'] += 1
+                    saved += st.st_size
+                    self.skipped(src_file)
+                    digest = self.file_hash(src_file) if check == 'hash' else None
+                    self.manifest_track(tgt_file, None, probe.cached, source=self.source_record(src_file, st, digest))
+                else:
+                    if self.verbose:
+                        print("copying %s -> %s" % (src_file, tgt_file))
+                    self.write_track(src_file, tgt_file, self.prepare_track(src_file, probe), probe.cached)
+                    self.index_added(tgt_file)
+                    counts['changed' if entry else 'new'] += 1
+                    copied += st.st_size
+                    if rel and rel != self.music_relpath(tgt_file):
+                        # retagged, so it has a new place. The old copy may go
+                        dropped.add(rel)
+
+                item.file = self.jam_music_entry_dir(tgt_file)
+                new_playlist.append(item)
+        finally:
+            self.end_progress()
 
         self.gen_m3u_playlist(new_playlist, playlist_name)
 
-    def get_id3_info(self, music_file):
+        if prune:
+            for rel in sorted(dropped - manifest.referenced()):
+                fname = os.path.join(music_dir, rel)
+                if self.verbose:
+                    print("removing %s" % fname)
+                if os.path.exists(fname):
+                    os.remove(fname)
+                manifest.remove_track(rel)
+                if self.index is not None:
+                    self.index.remove(fname)
+                counts['removed'] += 1
+
+        print("sync: %d new, %d changed, %d unchanged, %d removed. Copied %d bytes, saved %d bytes" % (
+              counts['new'], counts['changed'], counts['unchanged'], counts['removed'], copied, saved))
+        return counts
+
+    def source_unchanged(self, rel, entry, src_file, st, check='mtime'):
+        "compare the source with the one the track was copied from: size and mtime, or content hash"
+        source = entry.get('source') or {}
+        if source.get('size') != st.st_size:
+            return False
+        if check == 'hash':
+            if source.get('hash'):
+                return self.file_hash(src_file) == source['hash']
+            # not hashed when copied (artwork changed), hash it now
+            if source.get('mtime_ns') != st.st_mtime_ns:
+                return False
+            source['hash'] = self.file_hash(src_file)
+            self.jam_manifest().set_source(rel, source)
+            return True
+        return source.get('mtime_ns') == st.st_mtime_ns
+
+    def watch(self, sources, music_roots=(), check='mtime', prune=False, debounce=1.0, poll=False, interval=None):
+        """sync the playlist files (see playlist_sources), then again each one that changes, or whose songs
+        change in music_roots, until interrupted"""
+        for playlist_file, playlist_name in self.playlist_sources(sources):
+            self.watch_sync(playlist_file, playlist_name, check, prune)
+        self.save()
+
+        # the directories of the sources (new playlists in them), the playlists and the music
+        paths = [ source for source in sources if os.path.isdir(source) ]
+        paths += [ playlist_file for playlist_file in self.watched.keys() ]
+        paths += list(music_roots)
+        # only here: the other commands never watch
+        from watcher import open_watcher, batches
+        watcher = open_watcher(paths, poll, interval, self.verbose)
+        print("watching %d playlists (%s), ^C to stop" % (len(self.watched), type(watcher).__name__))
         try:
-            mp3file = MP3(music_file, ID3=ID3)
-        except Exception as e:
-            print("get id3info Invalid MP3 file, skipping it: %s %s" % (music_file, e))
-            return self.UNKNOWN_ALL
-
+            for changed in batches(watcher, debounce):
+                if self.verbose:
+                    print("watch: %d paths changed" % len(changed))
+                with self.metrics.stage("watch"):
+                    self.sync_changed(sources, changed, check, prune)
+                self.save()
+        except KeyboardInterrupt:
+            print("watch: stopped")
+        finally:
+            watcher.close()
+
+    def sync_changed(self, sources, changed, check='mtime', prune=False):
+        "sync the playlists whose file or songs are in changed. A changed directory counts for everything under it"
         try:
-            mp3file = EasyID3(music_file)
-        except Exception as e:
-            print("Invalid ID3 tags, skipping it: %s %s" % (music_file, e))
+            playlists = self.playlist_sources(sources)
+        except ValueError as e:
+            print("watch: %s" % e)
+            return
+        # a directory, or a file we don't know what it is
+        prefixes = tuple(os.path.join(path, "") for path in changed if not path.lower().endswith(self.extensions))
+        current = set()
+        for playlist_file, playlist_name in playlists:
+            key = os.path.abspath(playlist_file)
+            current.add(key)
+            songs = self.watched.get(key)
+            if songs is not None and key not in changed and not key.startswith(prefixes) and \
+                not any(song in changed or song.startswith(prefixes) for song in songs):
+                continue
+            self.watch_sync(playlist_file, playlist_name, check, prune)
+        for key in set(self.watched.keys()) - current:
+            # the device keeps its copy
+            print("watch: %s is gone, not syncing it anymore" % key)
+            del self.watched[key]
+
+    def watch_sync(self, playlist_file, playlist_name, check='mtime', prune=False):
+        "sync one playlist, keeping its songs to know when it changes. Errors are printed, the watch goes on"
+        playlist_file = os.path.abspath(playlist_file)
+        print("syncing %s as %s" % (playlist_file, playlist_name))
+        try:
+            playlist_data = list(self.read_playlist(playlist_file))
+            from_dir_path = pathlib.Path(playlist_file).parent
+            self.watched[playlist_file] = { os.path.abspath(str(self.item_source(item, from_dir_path))) for item in playlist_data }
+            self.sync_playlist(playlist_data, playlist_name, playlist_file, check=check, prune=prune)
+        except (OSError, ValueError) as e:
+            # e.g. a song not there yet: the next change of the playlist will try again
+            self.watched.setdefault(playlist_file, set())
+            print("watch: can't sync %s: %s" % (playlist_file, e))
+
+    def get_track_info(self, music_file, probe=None):
+        "return the track info from the cache if the file didn't change, else parse it (once, using probe)"
+        if probe and probe.cached:
+            return probe.cached
+
+        info = self.probed.get(music_file)
+        if not info and self.cache:
+            with self.metrics.stage("tag cache"):
+                info = self.cache.get(music_file, estimated=self.fast_probe)
+
+        if not info:
+            if not probe:
+                probe = TrackProbe(music_file, fast=self.fast_probe)
+            with self.metrics.stage("tags"):
+                info = probe.info()
+            self.metrics.count('tags parsed')
+            if self.cache:
+                with self.metrics.stage("tag cache"):
+                    self.cache.put(music_file, info)
+
+        if probe:
+            probe.cached = info
+        return info
+
+    def probe_files(self, music_files):
+        """generator of (file, track info) of music_files, in the same order. With jobs > 1 the
+        files not in the tag cache are probed in chunks on a process pool"""
+        if self.jobs <= 1:
+            for music_file in music_files:
+                yield music_file, self.get_track_info(music_file)
+            return
+
+        # the tag cache is only used from this thread
+        lookup = functools.partial(self.cache.get, estimated=self.fast_probe) if self.cache else None
+
+        def store(music_file, info):
+            self.metrics.count('tags parsed')
+            if self.cache:
+                self.cache.put(music_file, info)
+        yield from self.metrics.timed("tags", probe_pool(music_files, self.jobs, self.fast_probe, lookup, store))
+
+    def get_id3_info(self, music_file, probe=None):
+        info = self.get_track_info(music_file, probe)
+        if info['error']:
+            print("get id3info %s, skipping it: %s" % (info['error'], music_file))
+            self.metrics.count('tag errors')
             return self.UNKNOWN_ALL
 
-        if not mp3file:
-            return self.UNKNOWN_ALL 
-        
-        genre = self.UNKNOWN_GENRE
-        artist = self.UNKNOWN_ARTIST
-        album = self.UNKNOWN_ALBUM
-
-        def get_id3_key(dict, key, default=None):
-            r = default
-            if key in dict.keys():
-                if len(dict[key]) >= 1:
-                    r = dict[key][0]
-                else:
-                    r = dict[key]
-            return r
-            
+        genre  = info['genre'] if info['genre'] is not None else self.UNKNOWN_GENRE
+        artist = info['artist'] if info['artist'] is not None else self.UNKNOWN_ARTIST
+        album  = info['album'] if info['album'] is not None else self.UNKNOWN_ALBUM
 
-        genre  = get_id3_key(mp3file, "genre", self.UNKNOWN_GENRE)            
-        artist = get_id3_key(mp3file, "artist", self.UNKNOWN_ARTIST)
-        album  = get_id3_key(mp3file, "album", self.UNKNOWN_ALBUM)
-        
         return(genre, artist, album)
 
-    def check_artwork(self, music_file):
-        # change image things.
+    def prepare_track(self, src_file, probe=None):
+        "return the final bytes (fixed tag + untouched audio) of src_file, or None if it can be copied as is"
+        if not probe:
+            probe = TrackProbe(src_file)
+
+        if not self.get_track_info(src_file, probe)['artwork'] or not self.fix_artwork(probe):
+            return None
+
+        # the tag is rewritten over a copy of the source in memory, so the
+        # audio frames are the same, and the device only sees a sequential write
+        with self.metrics.stage("read"):
+            with open(src_file, "rb") as fd:
+                data = BytesIO(fd.read())
+            probe.tags.save(data)
+        self.metrics.count('bytes read', len(data.getbuffer()))
+        return data.getbuffer()
+
+    def write_track(self, src_file, tgt_file, data=None, info=None):
+        "write the bytes from prepare_track once to tgt_file (plain copy if there's nothing to change)"
+        hashed = self.jam_manifest() is not None
+        # written aside and renamed, so an interrupted copy never looks like a complete file
+        part = "%s%s" % (tgt_file, self.PART_SUFFIX)
+        self.progress.start(tgt_file)
+        with self.metrics.stage("copy"):
+            if data is None:
+                digest = self.copy_file(src_file, part, hashed)
+                size = os.path.getsize(src_file)
+            else:
+                with open(part, "wb") as fd:
+                    self.write_chunks(fd, data)
+                digest = hashlib.sha1(data).hexdigest() if hashed else None
+                size = len(data)
+            os.replace(part, tgt_file)
+        self.copied(size, read=data is None)
+        self.progress.done(size if data is None else self.source_size(src_file), size)
+
+        # remember where it came from, so sync can tell if the source changed
+        source = None
+        if hashed:
+            source = self.source_record(src_file, os.stat(src_file), digest if data is None else None)
+        self.manifest_track(tgt_file, size, info, digest, source)
+
+    def source_record(self, src_file, st, digest=None):
+        "{path, size, mtime_ns, hash} of the source of a track, as stored in the manifest (see sync)"
+        return {
+            'path': os.path.abspath(str(src_file)),
+            'size': st.st_size,
+            'mtime_ns': st.st_mtime_ns,
+            'hash': digest
+        }
+
+    def copied(self, size, read=False):
+        "count a file written to the device (read: and its source, copied as is)"
+        self.metrics.count('files copied')
+        self.metrics.count('bytes written', size)
+        if read:
+            self.metrics.count('bytes read', size)
+
+    def plain_copy(self, src_file, tgt_file):
+        "copy the file as is (export, or before fixing the artwork on the device)"
+        self.progress.start(tgt_file)
+        with self.metrics.stage("copy"):
+            self.copy_file(src_file, tgt_file)
+        size = os.path.getsize(tgt_file)
+        self.copied(size, read=True)
+        self.progress.done(size, size)
+
+    def copy_file(self, src_file, tgt_file, hashed=False):
+        "copy the file, in chunks if the progress is shown. With hashed, return the sha1 of the content, computed while copying"
+        if not hashed and not self.progress.active:
+            shutil.copyfile(src_file, tgt_file)
+            return None
+
+        h = hashlib.sha1() if hashed else None
+        with open(src_file, "rb") as fsrc, open(tgt_file, "wb") as ftgt:
+            while True:
+                chunk = fsrc.read(self.COPY_CHUNK)
+                if not chunk:
+                    break
+                if h:
+                    h.update(chunk)
+                ftgt.write(chunk)
+                self.progress.advance(len(chunk))
+        return h.hexdigest() if h else None
+
+    def write_chunks(self, fd, data):
+        for offset in range(0, len(data), self.COPY_CHUNK):
+            chunk = data[offset:offset + self.COPY_CHUNK]
+            fd.write(chunk)
+            self.progress.advance(len(chunk))
+
+    def start_progress(self, label, sizes=()):
+        "progress of the copies (or moves) about to start, with the sizes of their sources (see progress)"
+        self.progress = Progress(label, self.progress_mode, self.progress_interval, verbose=self.verbose)
+        if self.progress.active:
+            self.progress.expect(sizes)
+        return self.progress
+
+    def end_progress(self):
+        self.progress.close()
+        self.progress = Progress()
+
+    def skipped(self, src_file):
+        "an expected copy that isn't needed (already on the device)"
+        if self.progress.active:
+            self.progress.skip(self.source_size(src_file))
+
+    def source_size(self, src_file):
         try:
-            mp3file = MP3(music_file, ID3=ID3)
-        except Exception as e:
-            print("check artwork Invalid MP3 file, skipping it: %s %s" % (music_file, e))
+            return os.path.getsize(src_file)
+        except OSError:
+            # it fails later, when copied
+            return 0
+
+    def file_hash(self, fname):
+        h = hashlib.sha1()
+        with self.metrics.stage("hash"), open(fname, "rb") as fd:
+            while True:
+                chunk = fd.read(self.COPY_CHUNK)
+                if not chunk:
+                    break
+                h.update(chunk)
+                self.metrics.count('bytes read', len(chunk))
+        return h.hexdigest()
+
+    def check_artwork(self, music_file, probe=None):
+        # change image things. If probe is given, use its already parsed tags
+        # (e.g. from the source file) and write them to music_file.
+        if not probe:
+            probe = TrackProbe(music_file)
+        if probe.parse().duration is None:
+            print("check artwork %s, skipping it: %s" % (probe.error, music_file))
             return
-        
-        tags = mp3file.tags
+
+        if self.fix_artwork(probe):
+            probe.save(music_file)
+
+    def fix_artwork(self, probe):
+        "resize (or remove, if invalid) the cover of the probed tags, in memory. Returns True if tags changed"
+        tags = probe.tags
         if not tags:
-            return 
-        if args.verbose > 2:
-            print("----", music_file)
+            return False
+        if self.verbose > 2:
+            print("----", probe.music_file)
             print(tags.pprint())
 
         if 'APIC:' in tags.keys():
-            # check if we need to resize it
-            
+            # check if we need to resize it (decided from the image header)
             picturetag = tags['APIC:']
             picturetag.type = 3
-            try:
-                im = Image.open(BytesIO(picturetag.data))
-            except Exception as e:
-                print("Invalid APIC entry, removing it: %s" % e)
-                mp3file.tags.delall("APIC") # Delete every APIC tag (Cover art)
-                mp3file.save()
-                return
-            
-            img_width,img_height = im.size
-            if img_width > self.MAX_IMG_WIDTH or img_height > self.MAX_IMG_HEIGHT:
-                if args.verbose > 2:
-                    print("Resizing from %s to %s" % (im.size, self.MAX_IMG_SZ))
-                im.thumbnail(self.MAX_IMG_SZ, Image.LANCZOS)
-                im = im.convert('RGB')
-                img_bytes = BytesIO()
-                im.save(img_bytes, format='JPEG', dpi=self.MAX_DPI,optimize=True, quality=50)
-                # rewind it, we need to read it :-D
-                img_bytes.seek(0)
-                #fname = pathlib.Path(music_file).stem
-                #im.save("%s.jpg" % fname, format='JPEG', dpi=self.MAX_DPI, optimize=True, quality=50)
-
-                mp3file.tags.delall("APIC") # Delete every APIC tag (Cover art)
-                mp3file.tags["APIC"] = APIC(
+            with self.metrics.stage("artwork"):
+                status, data = self.artwork.normalize(picturetag.data)
+
+            if status == artwork.INVALID:
+                print("Invalid APIC entry, removing it: %s" % probe.music_file)
+                tags.delall("APIC") # Delete every APIC tag (Cover art)
+                return True
+
+            if status == artwork.RESIZE:
+                from mutagen.id3 import APIC
+                if self.verbose > 2:
+                    print("Resized to %s" % (self.MAX_IMG_SZ,))
+                tags.delall("APIC") # Delete every APIC tag (Cover art)
+                tags["APIC"] = APIC(
                     encoding=3,
                     mime="image/jpeg",
                     type=3, desc=u'Cover',
-                    data=img_bytes.read()
+                    data=data
                 )
-                mp3file.save()        
+                return True
+
+        return False
 
     def list_dir(self,directory, ext=None):
-        items = []
-
-        for path, dirc, files in os.walk(directory):
-            for name in files:
-                
-                if ext and name.lower().endswith(ext):
-                    # build the relative path in this platform
-                    full_fname =  os.path.sep.join([path] + [name])
-                    local_fname = pathlib.Path(full_fname).relative_to(directory)
-                    items.append(local_fname)
-                if not ext:
-                    full_fname =  os.path.sep.join([path] + [name])
-                    local_fname = pathlib.Path(full_fname).relative_to(directory)
-                    items.append(local_fname)
-
-        return items
+        "generator of the relative paths of the files in directory (with ext), sorted"
+        for record in self.metrics.timed("walk", walk_files(directory, ext, sort=True, jobs=self.scan_jobs)):
+            yield pathlib.Path(record.rel)
     
     def list_songs(self):
+        manifest = self.jam_manifest()
+        if manifest and self.use_manifest:
+            return (pathlib.Path(rel) for rel in manifest.songs())
+
         directory = self.jam_music_dir()
         return self.list_dir(directory, self.extensions)
 
-    def list_playlists(self, playlist=None):
+    def list_playlists(self, playlist=None, missing=False):
+        "generator of the playlists, or of the songs of playlist (with missing, marking the ones not in Music)"
+        manifest = self.jam_manifest()
+        if manifest and self.use_manifest:
+            if not playlist:
+                yield from (pathlib.Path(name) for name in manifest.playlist_names())
+                return
+            name = manifest.find_playlist(playlist)
+            if name:
+                for rel in manifest.playlists[name]:
+                    fname = pathlib.Path(rel).name
+                    if missing and rel not in manifest.tracks:
+                        fname = "%s (missing)" % fname
+                    yield fname
+                return
+
         if not playlist:
             directory = self.jam_playlist_dir()
-            return self.list_dir(directory)
+            yield from self.list_dir(directory)
+            return
         
         target = self.guess_playlist(playlist)
-        playlist = self.read_playlist(target)
-        items = []
-        for i in playlist:
-            fname = i['file']
-            fname = self.from_jam_path(fname)
-            items.append(pathlib.Path(fname).name)
-
-        return items
+        for i in self.read_playlist(target):
+            fname = i.file
+            fname = pathlib.Path(self.from_jam_path(fname)).name
+            if missing and not self.find_in_music_dir(fname):
+                fname = "%s (missing)" % fname
+            yield fname
     
     def guess_playlist(self, playlist):
         target = self.jam_playlist_dir(playlist)
@@ -468,173 +1142,433 @@ class PlayListManager:
         dest =  "/".join([dirpath,A,B,name])
         return dest
 
-    def gen_hash(self, fname, src=None):
+    def gen_hash(self, fname, src=None, probe=None):
         "move the exiting playlists in device to a hashed one. Be careful with the paths"
         if not fname:
             raise ValueError("Can't generate hash from empty name")
 
         if src:
-            A,B,C = self.get_id3_info(src)
+            A,B,C = self.get_id3_info(src, probe)
         else:
-            A,B,C = self.get_id3_info(fname)
+            A,B,C = self.get_id3_info(fname, probe)
         dirpath  = str(pathlib.Path(fname).parent)
         name = pathlib.Path(fname).name
         dest =  "/".join([dirpath,A,B,C,name])
         return dest
 
-    def find_in_music_dir(self, entry):
-        directory = self.jam_music_dir()
-
-        for path, dirc, files in os.walk(directory):
-            for name in files:
-                full_fname =  os.path.sep.join([path] + [name])
-                if name.encode('utf-8') == entry.encode('utf-8'):
-                    return(full_fname)
+    def music_index(self):
+        "filename index of JAM_ROOT/Music, walked (or loaded from the snapshot) once per run"
+        if self.index is None:
+            with self.metrics.stage("index"):
+                self.index = MusicIndex(self.jam_music_dir(), self.index_file, self.verbose).load()
+        return self.index
 
-        return None
+    def index_added(self, fname):
+        # only if someone already loaded it, else it will be built with the file
+        if self.index is not None:
+            self.index.add(str(fname))
 
+    def index_moved(self, src, tgt):
+        if self.index is not None:
+            self.index.move(str(src), str(tgt))
 
-    def convert_playlist(self, playlist_data, playlist_name):
+    def find_in_music_dir(self, entry):
+        index = self.music_index()
+        with self.metrics.stage("index"):
+            return index.find(entry)
+
+    def jam_manifest(self):
+        "the manifest of the device, or None if the device doesn't have one (see reindex)"
+        if self.manifest is None:
+            with self.metrics.stage("manifest"):
+                self.manifest = JamManifest(self.jam_root).load()
+        if not self.manifest.exists:
+            return None
+        return self.manifest
+
+    def music_relpath(self, fname):
+        # path of a file in JAM_ROOT/Music, as stored in the manifest
+        return os.path.relpath(str(fname), self.jam_music_dir()).replace(os.path.sep, "/")
+
+    def jam_entry_relpath(self, entry):
+        # path of a playlist entry (..\Music\a\b.mp3) as stored in the manifest
+        try:
+            return self.jam_remove_music_dir(entry).as_posix()
+        except ValueError:
+            return self.from_jam_path(entry)
+
+    def manifest_track(self, fname, size, info=None, digest=None, source=None):
+        "record a track written to the device. size None: it was already there"
+        manifest = self.jam_manifest()
+        if not manifest:
+            return
+        rel = self.music_relpath(fname)
+        if size is None:
+            if rel in manifest.tracks:
+                if source:
+                    manifest.set_source(rel, source)
+                return
+            size = os.path.getsize(fname)
+        manifest.add_track(rel, size, info, digest, source, self.planned_audio.pop(rel, None))
+
+    def audio_index(self):
+        "audio fingerprint -> relative path of the track in Music with that audio (see dedup)"
+        if self.audio is None:
+            manifest = self.jam_manifest()
+            if not manifest:
+                print("%s doesn't have a manifest, building it" % self.jam_root)
+                manifest = self.reindex(hashed=False)
+            self.hash_device_audio(manifest)
+            self.audio = {}
+            for rel in sorted(manifest.tracks.keys()):
+                audio = manifest.tracks[rel].get('audio')
+                if audio:
+                    self.audio.setdefault(audio, rel)
+        return self.audio
+
+    def hash_device_audio(self, manifest, jobs=1):
+        "fingerprint the audio of the tracks of the manifest that don't have it yet, on jobs threads"
+        music_dir = self.jam_music_dir()
+        missing = [ rel for rel, entry in manifest.tracks.items() if not entry.get('audio') ]
+        if self.verbose and missing:
+            print("hashing the audio of %d tracks" % len(missing))
+        # only here: the audio is only hashed with --dedup and by dedupe
+        from dedup import audio_hashes
+        with self.metrics.stage("audio hash"):
+            for rel, (fname, audio) in zip(missing, audio_hashes([ os.path.join(music_dir, rel) for rel in missing ], jobs)):
+                if audio:
+                    manifest.set_audio(rel, audio)
+                    self.metrics.count('audio hashed')
+
+    def dedup_target(self, src_file, tgt_file):
+        "the track of the device with the same audio as src_file, else tgt_file (that will have it)"
+        from dedup import safe_audio_hash
+        index = self.audio_index()
+        with self.metrics.stage("audio hash"):
+            audio = safe_audio_hash(src_file)
+        if audio is None:
+            return tgt_file
+        rel = index.get(audio)
+        if rel:
+            same = pathlib.Path(self.jam_music_dir(), rel)
+            if os.path.exists(same):
+                if self.verbose:
+                    print("same audio as %s: %s" % (same, src_file))
+                self.metrics.count('duplicates')
+                return same
+        rel = self.music_relpath(tgt_file)
+        index[audio] = rel
+        self.planned_audio[rel] = audio
+        return tgt_file
+
+    def dedupe(self, jobs=1, dry_run=False):
+        """point the playlists of the device to one copy of each audio, and remove the other copies.
+        Returns the bytes reclaimed"""
+        manifest = self.jam_manifest()
+        if not manifest:
+            print("%s doesn't have a manifest, building it" % self.jam_root)
+            manifest = self.reindex(hashed=False)
+        self.hash_device_audio(manifest, jobs)
+
+        music_dir = self.jam_music_dir()
+        copies = {}
+        for rel, entry in manifest.tracks.items():
+            if entry.get('audio') and os.path.exists(os.path.join(music_dir, rel)):
+                copies.setdefault(entry['audio'], []).append(rel)
+        uses = {}
+        for rels in manifest.playlists.values():
+            for rel in rels:
+                uses[rel] = uses.get(rel, 0) + 1
+        # duplicate -> the copy that stays: the one most playlists use, then the first by name
+        keep = {}
+        for rels in copies.values():
+            if len(rels) < 2:
+                continue
+            kept = min(rels, key=lambda rel: (-uses.get(rel, 0), rel))
+            for rel in rels:
+                if rel != kept:
+                    keep[rel] = kept
+
+        # the playlists first: if this is interrupted, the copies left are just not used
+        playlists = 0
+        for name, rels in sorted(manifest.playlists.items()):
+            if not any(rel in keep for rel in rels):
+                continue
+            playlists += 1
+            playlist_data = list(self.read_playlist(os.path.join(self.jam_playlist_dir(), name)))
+            for item in playlist_data:
+                rel = self.jam_entry_relpath(item.file)
+                if rel in keep:
+                    item.file = self.jam_music_entry_dir(os.path.join(music_dir, keep[rel]))
+            if self.verbose:
+                print("rewriting %s" % name)
+            if not dry_run:
+                self.gen_m3u_playlist(playlist_data, name)
+
+        reclaimed = 0
+        for rel in sorted(keep.keys()):
+            fname = os.path.join(music_dir, rel)
+            if self.verbose:
+                print("%s: same audio as %s" % (rel, keep[rel]))
+            reclaimed += manifest.tracks[rel]['size']
+            if dry_run:
+                continue
+            os.remove(fname)
+            manifest.remove_track(rel)
+            if self.index is not None:
+                self.index.remove(fname)
+        self.audio = None
+
+        print("dedupe: %d duplicates of %d songs, %d playlists %s, %d bytes %s" % (
+              len(keep), len(set(keep.values())), playlists, "to rewrite" if dry_run else "rewritten",
+              reclaimed, "to reclaim" if dry_run else "reclaimed"))
+        return reclaimed
+
+    def gc(self, dry_run=False):
+        """remove the songs of Music that no playlist uses, and the directories left empty. One pass over the
+        playlists, one over Music. Returns the bytes reclaimed"""
+        journal = Journal(self.jam_root).load()
+        if journal.unfinished():
+            # its copies may not be in a playlist yet
+            raise ValueError("found an unfinished %s of %s, finish it (--resume) or rollback before gc" % (
+                             journal.command, journal.params.get('playlist')))
+
+        music_dir = self.jam_music_dir()
+        prefix = normalize_name("../%s/" % self.MUSIC_DIR)
+        def key(entry):
+            # as the device finds them: case and unicode normalization don't matter
+            entry = self.from_jam_path(entry)
+            if os.path.isabs(entry):
+                entry = os.path.relpath(entry, music_dir).replace(os.path.sep, "/")
+                return normalize_name(entry)
+            entry = normalize_name(entry)
+            return entry[len(prefix):] if entry.startswith(prefix) else entry
+
+        referenced = set()
+        playlists = 0
+        for record in walk_files(self.jam_playlist_dir(), ('.m3u', '.m3u8')):
+            referenced.update(key(item.file) for item in self.read_playlist(record.path))
+            playlists += 1
+
+        manifest = self.jam_manifest()
+        songs = reclaimed = 0
+        # directories removed (or to remove), for their parents: bottom-up
+        removed = set()
+        with self.metrics.stage("walk"):
+            for directory, subdirs, files in os.walk(music_dir, topdown=False):
+                # any other file (a cover, .DS_Store) keeps the directory
+                left = len(files)
+                for name in files:
+                    if not name.lower().endswith(self.extensions):
+                        continue
+                    fname = os.path.join(directory, name)
+                    rel = self.music_relpath(fname)
+                    if normalize_name(rel) in referenced:
+                        continue
+                    try:
+                        size = os.path.getsize(fname)
+                    except OSError:
+                        continue
+                    if self.verbose:
+                        print("not in any playlist: %s (%d bytes)" % (rel, size))
+                    songs += 1
+                    reclaimed += size
+                    left -= 1
+                    if dry_run:
+                        continue
+                    os.remove(fname)
+                    if manifest:
+                        manifest.remove_track(rel)
+                    if self.index is not None:
+                        self.index.remove(fname)
+
+                if directory == music_dir or left or not all(os.path.join(directory, d) in removed for d in subdirs):
+                    continue
+                if not dry_run:
+                    try:
+                        os.rmdir(directory)
+                    except OSError:
+                        continue
+                    if self.index is not None:
+                        self.index.remove_dir(directory)
+                removed.add(directory)
+                if self.verbose:
+                    print("empty directory: %s" % directory)
+
+        if not dry_run:
+            self.metrics.count('files removed', songs)
+        print("gc: %d playlists, %d songs in no playlist, %d bytes and %d empty directories %s" % (
+              playlists, songs, reclaimed, len(removed), "to remove" if dry_run else "removed"))
+        return reclaimed
+
+    def track_moved(self, src, tgt):
+        self.index_moved(src, tgt)
+        manifest = self.jam_manifest()
+        if manifest:
+            manifest.move_track(self.music_relpath(src), self.music_relpath(tgt))
+
+    def reindex(self, hashed=True):
+        "build the manifest of the device from scratch: walk Music and read all the playlists"
+        manifest = JamManifest(self.jam_root)
+        music_dir = self.jam_music_dir()
+        for record in self.metrics.timed("walk", walk_files(music_dir, self.extensions, stat=True, jobs=self.scan_jobs)):
+            if self.verbose:
+                print("indexing %s" % record.path)
+            digest = self.file_hash(record.path) if hashed else None
+            manifest.add_track(record.rel, record.size, self.get_track_info(record.path), digest)
+
+        for record in walk_files(self.jam_playlist_dir(), ('.m3u', '.m3u8')):
+            data = self.read_playlist(record.path)
+            manifest.set_playlist(record.rel, [ self.jam_entry_relpath(item.file) for item in data ])
+
+        manifest.save(force=True)
+        self.manifest = manifest
+        return manifest
+
+    def prune_cache(self):
+        "drop the tag cache entries of the songs not in Music anymore (moved, renamed or removed). Returns how many"
+        if not self.cache:
+            return 0
+        with self.metrics.stage("cache"):
+            pruned = self.cache.prune(self.jam_music_dir())
+        if pruned:
+            self.metrics.count('cache entries pruned', pruned)
+        return pruned
+
+    def verify_manifest(self, hashed=False):
+        "compare the manifest with the device. Returns the list of differences"
+        manifest = self.jam_manifest()
+        if not manifest:
+            raise ValueError("%s doesn't have a manifest, run reindex first" % self.jam_root)
+
+        drift = []
+        music_dir = self.jam_music_dir()
+        # relative path -> size
+        on_device = { record.rel: record.size for record in self.metrics.timed("walk", walk_files(music_dir, self.extensions, stat=True, jobs=self.scan_jobs)) }
+        for rel in manifest.songs():
+            entry = manifest.tracks[rel]
+            fname = os.path.join(music_dir, rel)
+            if rel not in on_device:
+                drift.append("missing track: %s" % rel)
+            elif on_device[rel] != entry['size']:
+                drift.append("changed size: %s" % rel)
+            elif hashed and entry.get('hash') and self.file_hash(fname) != entry['hash']:
+                drift.append("changed content: %s" % rel)
+        for rel in sorted(set(on_device) - set(manifest.tracks.keys())):
+            drift.append("untracked track: %s" % rel)
+
+        playlist_dir = self.jam_playlist_dir()
+        on_device = set(record.rel for record in walk_files(playlist_dir, ('.m3u', '.m3u8')))
+        for name in manifest.playlist_names():
+            if name not in on_device:
+                drift.append("missing playlist: %s" % name)
+                continue
+            data = self.read_playlist(os.path.join(playlist_dir, name))
+            if [ self.jam_entry_relpath(item.file) for item in data ] != manifest.playlists[name]:
+                drift.append("changed playlist: %s" % name)
+        for name in sorted(on_device - set(manifest.playlists.keys())):
+            drift.append("untracked playlist: %s" % name)
+
+        return drift
+
+
+    def convert_playlist(self, playlist_data, playlist_name, resume=False):
         new_playlist = []
+        moves = []
+        journal = self.open_journal("convert", playlist_name, resume)
+        # targets planned by the interrupted run, no need to read the tags again
+        planned = journal.planned("move")
+        if self.jobs > 1:
+            # read the tags gen_hash needs ahead, on the process pool
+            playlist_data = list(playlist_data)
+            sources = [ self.jam_abs_music_entry_dir(pathlib.Path(self.from_jam_path(item.file)).name) for item in playlist_data ]
+            sources = [ src_name for src_name in sources if src_name not in planned and os.path.exists(src_name) ]
+            self.probed = dict(self.probe_files(sources))
 
         for item in playlist_data:
             # get the entry, build the absolute path
-            fname = pathlib.Path(self.from_jam_path(item['file'])).name
+            fname = pathlib.Path(self.from_jam_path(item.file)).name
             src_name = self.jam_abs_music_entry_dir(fname)
             if not os.path.exists(src_name):
                 # I have to find it on the directory, because a bad migration happen
                 # so find it and update the list
-                    src_name = self.find_in_music_dir(fname)
+                    src_name = planned.get(src_name)
+                    if not src_name or not os.path.exists(src_name):
+                        src_name = self.find_in_music_dir(fname)
                     if not src_name:
                         #last
                         raise ValueError("File %s can't be found" % fname)
                     plist_file = self.to_jam_path("..\\%s" % pathlib.Path(src_name).relative_to(self.jam_root))
             else:
                 # legit file, so move it
-                tgt_name = self.gen_hash(src_name)  
+                tgt_name = planned.get(src_name) or self.gen_hash(src_name)
                 tgt_dir = pathlib.Path(tgt_name).parent
                 plist_file = self.to_jam_path("..\\%s" % pathlib.Path(tgt_name).relative_to(self.jam_root))
                 if  not os.path.exists(tgt_dir):
                     #print("creating %s" % tgt_dir)
                     os.makedirs(tgt_dir, exist_ok=True)
-                
-                try:
-                    if not os.path.exists(tgt_name):
-                        shutil.move(src_name, tgt_name)
-                except shutil.SameFileError:
-                    pass
 
-            item['file'] = plist_file
+                if not os.path.exists(tgt_name) and (src_name, tgt_name) not in moves:
+                    moves.append((src_name, tgt_name))
+
+            item.file = plist_file
             new_playlist.append(item)
 
+        self.probed = {}
+        self.journaled_moves(journal, moves)
         self.gen_m3u_playlist(new_playlist, playlist_name)
+        journal.end()
+
+    def journaled_moves(self, journal, moves):
+        "all the moves are in the journal (on disk) before the first one is done"
+        with self.metrics.stage("journal"):
+            plan_ids = [ journal.plan("move", src, tgt) for src, tgt in moves ]
+            journal.sync()
+        # in the same filesystem they are renames: only files count
+        progress = self.start_progress("moving", [ 0 ] * len(moves))
+        try:
+            for plan_id, (src_name, tgt_name) in zip(plan_ids, moves):
+                progress.start(tgt_name)
+                try:
+                    with self.metrics.stage("move"):
+                        shutil.move(src_name, tgt_name)
+                    self.metrics.count('files moved')
+                    self.track_moved(src_name, tgt_name)
+                except shutil.SameFileError:
+                    pass
+                journal.done(plan_id)
+                progress.done()
+        finally:
+            # the status line is not left half written on an error
+            self.end_progress()
 
 
-    def revert_playlist(self, playlist_data, playlist_name):
+    def revert_playlist(self, playlist_data, playlist_name, resume=False):
         new_playlist = []
+        moves = []
+        journal = self.open_journal("revert", playlist_name, resume)
 
         for item in playlist_data:
 
             # get the entry, build the absolute path
-            fname = pathlib.Path(self.from_jam_path(item['file']))
+            fname = pathlib.Path(self.from_jam_path(item.file))
             src_name = self.jam_abs_music_entry_dir(self.jam_remove_music_dir(str(fname)))
             tgt_name =  self.jam_abs_music_entry_dir(fname.name)
             plist_file = self.to_jam_path("..\\%s" % pathlib.Path(tgt_name).relative_to(self.jam_root))
-            try:
-                if not os.path.exists(tgt_name):
-                    shutil.move(src_name, tgt_name)
-            except shutil.SameFileError:
-                pass
-            item['file'] = plist_file
+            if not os.path.exists(src_name) and not os.path.exists(tgt_name):
+                # not where the playlist says, find it by name
+                src_name = self.find_in_music_dir(fname.name) or src_name
+            if not os.path.exists(tgt_name) and (src_name, tgt_name) not in moves:
+                moves.append((src_name, tgt_name))
+            item.file = plist_file
             new_playlist.append(item)
 
+        self.journaled_moves(journal, moves)
         self.gen_m3u_playlist(new_playlist, playlist_name)
+        journal.end()
 
 
 if __name__ == "__main__":
-
-    parser = argparse.ArgumentParser()
-    parser.add_argument("-v", "--verbose", help="Show data about file and processing", action="count", default=0)
-    parser.add_argument("-j", "--jam-root", help="Jam Sport Plus root directory (e.g. /Volumes/SPORT PLUS) or D:\\", default=None)
-    subparsers = parser.add_subparsers(dest="subparser_name", help='Command help')
-
-    p_convert = subparsers.add_parser("convert", help="Convert a existing playlist to the new format")
-    p_convert.add_argument("playlist", help="Convert from plain dir to hashed one")
-
-    p_convert = subparsers.add_parser("revert", help="Revert a existing playlist to the old format")
-    p_convert.add_argument("playlist", help="Convert from hashed dir to plain one")
-
-    p_process = subparsers.add_parser("process",help="Create the playlist from an existing directory with music (recursive)")
-    p_process.add_argument("directory", help="Directory to create the playlist (inside $JAM_ROOT/Music) (use . to create playlist for all the music)")
-    p_process.add_argument("playlist", help="Play list name")
-
-    p_migrate = subparsers.add_parser("migrate",help="Migrate a exiting playlist to the jam")
-    p_migrate.add_argument("source_playlist", help="Read the playlist from this source")
-    p_migrate.add_argument("playlist", help="Store the playlist as <playlist>")
-
-    p_export = subparsers.add_parser("export",help="Migrate a playlist from the jam to a directory")
-    p_export.add_argument("playlist", help="Read the playlist playlist")
-    p_export.add_argument("target_dir", help="Store the items in directory <target_dir>")
-
-    p_list_songs = subparsers.add_parser("list_songs",help="List available songs in $JAM_ROOT/Music")
-    p_list_playlists = subparsers.add_parser("list_playlists",help="List available playlists $JAM_ROOT/Playlists")
-    p_list_playlists.add_argument("playlist", help="list also the songs on that playlist", default=None, nargs="?")
-    args = parser.parse_args()
-
-    pm = PlayListManager(args.verbose)
-    args.jam_root = pm.check_platform(args.jam_root)
-    if not args.jam_root or not os.path.exists(args.jam_root):
-        raise ValueError("please set a valid --jam-root directory: %s" % args.jam_root)
-
-
-    if args.subparser_name == "revert":
-        playlist = pm.guess_playlist(args.playlist)
-        playlist_data = pm.read_playlist(playlist)
-        pm.revert_playlist(playlist_data, args.playlist)
-        sys.exit(0)
-
-    if args.subparser_name == "convert":
-        playlist = pm.guess_playlist(args.playlist)
-        playlist_data = pm.read_playlist(playlist)
-        pm.convert_playlist(playlist_data, args.playlist)
-        sys.exit(0)
-
-    if args.subparser_name == "process":
-        # create a playlist in the directory pm.jam_root/Music/args.directory`
-        playlist_data = pm.build_playlist_from_directory(args.directory)
-        pm.store_playlist(playlist_data, args.playlist, format='m3u')
-        sys.exit(0)
-
-    if args.subparser_name == "migrate":
-        # migrate a current existing playlist to the jam, moving the music, and creating the playlist.
-        playlist_data = pm.read_playlist(args.source_playlist)
-        pm.migrate_playlist(playlist_data, args.playlist, args.source_playlist)
-        sys.exit(0)
-
-    if args.subparser_name == "export":
-        # export the playlist to the directory target_directory
-        playlist_data = pm.read_jam_playlist(args.playlist)
-        pm.export_playlist(playlist_data, args.playlist, args.target_dir)
-        sys.exit(0)
-
-    if args.subparser_name == "list_songs":
-        # migrate a current existing playlist to the jam, moving the music, and creating the playlist.
-        songs = pm.list_songs()
-        for s in songs:
-            print("%s" % s)
-        print("Total: %d songs" % len(songs))
-        sys.exit(0)
-
-    if args.subparser_name == "list_playlists":
-        # migrate a current existing playlist to the jam, moving the music, and creating the playlist.
-        playlists = pm.list_playlists(args.playlist)
-        for p in playlists:
-            print("%s" % p)
-        if not args.playlist:
-            print("Total: %d playlists" % len(playlists))
-        else:
-            print("Total: %d songs in '%s' playlist" % (len(playlists),args.playlist))
-        sys.exit(0)
-
-
-    
\ No newline at end of file
+    # the commands are in jam_cli (python3 jam_cli.py skips compiling this file on each run)
+    from jam_cli import main
+    main()
@@ -1,14 +1,4 @@
-python3.9 gen_playlist_jam.py -vvv  -m dev/itunes-mac/A20.m3u8 A20
-python3.9 gen_playlist_jam.py -vvv  -m dev/itunes-mac/BIKE.m3u8 BIKE
-python3.9 gen_playlist_jam.py -vvv  -m dev/itunes-mac/Enemigos.m3u8 Enemigos
-python3.9 gen_playlist_jam.py -vvv  -m dev/itunes-mac/Enero14.m3u8 Enero14
-python3.9 gen_playlist_jam.py -vvv  -m dev/itunes-mac/"Esqui de travesia.m3u8" EsquiTravesia
-python3.9 gen_playlist_jam.py -vvv  -m dev/itunes-mac/JULIO_2018.m3u8 JULIO_2018
-python3.9 gen_playlist_jam.py -vvv  -m dev/itunes-mac/ROAD.m3u8 ROAD
-python3.9 gen_playlist_jam.py -vvv  -m dev/itunes-mac/RUNNING_2018.m3u8 RUNNING_2018
-python3.9 gen_playlist_jam.py -vvv  -m dev/itunes-mac/"Running SS.m3u8" RunningSS
-python3.9 gen_playlist_jam.py -vvv  -m dev/itunes-mac/Workout.m3u8 Workout
-python3.9 gen_playlist_jam.py -vvv  -m dev/itunes-mac/laultima.m3u8 laultima
-python3.9 gen_playlist_jam.py -vvv  -m dev/itunes-mac/nano.m3u8 nano
-python3.9 gen_playlist_jam.py -vvv  -m dev/itunes-mac/ro-1.m3u8 ro-1
-
+python3.9 gen_playlist_jam.py -vvv migrate-all dev/itunes-mac/A20.m3u8 dev/itunes-mac/BIKE.m3u8 dev/itunes-mac/Enemigos.m3u8 \
+    dev/itunes-mac/Enero14.m3u8 "dev/itunes-mac/Esqui de travesia.m3u8=EsquiTravesia" dev/itunes-mac/JULIO_2018.m3u8 \
+    dev/itunes-mac/ROAD.m3u8 dev/itunes-mac/RUNNING_2018.m3u8 "dev/itunes-mac/Running SS.m3u8=RunningSS" \
+    dev/itunes-mac/Workout.m3u8 dev/itunes-mac/laultima.m3u8 dev/itunes-mac/nano.m3u8 dev/itunes-mac/ro-1.m3u8
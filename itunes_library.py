@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+# /////////////////////////////////////////////////////////////////////////////
+# //
+# // itunes_library.py
+# //
+# // streaming reader of the iTunes / Music "Library.xml" (plist). The file
+# // is parsed element by element (iterparse) and each track / playlist is
+# // dropped once read, so a big library is never loaded whole.
+# //
+# // 18/10/2026 16:02:17
+# // (c) 2026 Juan M. Casillas <juanm.casillas@gmail.com>
+# //
+# /////////////////////////////////////////////////////////////////////////////
+
+import os
+import xml.etree.ElementTree as ET
+from urllib.parse import urlparse, unquote
+from track import Track
+
+# the library doesn't know about the cover, so the file is checked when copied
+UNKNOWN_ARTWORK = "unknown"
+
+
+def plist_value(elem):
+    "python value of a plist element"
+    tag = elem.tag
+    if tag == 'dict':
+        children = list(elem)
+        return { children[i].text: plist_value(children[i + 1]) for i in range(0, len(children) - 1, 2) }
+    if tag == 'array':
+        return [ plist_value(child) for child in elem ]
+    if tag == 'integer':
+        return int(elem.text)
+    if tag == 'real':
+        return float(elem.text)
+    if tag == 'true':
+        return True
+    if tag == 'false':
+        return False
+    return elem.text or ""
+
+
+def location_path(location):
+    "file:///Users/me/Music/a%20b.mp3 -> /Users/me/Music/a b.mp3 (None if it's not a local file)"
+    url = urlparse(location)
+    if url.scheme != "file":
+        return None
+    path = unquote(url.path)
+    if os.name == 'nt':
+        # file://localhost/C:/Users/...
+        path = path.lstrip("/").replace("/", "\\")
+    return path
+
+
+class ItunesLibrary:
+    # playlists iTunes keeps by itself (Library, Music, Movies...) and folders
+    SYSTEM_KEYS = ('Master', 'Distinguished Kind', 'Folder')
+
+    def __init__(self, library_file, verbose=False):
+        if not os.path.exists(library_file):
+            raise ValueError("library file %s doesn't exists" % library_file)
+        self.library_file = library_file
+        self.verbose = verbose
+        # track id -> (path, name, artist, album, genre, duration), a tuple as there can be many
+        self.tracks = {}
+
+    def add_track(self, track):
+        path = location_path(track.get('Location', ""))
+        if not path:
+            return
+        duration = track.get('Total Time')
+        self.tracks[track['Track ID']] = (path, track.get('Name'), track.get('Artist'), track.get('Album'), track.get('Genre'),
+                                          duration / 1000.0 if duration is not None else None)
+
+    def playlist_items(self, name, track_ids):
+        "the playlist as Tracks (read_playlist), with the tags from the library in info"
+        items = []
+        for track_id in track_ids:
+            track = self.tracks.get(track_id)
+            if not track:
+                # not a local file (streamed, or in the cloud)
+                if self.verbose:
+                    print("Warning: track %s of %s is not a local file, skipping" % (track_id, name))
+                continue
+            path, title, artist, album, genre, duration = track
+            info = {
+                'title': title,
+                'artist': artist,
+                'album': album,
+                'genre': genre,
+                'duration': duration,
+                'artwork': UNKNOWN_ARTWORK,
+                'error': None
+            }
+            # title as iTunes exports it
+            items.append(Track("%s - %s" % (title, artist) if artist else title, path, path,
+                               int(duration) if duration is not None else -1, info))
+        return items
+
+    def playlists(self, names=None):
+        "generator of (name, items) of the playlists in names, or all the user playlists"
+        stack = []
+        section = None
+        tracks_read = False
+        # track ids of the playlist being read (the Library one has all of them)
+        track_ids = []
+        # playlists found before the tracks (iTunes writes the tracks first)
+        pending = []
+        for event, elem in ET.iterparse(self.library_file, events=("start", "end")):
+            if event == "start":
+                stack.append(elem)
+                continue
+
+            stack.pop()
+            # 0: plist, 1: the library dict, 2: its keys and values, 3: tracks and playlists,
+            # 5: the items of a playlist
+            level = len(stack)
+            if level == 2 and elem.tag == 'key':
+                section = elem.text
+            elif level == 5 and elem.tag == 'dict' and section == 'Playlists':
+                track_ids.append(plist_value(elem).get('Track ID'))
+            elif level == 3 and elem.tag == 'dict':
+                if section == 'Tracks':
+                    self.add_track(plist_value(elem))
+                    tracks_read = True
+                elif section == 'Playlists':
+                    playlist = plist_value(elem)
+                    name = playlist.get('Name')
+                    if names is None:
+                        wanted = not any(playlist.get(key) for key in self.SYSTEM_KEYS)
+                    else:
+                        wanted = name in names
+                    if wanted and tracks_read:
+                        yield name, self.playlist_items(name, track_ids)
+                    elif wanted:
+                        pending.append((name, track_ids))
+                    track_ids = []
+
+            # already used: drop it, so the memory doesn't grow with the file
+            if level in (3, 5) or (level == 2 and elem.tag != 'key'):
+                elem.clear()
+                stack[-1].remove(elem)
+
+        for name, ids in pending:
+            yield name, self.playlist_items(name, ids)
+
+    def playlist_names(self):
+        "(name, songs) of the user playlists"
+        return [ (name, len(items)) for name, items in self.playlists() ]
@@ -0,0 +1,345 @@
+# -*- coding: utf-8 -*-
+# /////////////////////////////////////////////////////////////////////////////
+# //
+# // jam_cli.py
+# //
+# // command line of gen_playlist_jam.py: the options, and the commands
+# // run on a PlayListManager. Only what every command needs is imported
+# // here; mutagen, PIL, the tag cache (sqlite) and the pools are loaded
+# // by the commands that use them, so the listings start fast.
+# //
+# // usage: python3 gen_playlist_jam.py [options] command ..., or
+# //        python3 jam_cli.py [options] command ... (the same, without
+# //        compiling gen_playlist_jam.py on each run)
+# //
+# // 18/10/2026 22:06:51
+# // (c) 2026 Juan M. Casillas <juanm.casillas@gmail.com>
+# //
+# /////////////////////////////////////////////////////////////////////////////
+
+import os
+import sys
+import atexit
+import hashlib
+import argparse
+import jam_client
+from gen_playlist_jam import PlayListManager
+from tag_cache import TagCache, user_cache_dir
+from artwork import ArtworkEngine, ArtworkCache
+from pipeline import MigrationPipeline
+from journal import Journal
+from manifest import JamManifest
+from metrics import Metrics
+from progress import Progress
+from watcher import PollWatcher
+
+# the commands that read the tags of the files (and so open the tag cache)
+TAG_COMMANDS = ("convert", "process", "migrate", "migrate-all", "migrate-library", "sync", "watch", "reindex", "gc", "dedupe")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-v", "--verbose", help="Show data about file and processing", action="count", default=0)
+    parser.add_argument("-j", "--jam-root", help="Jam Sport Plus root directory (e.g. /Volumes/SPORT PLUS) or D:\\", default=None)
+    parser.add_argument("--no-cache", help="Don't use the persistent tag cache", action="store_true", default=False)
+    parser.add_argument("--rebuild-cache", help="Drop the tag cache and build it again", action="store_true", default=False)
+    parser.add_argument("--cache-file", help="Tag cache file (default: user cache dir)", default=None)
+    parser.add_argument("--art-cache-mb", help="Memory used to keep resized covers (default %d MB)" % (ArtworkCache.MEMORY_LIMIT // (1024*1024)), type=int, default=ArtworkCache.MEMORY_LIMIT // (1024*1024))
+    parser.add_argument("--art-disk-cache", help="Keep the resized covers also on disk (user cache dir)", action="store_true", default=False)
+    parser.add_argument("--art-cache-dir", help="Keep the resized covers on disk in this directory", default=None)
+    parser.add_argument("--art-disk-cache-mb", help="Max size of the covers on disk (default 256 MB)", type=int, default=256)
+    parser.add_argument("--scan-jobs", help="Threads listing directories ahead when walking the device (slow mounts) (default 1)", type=int, default=1)
+    parser.add_argument("--no-manifest", help="List songs and playlists walking the device, not from its manifest", action="store_true", default=False)
+    parser.add_argument("--metrics-json", help="Write the times of the stages, counters and throughput of the command to this JSON file (- for stdout)", default=None)
+    parser.add_argument("--profile", help="Profile the command (main thread) with cProfile, and write the stats (pstats) to this file", default=None)
+    parser.add_argument("--progress", help="Progress of the copies and moves: a status line (bar), JSON lines (lines), none, or auto: the status line on a terminal (without -v), else lines (default auto)", choices=("auto", "bar", "lines", "none"), default="auto")
+    parser.add_argument("--progress-interval", help="Seconds between progress lines (default %d)" % Progress.LINES_INTERVAL, type=float, default=None)
+    parser.add_argument("--dedup", help="Store each song once: migrate, sync and watch point to the copy already in the device with the same audio (other tags or name)", action="store_true", default=False)
+    subparsers = parser.add_subparsers(dest="subparser_name", help='Command help')
+
+    p_convert = subparsers.add_parser("convert", help="Convert a existing playlist to the new format")
+    p_convert.add_argument("playlist", help="Convert from plain dir to hashed one")
+    p_convert.add_argument("--resume", help="Continue an interrupted convert of this playlist", action="store_true", default=False)
+    p_convert.add_argument("--jobs", help="Processes reading the tags of the files not in the tag cache (default 1, sequential)", type=int, default=1)
+
+    p_convert = subparsers.add_parser("revert", help="Revert a existing playlist to the old format")
+    p_convert.add_argument("playlist", help="Convert from hashed dir to plain one")
+    p_convert.add_argument("--resume", help="Continue an interrupted revert of this playlist", action="store_true", default=False)
+
+    subparsers.add_parser("rollback", help="Undo an interrupted migrate, convert or revert ($JAM_ROOT/%s)" % Journal.JOURNAL_FILE)
+
+    p_process = subparsers.add_parser("process",help="Create the playlist from an existing directory with music (recursive)")
+    p_process.add_argument("directory", help="Directory to create the playlist (inside $JAM_ROOT/Music) (use . to create playlist for all the music)")
+    p_process.add_argument("playlist", help="Play list name")
+    p_process.add_argument("--fast-probe", help="Read the duration from the MPEG headers only, not parsing the whole file", action="store_true", default=False)
+    p_process.add_argument("--jobs", help="Processes reading the tags of the files not in the tag cache (default 1, sequential)", type=int, default=1)
+
+    p_migrate = subparsers.add_parser("migrate",help="Migrate a exiting playlist to the jam")
+    p_migrate.add_argument("source_playlist", help="Read the playlist from this source")
+    p_migrate.add_argument("playlist", help="Store the playlist as <playlist>")
+    p_migrate.add_argument("--resume", help="Continue an interrupted migrate of this playlist", action="store_true", default=False)
+    p_migrate.add_argument("--rewrite-on-device", help="Copy the file, then fix the artwork on the device (old behaviour)", action="store_true", default=False)
+    p_migrate.add_argument("--jobs", help="Artwork workers (threads, and processes resizing the covers) (default 1, sequential)", type=int, default=1)
+    p_migrate.add_argument("--io-jobs", help="Writer threads copying to the device (default 1, sequential)", type=int, default=1)
+    p_migrate.add_argument("--max-inflight", help="Max MB of files read but not yet written (default %d)" % (MigrationPipeline.MAX_INFLIGHT // (1024*1024)), type=int, default=MigrationPipeline.MAX_INFLIGHT // (1024*1024))
+
+    p_migrate_all = subparsers.add_parser("migrate-all",help="Migrate many playlists at once, copying each song only once")
+    p_migrate_all.add_argument("sources", help="Playlist files, directories with playlists, or globs. file=name stores file as <name>", nargs="+")
+    p_migrate_all.add_argument("--resume", help="Continue an interrupted migrate-all of the same playlists", action="store_true", default=False)
+    p_migrate_all.add_argument("--jobs", help="Artwork workers (threads, and processes resizing the covers) (default 1, sequential)", type=int, default=1)
+    p_migrate_all.add_argument("--io-jobs", help="Writer threads copying to the device (default 1, sequential)", type=int, default=1)
+    p_migrate_all.add_argument("--max-inflight", help="Max MB of files read but not yet written (default %d)" % (MigrationPipeline.MAX_INFLIGHT // (1024*1024)), type=int, default=MigrationPipeline.MAX_INFLIGHT // (1024*1024))
+
+    p_migrate_library = subparsers.add_parser("migrate-library",help="Migrate the playlists of the iTunes / Music Library.xml")
+    p_migrate_library.add_argument("library", help="iTunes Library.xml (File > Library > Export Library)")
+    p_migrate_library.add_argument("playlists", help="Playlists to migrate (default: all)", nargs="*")
+    p_migrate_library.add_argument("--list", help="List the playlists of the library and exit", action="store_true", default=False)
+    p_migrate_library.add_argument("--resume", help="Continue an interrupted migrate-library of the same playlists", action="store_true", default=False)
+    p_migrate_library.add_argument("--jobs", help="Artwork workers (threads, and processes resizing the covers) (default 1, sequential)", type=int, default=1)
+    p_migrate_library.add_argument("--io-jobs", help="Writer threads copying to the device (default 1, sequential)", type=int, default=1)
+    p_migrate_library.add_argument("--max-inflight", help="Max MB of files read but not yet written (default %d)" % (MigrationPipeline.MAX_INFLIGHT // (1024*1024)), type=int, default=MigrationPipeline.MAX_INFLIGHT // (1024*1024))
+
+    p_sync = subparsers.add_parser("sync",help="Migrate only the new or changed tracks of a playlist already in the jam")
+    p_sync.add_argument("source_playlist", help="Read the playlist from this source")
+    p_sync.add_argument("playlist", help="Store the playlist as <playlist>")
+    p_sync.add_argument("--check", help="How to detect changed sources (default mtime: size and mtime)", choices=("mtime", "hash"), default="mtime")
+    p_sync.add_argument("--prune", help="Remove the tracks dropped from the playlist, if no other playlist uses them", action="store_true", default=False)
+
+    p_watch = subparsers.add_parser("watch",help="Sync the playlists, and again each time they (or their songs) change")
+    p_watch.add_argument("sources", help="Playlist files, directories with playlists, or globs. file=name stores file as <name>", nargs="+")
+    p_watch.add_argument("--music", help="Also watch this music directory for changed songs (e.g. retagged) (can be repeated)", action="append", default=[])
+    p_watch.add_argument("--check", help="How to detect changed sources (default mtime: size and mtime)", choices=("mtime", "hash"), default="mtime")
+    p_watch.add_argument("--prune", help="Remove the tracks dropped from the playlists, if no other playlist uses them", action="store_true", default=False)
+    p_watch.add_argument("--debounce", help="Seconds without changes before syncing (default 1)", type=float, default=1.0)
+    p_watch.add_argument("--poll", help="Poll the files, instead of inotify (network shares)", action="store_true", default=False)
+    p_watch.add_argument("--interval", help="Seconds between polls (default %d)" % PollWatcher.INTERVAL, type=float, default=None)
+
+    p_export = subparsers.add_parser("export",help="Migrate a playlist from the jam to a directory")
+    p_export.add_argument("playlist", help="Read the playlist playlist")
+    p_export.add_argument("target_dir", help="Store the items in directory <target_dir>")
+
+    subparsers.add_parser("list_songs",help="List available songs in $JAM_ROOT/Music")
+    p_list_playlists = subparsers.add_parser("list_playlists",help="List available playlists $JAM_ROOT/Playlists")
+    p_list_playlists.add_argument("playlist", help="list also the songs on that playlist", default=None, nargs="?")
+    p_list_playlists.add_argument("--missing", help="Mark the songs of the playlist not found in $JAM_ROOT/Music", action="store_true", default=False)
+
+    p_reindex = subparsers.add_parser("reindex",help="Build the manifest of the device ($JAM_ROOT/%s)" % JamManifest.MANIFEST_FILE)
+    p_reindex.add_argument("--no-hash", help="Don't read the files to hash their content", action="store_true", default=False)
+    p_verify = subparsers.add_parser("verify",help="Check the manifest of the device against its files")
+    p_verify.add_argument("--hash", help="Also hash the files, to find changed content", action="store_true", default=False)
+    p_gc = subparsers.add_parser("gc",help="Remove the songs of $JAM_ROOT/Music that no playlist uses, and the empty directories")
+    p_gc.add_argument("--dry-run", help="Only tell what would be removed, and the space reclaimed", action="store_true", default=False)
+    p_dedupe = subparsers.add_parser("dedupe",help="Point the playlists of the device to one copy of each song (same audio), and remove the others")
+    p_dedupe.add_argument("--dry-run", help="Only tell what would be removed, and the space reclaimed", action="store_true", default=False)
+    p_dedupe.add_argument("--jobs", help="Threads hashing the audio of the tracks (default 1)", type=int, default=1)
+
+    p_serve = subparsers.add_parser("serve",help="Keep the indexes and caches in memory, and run the commands sent by jam_client.py")
+    p_serve.add_argument("--socket", help="Unix socket to listen on (default: %s)" % jam_client.default_socket(), default=None)
+    return parser
+
+
+def open_art_cache(args):
+    "the cache of the resized covers, in memory and (with --art-disk-cache) on disk"
+    art_cache_dir = args.art_cache_dir
+    if args.art_disk_cache and not art_cache_dir:
+        art_cache_dir = os.path.join(user_cache_dir(), "artwork")
+    return ArtworkCache(memory_limit=args.art_cache_mb*1024*1024, cache_dir=art_cache_dir,
+                        disk_limit=args.art_disk_cache_mb*1024*1024)
+
+
+def art_engine(args, art_cache):
+    # resize covers on a process pool when migrating with --jobs, each distinct cover only once
+    return ArtworkEngine(jobs=getattr(args, "jobs", 1), max_size=PlayListManager.MAX_IMG_SZ, dpi=PlayListManager.MAX_DPI,
+                         cache=art_cache)
+
+
+def configure(pm, args):
+    "set the options of the command in pm"
+    pm.verbose = args.verbose
+    pm.use_manifest = not args.no_manifest
+    pm.scan_jobs = args.scan_jobs
+    pm.progress_mode = args.progress
+    pm.progress_interval = args.progress_interval
+    pm.dedup = args.dedup
+
+
+def open_jam(pm, args):
+    "point pm to the jam root of the command (and to the snapshot of its Music tree)"
+    args.jam_root = pm.check_platform(args.jam_root)
+    if not args.jam_root or not os.path.exists(args.jam_root):
+        raise ValueError("please set a valid --jam-root directory: %s" % args.jam_root)
+    if not args.no_cache:
+        # one snapshot of the Music tree per device
+        music_dir = os.path.abspath(pm.jam_music_dir())
+        pm.index_file = os.path.join(user_cache_dir(), "index-%s.json" % hashlib.sha1(music_dir.encode('utf-8')).hexdigest())
+
+
+def start_profiler(args):
+    "a running cProfile.Profile if --profile, else None"
+    if not args.profile:
+        return None
+    # only then: cProfile and pstats take a while to import
+    import cProfile
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler
+
+
+def report(args, metrics, profiler=None):
+    "stop the profiler and write the profile and the metrics of the command"
+    if profiler:
+        import pstats
+        profiler.disable()
+        profiler.dump_stats(args.profile)
+        if args.verbose:
+            pstats.Stats(profiler).sort_stats("cumulative").print_stats(20)
+    if args.verbose:
+        print(metrics)
+    if args.metrics_json:
+        metrics.save(args.metrics_json)
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.subparser_name == "serve":
+        # here, so the other commands don't import it
+        from jam_server import JamServer
+        JamServer(args).serve_forever()
+        sys.exit(0)
+
+    cache = None
+    if not args.no_cache and args.subparser_name in TAG_COMMANDS:
+        cache = TagCache(args.cache_file, rebuild=args.rebuild_cache, verbose=args.verbose)
+    art_cache = open_art_cache(args)
+    metrics = Metrics(args.subparser_name)
+    profiler = None
+    # after pm.close (atexit runs them in reverse), so the cache, artwork and manifest are in
+    atexit.register(lambda: report(args, metrics, profiler))
+
+    pm = PlayListManager(args.verbose, cache=cache, artwork=art_engine(args, art_cache), metrics=metrics)
+    configure(pm, args)
+    atexit.register(pm.close)
+    profiler = start_profiler(args)
+    open_jam(pm, args)
+    sys.exit(run_command(pm, args))
+
+
+def run_command(pm, args):
+    "run the command of args on pm (set up by main, or by the server). Returns the exit code"
+    if args.subparser_name == "revert":
+        playlist = pm.guess_playlist(args.playlist)
+        playlist_data = pm.read_playlist(playlist)
+        pm.revert_playlist(playlist_data, args.playlist, resume=args.resume)
+        return 0
+
+    if args.subparser_name == "convert":
+        playlist = pm.guess_playlist(args.playlist)
+        playlist_data = pm.read_playlist(playlist)
+        pm.jobs = args.jobs
+        pm.convert_playlist(playlist_data, args.playlist, resume=args.resume)
+        return 0
+
+    if args.subparser_name == "process":
+        # create a playlist in the directory pm.jam_root/Music/args.directory`
+        pm.fast_probe = args.fast_probe
+        pm.jobs = args.jobs
+        playlist_data = pm.build_playlist_from_directory(args.directory)
+        pm.store_playlist(playlist_data, args.playlist, format='m3u')
+        return 0
+
+    if args.subparser_name == "migrate":
+        # migrate a current existing playlist to the jam, moving the music, and creating the playlist.
+        playlist_data = pm.read_playlist(args.source_playlist)
+        pm.migrate_playlist(playlist_data, args.playlist, args.source_playlist, write_once=not args.rewrite_on_device,
+                            jobs=args.jobs, io_jobs=args.io_jobs, max_inflight=args.max_inflight*1024*1024, resume=args.resume)
+        return 0
+
+    if args.subparser_name == "migrate-all":
+        # import.sh in one process: the songs shared by the playlists are read and copied once
+        pm.migrate_all(args.sources, jobs=args.jobs, io_jobs=args.io_jobs, max_inflight=args.max_inflight*1024*1024, resume=args.resume)
+        return 0
+
+    if args.subparser_name == "migrate-library":
+        if args.list:
+            from itunes_library import ItunesLibrary
+            playlists = ItunesLibrary(args.library, args.verbose).playlist_names()
+            for name, songs in playlists:
+                print("%s (%d songs)" % (name, songs))
+            print("Total: %d playlists" % len(playlists))
+            return 0
+        pm.migrate_library(args.library, args.playlists or None, jobs=args.jobs, io_jobs=args.io_jobs,
+                           max_inflight=args.max_inflight*1024*1024, resume=args.resume)
+        return 0
+
+    if args.subparser_name == "sync":
+        # migrate only what changed since the last migrate/sync of the playlist
+        playlist_data = pm.read_playlist(args.source_playlist)
+        pm.sync_playlist(playlist_data, args.playlist, args.source_playlist, check=args.check, prune=args.prune)
+        return 0
+
+    if args.subparser_name == "watch":
+        # sync until ^C: only the playlists that changed, or whose songs changed
+        pm.watch(args.sources, args.music, check=args.check, prune=args.prune, debounce=args.debounce,
+                 poll=args.poll, interval=args.interval)
+        return 0
+
+    if args.subparser_name == "export":
+        # export the playlist to the directory target_directory
+        playlist_data = pm.read_jam_playlist(args.playlist)
+        pm.export_playlist(playlist_data, args.playlist, args.target_dir)
+        return 0
+
+    if args.subparser_name == "list_songs":
+        # migrate a current existing playlist to the jam, moving the music, and creating the playlist.
+        songs = 0
+        for s in pm.list_songs():
+            print("%s" % s)
+            songs += 1
+        print("Total: %d songs" % songs)
+        return 0
+
+    if args.subparser_name == "list_playlists":
+        # migrate a current existing playlist to the jam, moving the music, and creating the playlist.
+        playlists = 0
+        for p in pm.list_playlists(args.playlist, missing=args.missing):
+            print("%s" % p)
+            playlists += 1
+        if not args.playlist:
+            print("Total: %d playlists" % playlists)
+        else:
+            print("Total: %d songs in '%s' playlist" % (playlists,args.playlist))
+        return 0
+
+
+    
+
+    if args.subparser_name == "reindex":
+        manifest = pm.reindex(hashed=not args.no_hash)
+        pm.prune_cache()
+        print("Total: %d songs, %d playlists" % (len(manifest.tracks), len(manifest.playlists)))
+        return 0
+
+    if args.subparser_name == "verify":
+        drift = pm.verify_manifest(hashed=args.hash)
+        for d in drift:
+            print("%s" % d)
+        print("Total: %d differences" % len(drift))
+        return 1 if drift else 0
+
+    if args.subparser_name == "gc":
+        pm.gc(dry_run=args.dry_run)
+        if not args.dry_run:
+            pm.prune_cache()
+        return 0
+
+    if args.subparser_name == "dedupe":
+        pm.dedupe(jobs=args.jobs, dry_run=args.dry_run)
+        return 0
+
+    if args.subparser_name == "rollback":
+        pm.rollback()
+        return 0
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+# /////////////////////////////////////////////////////////////////////////////
+# //
+# // jam_client.py
+# //
+# // thin client of the server (python3 jam_cli.py serve): sends the
+# // command line to the server, that keeps the Music index, the manifest,
+# // the tag cache and the covers in memory, and shows what the command
+# // prints. Only the socket is imported here, so it starts in a few ms.
+# // Without a server, the command runs here, as jam_cli.py would.
+# //
+# // usage: python3 jam_client.py [--socket PATH] [options] command ...
+# //
+# // protocol (JSON lines on a Unix socket): the client sends
+# // {"argv": [...], "cwd": ..., "tty": ...}; the server answers with
+# // {"out": text} and {"err": text} lines, and a last {"exit": code}
+# //
+# // 18/10/2026 22:41:09
+# // (c) 2026 Juan M. Casillas <juanm.casillas@gmail.com>
+# //
+# /////////////////////////////////////////////////////////////////////////////
+
+import os
+import sys
+import json
+import socket
+from tag_cache import user_cache_dir
+
+SOCKET_FILE = "serve.sock"
+
+
+def default_socket():
+    "one server per user"
+    return os.path.join(user_cache_dir(), SOCKET_FILE)
+
+
+def connect(socket_file):
+    "a socket connected to the server, or None if there's no server listening"
+    if not hasattr(socket, "AF_UNIX"):
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_file)
+    except OSError:
+        sock.close()
+        return None
+    return sock
+
+
+def forward(sock, argv):
+    "run argv in the server, printing what it sends. Returns the exit code"
+    request = { 'argv': argv, 'cwd': os.getcwd(), 'tty': sys.stderr.isatty() }
+    sock.sendall((json.dumps(request) + "\n").encode('utf-8'))
+    with sock.makefile("r", encoding='utf-8') as reader:
+        for line in reader:
+            message = json.loads(line)
+            if 'out' in message:
+                sys.stdout.write(message['out'])
+                sys.stdout.flush()
+            elif 'err' in message:
+                sys.stderr.write(message['err'])
+                sys.stderr.flush()
+            elif 'exit' in message:
+                return message['exit']
+    raise ValueError("the server closed the connection before the end of the command")
+
+
+def main(argv=None):
+    argv = list(sys.argv[1:] if argv is None else argv)
+    socket_file = default_socket()
+    if argv[:1] == [ "--socket" ] and len(argv) > 1:
+        socket_file = argv[1]
+        argv = argv[2:]
+
+    sock = connect(socket_file)
+    if sock is None:
+        from jam_cli import main as run_here
+        run_here(argv)
+        return
+    with sock:
+        code = forward(sock, argv)
+    sys.exit(code)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+# /////////////////////////////////////////////////////////////////////////////
+# //
+# // jam_server.py
+# //
+# // python3 jam_cli.py serve: runs the commands sent by jam_client.py,
+# // one at a time, keeping between them what each run of the command
+# // line loads again: the interpreter and the modules, the Music index and
+# // the manifest of each device, the tag cache and the resized covers.
+# // Before each command, what changed on disk is loaded again: the whole
+# // device if it was mounted again (another st_dev / st_ino of the jam
+# // root), the index if a directory of Music changed, the manifest if its
+# // file changed (e.g. gen_playlist_jam.py was run on the device).
+# //
+# // 18/10/2026 22:39:52
+# // (c) 2026 Juan M. Casillas <juanm.casillas@gmail.com>
+# //
+# /////////////////////////////////////////////////////////////////////////////
+
+import os
+import sys
+import json
+import signal
+import socket
+import platform
+import traceback
+from contextlib import redirect_stdout, redirect_stderr
+import jam_cli
+import jam_client
+from gen_playlist_jam import PlayListManager
+from tag_cache import TagCache
+from manifest import JamManifest
+from metrics import Metrics
+
+
+def file_stamp(fname):
+    "(mtime_ns, size) of fname, or None if it doesn't exist"
+    try:
+        st = os.stat(fname)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def interrupt(signum, frame):
+    raise KeyboardInterrupt()
+
+
+class Channel:
+    "stdout or stderr of a command: what it writes is sent to the client as {key: text} lines"
+
+    # send when this much is buffered, or on flush
+    BUFFER = 64 * 1024
+
+    def __init__(self, conn, key, tty=False):
+        self.conn = conn
+        self.key = key
+        self.tty = tty
+        self.buffer = []
+        self.size = 0
+        self.encoding = 'utf-8'
+
+    def write(self, text):
+        self.buffer.append(text)
+        self.size += len(text)
+        if self.size >= self.BUFFER:
+            self.flush()
+        return len(text)
+
+    def flush(self):
+        if not self.buffer:
+            return
+        text = "".join(self.buffer)
+        self.buffer = []
+        self.size = 0
+        self.send({ self.key: text })
+
+    def send(self, message):
+        if self.conn is None:
+            return
+        try:
+            self.conn.sendall((json.dumps(message) + "\n").encode('utf-8'))
+        except OSError:
+            # the client is gone: the command ends anyway (as the device must be left consistent)
+            self.conn = None
+
+    def isatty(self):
+        # the progress bar is drawn if the client runs on a terminal
+        return self.tty
+
+
+class JamServer:
+    "the PlayListManager of each jam root, and the caches they share, kept between commands"
+
+    def __init__(self, args):
+        self.socket_file = args.socket or jam_client.default_socket()
+        self.verbose = args.verbose
+        self.cache = None
+        if not args.no_cache:
+            self.cache = TagCache(args.cache_file, rebuild=args.rebuild_cache, verbose=args.verbose)
+        self.art_cache = jam_cli.open_art_cache(args)
+        self.parser = jam_cli.build_parser()
+        self.cwd = os.getcwd()
+        self.sock = None
+        # jam root -> [(st_dev, st_ino) of the root, PlayListManager, stamp of its manifest file]
+        self.managers = {}
+
+    def listen(self):
+        if not hasattr(socket, "AF_UNIX"):
+            raise ValueError("serve needs Unix sockets, not available in this platform")
+        if jam_client.connect(self.socket_file):
+            raise ValueError("a server is already listening on %s" % self.socket_file)
+        if os.path.exists(self.socket_file):
+            # left by a server that was killed
+            os.unlink(self.socket_file)
+        os.makedirs(os.path.dirname(os.path.abspath(self.socket_file)), exist_ok=True)
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.bind(self.socket_file)
+        os.chmod(self.socket_file, 0o600)
+        self.sock.listen(8)
+        print("serving on %s" % self.socket_file)
+        sys.stdout.flush()
+
+    def serve_forever(self):
+        self.listen()
+        # kill (SIGTERM) ends as ^C does: the command running and the caches are saved
+        signal.signal(signal.SIGTERM, interrupt)
+        try:
+            while True:
+                conn, address = self.sock.accept()
+                with conn:
+                    self.handle(conn)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.close()
+
+    def close(self):
+        self.sock.close()
+        if os.path.exists(self.socket_file):
+            os.unlink(self.socket_file)
+        if self.cache:
+            self.cache.close()
+        self.art_cache.evict_disk()
+        if self.verbose:
+            print("server stopped")
+
+    def handle(self, conn):
+        with conn.makefile("r", encoding='utf-8') as reader:
+            line = reader.readline()
+        try:
+            request = json.loads(line)
+        except ValueError:
+            return
+        out = Channel(conn, 'out', request.get('tty', False))
+        err = Channel(conn, 'err', request.get('tty', False))
+        try:
+            with redirect_stdout(out), redirect_stderr(err):
+                code = self.execute(request['argv'], request.get('cwd') or self.cwd)
+        except SystemExit as e:
+            # --help, or a wrong command line (argparse)
+            code = e.code
+            if code is not None and not isinstance(code, int):
+                err.write("%s\n" % code)
+                code = 1
+        except Exception:
+            err.write(traceback.format_exc())
+            code = 1
+        finally:
+            os.chdir(self.cwd)
+        out.flush()
+        err.flush()
+        out.send({ 'exit': code or 0 })
+        if self.verbose:
+            print("%s: exit %s" % (" ".join(request['argv']), code or 0))
+
+    def execute(self, argv, cwd):
+        "run a command line, as jam_cli.main does, on the manager of its jam root. Returns the exit code"
+        args = self.parser.parse_args(argv)
+        if args.subparser_name in (None, "serve", "watch"):
+            # watch would keep the server busy until it's stopped
+            raise ValueError("please give a command to run in the server (not serve or watch)")
+        # the paths of the command are relative to the client
+        os.chdir(cwd)
+        args.jam_root = args.jam_root or PlayListManager.platforms.get(platform.system())
+        if not args.jam_root or not os.path.exists(args.jam_root):
+            raise ValueError("please set a valid --jam-root directory: %s" % args.jam_root)
+        args.jam_root = os.path.abspath(args.jam_root)
+
+        pm = self.manager(args)
+        metrics = Metrics(args.subparser_name)
+        jam_cli.configure(pm, args)
+        pm.metrics = metrics
+        pm.artwork = jam_cli.art_engine(args, self.art_cache)
+        pm.cache = None
+        if self.cache and not args.no_cache and args.subparser_name in jam_cli.TAG_COMMANDS:
+            pm.cache = self.cache
+            self.cache.hits = self.cache.misses = 0
+        # the defaults run_command changes for some commands
+        pm.jobs = 1
+        pm.fast_probe = False
+        pm.probed = {}
+        pm.audio = None
+        pm.planned_audio = {}
+        profiler = jam_cli.start_profiler(args)
+        try:
+            return jam_cli.run_command(pm, args)
+        finally:
+            pm.flush()
+            pm.artwork.close()
+            jam_cli.report(args, metrics, profiler)
+            self.managers[args.jam_root][2] = file_stamp(self.manifest_file(args.jam_root))
+
+    def manager(self, args):
+        "the PlayListManager of the jam root of args, with what changed on disk since the last command dropped"
+        jam_root = args.jam_root
+        st = os.stat(jam_root)
+        device = (st.st_dev, st.st_ino)
+        entry = self.managers.get(jam_root)
+        if entry and entry[0] != device:
+            if args.verbose:
+                print("%s was mounted again: loading it again" % jam_root)
+            entry = None
+        if not entry:
+            pm = PlayListManager(args.verbose, cache=self.cache)
+            jam_cli.open_jam(pm, args)
+            entry = self.managers[jam_root] = [ device, pm, None ]
+            return pm
+
+        pm = entry[1]
+        # a run without the server (or a copy by hand) since the last command
+        if pm.index is not None and not pm.index.is_fresh():
+            pm.index = None
+        if pm.manifest is not None and file_stamp(self.manifest_file(jam_root)) != entry[2]:
+            pm.manifest = None
+        return pm
+
+    def manifest_file(self, jam_root):
+        return os.path.join(jam_root, JamManifest.MANIFEST_FILE)
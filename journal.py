@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+# /////////////////////////////////////////////////////////////////////////////
+# //
+# // journal.py
+# //
+# // write-ahead journal of the copies and moves done in the jam, so an
+# // interrupted migrate/convert/revert can be resumed or rolled back.
+# // One json record per line, fsync'ed in batches.
+# //
+# // 18/10/2026 15:20:31
+# // (c) 2026 Juan M. Casillas <juanm.casillas@gmail.com>
+# //
+# /////////////////////////////////////////////////////////////////////////////
+
+import os
+import json
+import time
+import threading
+
+
+class Journal:
+    JOURNAL_FILE = ".playlists_journal"
+    SYNC_EVERY = 64
+    SYNC_SECONDS = 2.0
+
+    def __init__(self, jam_root):
+        self.journal_file = os.path.join(jam_root, self.JOURNAL_FILE)
+        self.lock = threading.Lock()
+        self.fd = None
+        self.command = None
+        self.params = {}
+        # plans by id: {id, kind, src, tgt}
+        self.plans = {}
+        self.done_ids = set()
+        # id of the next plan, and of the first one not fsync'ed yet
+        self.next_id = 0
+        self.synced_id = 0
+        self.ended = False
+        self.exists = False
+        self.pending = 0
+        self.last_sync = time.time()
+
+    def load(self):
+        "read the journal left in the device, if any"
+        if not os.path.exists(self.journal_file):
+            return self
+        self.exists = True
+        with open(self.journal_file, encoding='utf-8') as fd:
+            for line in fd:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # last line, half written when it was interrupted
+                    break
+                op = record['op']
+                if op == 'begin':
+                    self.command = record['command']
+                    self.params = record['params']
+                elif op == 'plan':
+                    self.plans[record['id']] = record
+                    self.next_id = max(self.next_id, record['id'] + 1)
+                elif op == 'done':
+                    self.done_ids.add(record['id'])
+                elif op == 'end':
+                    self.ended = True
+        return self
+
+    def unfinished(self):
+        return self.exists and not self.ended
+
+    def begin(self, command, **params):
+        self.command = command
+        self.params = params
+        self.plans = {}
+        self.done_ids = set()
+        self.next_id = self.synced_id = 0
+        self.ended = False
+        self.fd = open(self.journal_file, "w", encoding='utf-8')
+        self.exists = True
+        self.write({ 'op': 'begin', 'command': command, 'params': params, 'time': time.time() })
+        self.sync()
+
+    def reopen(self):
+        "continue an unfinished journal"
+        self.fd = open(self.journal_file, "a", encoding='utf-8')
+        self.synced_id = self.next_id
+
+    def write(self, record):
+        self.fd.write(json.dumps(record, ensure_ascii=False))
+        self.fd.write("\n")
+        self.pending += 1
+
+    def plan(self, kind, src, tgt):
+        with self.lock:
+            plan_id = self.next_id
+            self.next_id += 1
+            record = { 'op': 'plan', 'id': plan_id, 'kind': kind, 'src': str(src), 'tgt': str(tgt) }
+            self.plans[plan_id] = record
+            self.write(record)
+            return plan_id
+
+    def done(self, plan_id):
+        with self.lock:
+            self.done_ids.add(plan_id)
+            self.write({ 'op': 'done', 'id': plan_id })
+            if self.pending >= self.SYNC_EVERY or time.time() - self.last_sync > self.SYNC_SECONDS:
+                self.sync_locked()
+
+    def durable(self, plan_id):
+        "make sure the plan is on disk before its operation starts (one fsync covers all the plans so far)"
+        with self.lock:
+            if plan_id >= self.synced_id:
+                self.sync_locked()
+
+    def sync(self):
+        with self.lock:
+            self.sync_locked()
+
+    def sync_locked(self):
+        if self.fd and self.pending:
+            self.fd.flush()
+            os.fsync(self.fd.fileno())
+        self.synced_id = self.next_id
+        self.pending = 0
+        self.last_sync = time.time()
+
+    def completed(self, kind):
+        "src -> tgt of the finished operations of that kind"
+        return { p['src']: p['tgt'] for pid, p in self.plans.items() if p['kind'] == kind and pid in self.done_ids }
+
+    def planned(self, kind):
+        "src -> tgt of all the operations of that kind, finished or not"
+        return { p['src']: p['tgt'] for p in self.plans.values() if p['kind'] == kind }
+
+    def end(self):
+        "everything is done. The journal is not needed anymore"
+        with self.lock:
+            if self.fd:
+                self.write({ 'op': 'end' })
+                self.sync_locked()
+            self.discard_locked()
+
+    def discard(self):
+        with self.lock:
+            self.discard_locked()
+
+    def discard_locked(self):
+        if self.fd:
+            self.fd.close()
+            self.fd = None
+        if os.path.exists(self.journal_file):
+            os.remove(self.journal_file)
+        self.exists = False
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+# /////////////////////////////////////////////////////////////////////////////
+# //
+# // m3u.py
+# //
+# // extended M3U reader and writer. Reads the jam playlists (\r\n) and the
+# // iTunes exports (mac: \r, pc: \r\n, utf-8 or windows encoding) one entry
+# // at a time; writes them to a temp file that replaces the playlist at the end.
+# //
+# // 18/10/2026 16:48:05
+# // (c) 2026 Juan M. Casillas <juanm.casillas@gmail.com>
+# //
+# /////////////////////////////////////////////////////////////////////////////
+
+import os
+import re
+import pathlib
+import tempfile
+from track import Track
+
+CHUNK = 64 * 1024
+NEWLINES = re.compile(rb"\r\n|\r|\n")
+BOM = b"\xef\xbb\xbf"
+
+
+def decode(line):
+    "utf-8, else the windows encoding iTunes uses in .m3u"
+    try:
+        return line.decode('utf-8')
+    except UnicodeDecodeError:
+        return line.decode('cp1252', errors='replace')
+
+
+def iter_lines(fd):
+    "lines of the binary file fd, ending in \\r\\n, \\r (old mac) or \\n"
+    rest = b""
+    first = True
+    while True:
+        chunk = fd.read(CHUNK)
+        if not chunk:
+            break
+        if first:
+            if chunk.startswith(BOM):
+                chunk = chunk[len(BOM):]
+            first = False
+        lines = NEWLINES.split(rest + chunk)
+        # the last one may continue in the next chunk (a \r\n split between chunks gives an empty line)
+        rest = lines.pop()
+        for line in lines:
+            yield decode(line)
+    if rest:
+        yield decode(rest)
+
+
+def native_path(uri):
+    "str(pathlib.Path(uri)), skipped for the usual paths it leaves as they are (it's slow)"
+    if os.sep == "/" and "//" not in uri and "/." not in uri and not uri.startswith("./") and not uri.endswith("/"):
+        return uri
+    return str(pathlib.Path(uri))
+
+
+def read_m3u(playlist_file):
+    "generator of the entries (Track) of the playlist"
+    with open(playlist_file, "rb") as fd:
+        title = None
+        duration = None
+        for line in iter_lines(fd):
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("#EXTINF:"):
+                # #EXTINF:266,Lost On You - LP
+                info, _, name = line[len("#EXTINF:"):].partition(",")
+                try:
+                    duration = float(info.split()[0]) if info.split() else None
+                except ValueError:
+                    duration = None
+                title = name.strip() or None
+                continue
+            if line.startswith("#"):
+                continue
+            yield Track(title, line, native_path(line), duration)
+            title = None
+            duration = None
+
+
+def write_m3u(target, entries, on_entry=None):
+    "write the entries (title, duration, file) to target, replacing it only when complete. Returns how many"
+    count = 0
+    directory = os.path.dirname(os.path.abspath(target))
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".%s" % os.path.basename(target))
+    try:
+        with os.fdopen(fd, "w", encoding='utf-8', newline='') as f:
+            f.write("#EXTM3U\r\n")
+            for item in entries:
+                if on_entry:
+                    on_entry(item)
+                f.write("#EXTINF:%d, %s\r\n" % (item.duration, item.title))
+                f.write("%s\r\n" % item.file)
+                count += 1
+        # mkstemp creates it only readable by us
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, target)
+    except:
+        os.remove(tmp)
+        raise
+    return count
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+# /////////////////////////////////////////////////////////////////////////////
+# //
+# // manifest.py
+# //
+# // manifest of the tracks and playlists stored in the jam, kept in the
+# // jam root, so listings don't have to walk the player's filesystem.
+# // Created by the reindex command, and updated by every write after that.
+# //
+# // 18/10/2026 14:12:45
+# // (c) 2026 Juan M. Casillas <juanm.casillas@gmail.com>
+# //
+# /////////////////////////////////////////////////////////////////////////////
+
+import os
+import json
+import tempfile
+import threading
+
+
+class JamManifest:
+    MANIFEST_FILE = ".playlists_manifest.json"
+    VERSION = 1
+    # track info stored from the tag cache / probe
+    TAGS = ('title', 'artist', 'album', 'genre', 'duration')
+
+    def __init__(self, jam_root):
+        self.jam_root = jam_root
+        self.manifest_file = os.path.join(jam_root, self.MANIFEST_FILE)
+        self.lock = threading.RLock()
+        # relative path in Music ('/' separated) -> {size, hash, tags...}
+        self.tracks = {}
+        # playlist file name in Playlists -> [relative paths in Music]
+        self.playlists = {}
+        self.exists = False
+        self.dirty = False
+
+    def load(self):
+        "load the manifest from the device. exists is False if the device doesn't have one"
+        try:
+            with open(self.manifest_file, encoding='utf-8') as fd:
+                data = json.load(fd)
+        except (OSError, ValueError):
+            return self
+        if data.get('version') != self.VERSION:
+            return self
+        self.tracks = data['tracks']
+        self.playlists = data['playlists']
+        self.exists = True
+        return self
+
+    def save(self, force=False):
+        with self.lock:
+            if not force and (not self.exists or not self.dirty):
+                return
+            data = {
+                'version': self.VERSION,
+                'tracks': self.tracks,
+                'playlists': self.playlists
+            }
+            # write it aside, then replace, so an unplugged device keeps the old one
+            fd, tmp = tempfile.mkstemp(dir=self.jam_root, prefix=self.MANIFEST_FILE)
+            with os.fdopen(fd, "w", encoding='utf-8') as f:
+                json.dump(data, f, separators=(',', ':'), ensure_ascii=False)
+            # readable by all, as the playlists (mkstemp makes it 0600)
+            os.chmod(tmp, 0o644)
+            os.replace(tmp, self.manifest_file)
+            self.exists = True
+            self.dirty = False
+
+    def add_track(self, rel, size, info=None, digest=None, source=None, audio=None):
+        "source: {path, size, mtime_ns, hash} of the file it was copied from (see sync). audio: see dedup"
+        entry = { 'size': size, 'hash': digest }
+        if info:
+            for key in self.TAGS:
+                entry[key] = info.get(key)
+        if source:
+            entry['source'] = source
+        if audio:
+            entry['audio'] = audio
+        with self.lock:
+            old = self.tracks.get(rel)
+            if old and digest is None and old.get('size') == size:
+                # same file, keep what we knew
+                entry['hash'] = old.get('hash')
+                if not source and old.get('source'):
+                    entry['source'] = old['source']
+            if old and audio is None and old.get('size') == size and old.get('audio'):
+                entry['audio'] = old['audio']
+            self.tracks[rel] = entry
+            self.dirty = True
+
+    def set_source(self, rel, source):
+        with self.lock:
+            self.tracks[rel]['source'] = source
+            self.dirty = True
+
+    def set_audio(self, rel, audio):
+        with self.lock:
+            self.tracks[rel]['audio'] = audio
+            self.dirty = True
+
+    def sources(self):
+        "source path -> relative path of the track copied from it"
+        with self.lock:
+            return { entry['source']['path']: rel for rel, entry in self.tracks.items() if entry.get('source') }
+
+    def remove_track(self, rel):
+        with self.lock:
+            if self.tracks.pop(rel, None) is not None:
+                self.dirty = True
+
+    def move_track(self, src_rel, tgt_rel):
+        with self.lock:
+            entry = self.tracks.pop(src_rel, None)
+            if entry is not None:
+                self.tracks[tgt_rel] = entry
+                self.dirty = True
+
+    def set_playlist(self, name, rels):
+        with self.lock:
+            self.playlists[name] = list(rels)
+            self.dirty = True
+
+    def find_playlist(self, playlist):
+        "same rules as guess_playlist: name, name.m3u or name.m3u8"
+        for name in (playlist, "%s.m3u" % playlist, "%s.m3u8" % playlist):
+            if name in self.playlists:
+                return name
+        return None
+
+    def referenced(self):
+        "all the tracks used by any playlist"
+        with self.lock:
+            refs = set()
+            for rels in self.playlists.values():
+                refs.update(rels)
+            return refs
+
+    def songs(self):
+        return sorted(self.tracks.keys())
+
+    def playlist_names(self):
+        return sorted(self.playlists.keys())
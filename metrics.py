@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+# /////////////////////////////////////////////////////////////////////////////
+# //
+# // metrics.py
+# //
+# // stage timers and counters of a run (tags, artwork, copies, moves,
+# // the index...), reported as JSON when the command ends. Stage times
+# // are exclusive: a stage inside another one (e.g. the tag cache while
+# // walking) is only counted once. Threads add their times up.
+# //
+# // 18/10/2026 20:58:33
+# // (c) 2026 Juan M. Casillas <juanm.casillas@gmail.com>
+# //
+# /////////////////////////////////////////////////////////////////////////////
+
+import sys
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+MB = 1024 * 1024
+
+
+def peak_rss():
+    "MB, None if unknown. On linux VmHWM, as ru_maxrss keeps the peak of the parent process"
+    try:
+        with open("/proc/self/status") as fd:
+            for line in fd:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    try:
+        # only here: resource is unix only, no peak on windows
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        rss //= 1024
+    return rss / 1024.0
+
+
+class Metrics:
+    "calls and seconds of each stage, and counters (files, bytes, hits...)"
+
+    def __init__(self, command=None):
+        self.command = command
+        self.started = time.time()
+        self.t0 = time.perf_counter()
+        # name -> [calls, seconds]
+        self.stages = {}
+        self.counters = {}
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    def enter(self):
+        stack = self.local.__dict__.setdefault('stack', [])
+        # time spent in the stages called from this one
+        stack.append(0.0)
+        return time.perf_counter()
+
+    def leave(self, name, start, calls=1):
+        elapsed = time.perf_counter() - start
+        stack = self.local.stack
+        nested = stack.pop()
+        if stack:
+            stack[-1] += elapsed
+        with self.lock:
+            stage = self.stages.get(name)
+            if stage is None:
+                stage = self.stages[name] = [0, 0.0]
+            stage[0] += calls
+            stage[1] += elapsed - nested
+
+    @contextmanager
+    def stage(self, name):
+        start = self.enter()
+        try:
+            yield
+        finally:
+            self.leave(name, start)
+
+    def timed(self, name, items):
+        "generator of items, the time to produce each one counted in stage name"
+        items = iter(items)
+        try:
+            while True:
+                start = self.enter()
+                try:
+                    item = next(items)
+                except StopIteration:
+                    self.leave(name, start, calls=0)
+                    return
+                self.leave(name, start)
+                yield item
+        finally:
+            if hasattr(items, "close"):
+                items.close()
+
+    def count(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def report(self):
+        seconds = time.perf_counter() - self.t0
+        counters = dict(sorted(self.counters.items()))
+        copy_seconds = self.stages.get('copy', [0, 0.0])[1]
+        read = counters.get('bytes read', 0)
+        written = counters.get('bytes written', 0)
+        return {
+            'command': self.command,
+            'started': time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+            'seconds': seconds,
+            'rss_mb': peak_rss(),
+            'stages': { name: {'calls': calls, 'seconds': stage_seconds} for name, (calls, stage_seconds) in sorted(self.stages.items()) },
+            'counters': counters,
+            'throughput': {
+                'read MB/s': read / MB / seconds if seconds else 0.0,
+                'written MB/s': written / MB / seconds if seconds else 0.0,
+                # while copying, without the tags and artwork work
+                'copy MB/s': written / MB / copy_seconds if copy_seconds else 0.0
+            }
+        }
+
+    def save(self, fname):
+        "write the report to fname, or stdout with -"
+        report = self.report()
+        if fname == "-":
+            print(json.dumps(report, indent=1))
+            return report
+        with open(fname, "w") as fd:
+            json.dump(report, fd, indent=1)
+        return report
+
+    def __str__(self):
+        report = self.report()
+        lines = [ "%s: %.2fs" % (self.command, report['seconds']) ]
+        if report['rss_mb'] is not None:
+            lines[0] += ", %.1f MB peak" % report['rss_mb']
+        for name, stage in sorted(report['stages'].items(), key=lambda item: -item[1]['seconds']):
+            lines.append("  %-20s %8.2fs %8d calls" % (name, stage['seconds'], stage['calls']))
+        for name, value in report['counters'].items():
+            if value:
+                lines.append("  %-20s %9d" % (name, value))
+        lines.append("  read %.1f MB/s, written %.1f MB/s, copy %.1f MB/s" % (
+            report['throughput']['read MB/s'], report['throughput']['written MB/s'], report['throughput']['copy MB/s']))
+        return "\n".join(lines)
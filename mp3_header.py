@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+# /////////////////////////////////////////////////////////////////////////////
+# //
+# // mp3_header.py
+# //
+# // duration of a mp3 from its headers only: the ID3v2 tags are skipped,
+# // and the first MPEG frames and the Xing/Info (+LAME) or VBRI header are
+# // read from a small buffer. Files without them (CBR) are estimated from
+# // the file size. Same rules mutagen.mp3.MPEGInfo uses, so the results
+# // match, without reading (up to 1MB) and building the whole MPEGInfo.
+# //
+# // 18/10/2026 18:14:39
+# // (c) 2026 Juan M. Casillas <juanm.casillas@gmail.com>
+# //
+# /////////////////////////////////////////////////////////////////////////////
+
+import os
+import struct
+
+# audio read after the tags. Enough for the headers of the first frames
+PROBE_BYTES = 64 * 1024
+# from the frame start to the end of the longest Xing + LAME header
+HEADER_SPAN = 192
+
+# kbps by (version, layer)
+BITRATES = {
+    (1, 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (1, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (1, 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (2, 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (2, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+BITRATES[(2, 3)] = BITRATES[(2, 2)]
+for layer in (1, 2, 3):
+    BITRATES[(2.5, layer)] = BITRATES[(2, layer)]
+
+SAMPLE_RATES = {
+    1: [44100, 48000, 32000],
+    2: [22050, 24000, 16000],
+    2.5: [11025, 12000, 8000]
+}
+
+MONO = 3
+
+
+def audio_offset(fd):
+    "skip the ID3v2 tags (WMP writes more than one) and return where the audio starts"
+    offset = 0
+    while True:
+        fd.seek(offset)
+        data = fd.read(10)
+        if len(data) != 10 or data[:3] != b"ID3":
+            return offset
+        size = 0
+        for b in data[6:10]:
+            size = (size << 7) | (b & 0x7f)
+        if not size:
+            return offset
+        offset += 10 + size
+
+
+def frame_header(buf, pos):
+    "the MPEG frame header at pos, or None"
+    if pos + 4 > len(buf):
+        return None
+    b1, b2, b3, b4 = buf[pos], buf[pos + 1], buf[pos + 2], buf[pos + 3]
+    if b1 != 0xff or b2 & 0xe0 != 0xe0:
+        return None
+    version = (b2 >> 3) & 0x3
+    layer = (b2 >> 1) & 0x3
+    bitrate = b3 >> 4
+    sample_rate = (b3 >> 2) & 0x3
+    padding = (b3 >> 1) & 0x1
+    mode = b4 >> 6
+    if version == 1 or layer == 0 or sample_rate == 0x3 or bitrate == 0xf or bitrate == 0:
+        return None
+
+    version = [2.5, None, 2, 1][version]
+    layer = 4 - layer
+    bitrate = BITRATES[(version, layer)][bitrate] * 1000
+    sample_rate = SAMPLE_RATES[version][sample_rate]
+    if layer == 1:
+        samples, slot = 384, 4
+    elif version >= 2 and layer == 3:
+        samples, slot = 576, 1
+    else:
+        samples, slot = 1152, 1
+    return {
+        'version': version,
+        'layer': layer,
+        'mode': mode,
+        'bitrate': bitrate,
+        'sample_rate': sample_rate,
+        'samples': samples,
+        'length': ((samples // 8 * bitrate) // sample_rate + padding) * slot
+    }
+
+
+def lame_delay(buf, pos):
+    "encoder delay + padding (samples) of the LAME header at pos, or 0"
+    data = buf[pos:pos + 20]
+    if len(data) != 20 or not data.startswith((b"LAME", b"L3.99")):
+        return 0
+    data = data.lstrip(b"EMAL")
+    major, data = data[0:1], data[1:].lstrip(b".")
+    minor = b""
+    for c in data:
+        if not chr(c).isdigit():
+            break
+        minor += bytes([c])
+    data = data[len(minor):]
+    try:
+        version = (int(major), int(minor))
+    except ValueError:
+        return 0
+    # no extended header before 3.90
+    if version < (3, 90) or (version == (3, 90) and data[-11:-10] == b"("):
+        return 0
+    if len(data) < 11:
+        return 0
+    payload = buf[pos + 9:pos + 36]
+    if len(payload) != 27 or payload[0] >> 4 != 0:
+        return 0
+    delay = (payload[12] << 4) | (payload[13] >> 4)
+    padding = ((payload[13] & 0xf) << 8) | payload[14]
+    return delay + padding
+
+
+def vbr_length(buf, pos, header):
+    """length from the Xing/Info or VBRI header of the frame at pos.
+    -1 if the header has no frame count, None if there's no header"""
+    if header['layer'] != 3:
+        return None
+
+    if header['version'] == 1:
+        xing = pos + (21 if header['mode'] == MONO else 36)
+    else:
+        xing = pos + (13 if header['mode'] == MONO else 21)
+    if buf[xing:xing + 4] in (b"Xing", b"Info") and xing + 8 <= len(buf):
+        flags = struct.unpack(">I", buf[xing + 4:xing + 8])[0]
+        cursor = xing + 8
+        frames = -1
+        for flag, size in ((0x1, 4), (0x2, 4), (0x4, 100), (0x8, 4)):
+            if flags & flag:
+                if cursor + size > len(buf):
+                    # truncated, not a header
+                    frames = None
+                    break
+                if flag == 0x1:
+                    frames = struct.unpack(">I", buf[cursor:cursor + 4])[0]
+                cursor += size
+        if frames is not None:
+            if frames == -1:
+                return -1
+            samples = header['samples'] * frames - lame_delay(buf, cursor)
+            return max(samples, 0) / float(header['sample_rate'])
+
+    vbri = pos + 36
+    data = buf[vbri:vbri + 26]
+    if len(data) == 26 and data.startswith(b"VBRI") and struct.unpack(">H", data[4:6])[0] == 1:
+        frames = struct.unpack(">I", data[14:18])[0]
+        toc_entries, toc_scale, toc_entry_size = struct.unpack(">HHH", data[18:24])
+        if vbri + 26 + toc_entries * toc_entry_size <= len(buf):
+            return float(header['samples'] * frames) / header['sample_rate']
+    return None
+
+
+def mp3_duration(music_file):
+    "duration in seconds, or None if it can't be found in the first PROBE_BYTES or it's not a mp3 (use the full parse)"
+    with open(music_file, "rb") as fd:
+        start = audio_offset(fd)
+        fd.seek(start)
+        buf = fd.read(PROBE_BYTES)
+        file_size = os.fstat(fd.fileno()).st_size
+    complete = start + len(buf) >= file_size
+
+    # mutagen: a frame with a VBR header, else 4 valid frames in a row (or 2, if that's all there is)
+    fallback = None
+    found = False
+    pos = buf.find(b"\xff")
+    while pos != -1:
+        frames = []
+        cursor = pos
+        for i in range(4):
+            if cursor + HEADER_SPAN > len(buf) and not complete:
+                # the answer is after the buffer
+                return None
+            header = frame_header(buf, cursor)
+            if header is None:
+                break
+            frames.append((cursor, header))
+            length = vbr_length(buf, cursor, header)
+            if length is not None:
+                if length == -1:
+                    return 8 * (file_size - start - cursor) / float(header['bitrate'])
+                return length
+            cursor += header['length']
+
+        if len(frames) >= 2 and fallback is None:
+            fallback = frames[0]
+        if len(frames) == 4:
+            fallback = frames[0]
+            found = True
+            break
+        pos = buf.find(b"\xff", pos + 1)
+
+    if fallback is None or (not found and not complete):
+        # mutagen would keep looking after the buffer
+        return None
+    cursor, header = fallback
+    # CBR (or unknown): estimate from the size
+    return 8 * (file_size - start - cursor) / float(header['bitrate'])
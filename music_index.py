@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+# /////////////////////////////////////////////////////////////////////////////
+# //
+# // music_index.py
+# //
+# // filename index of the $JAM_ROOT/Music tree. Built once per run (or
+# // loaded from a snapshot, if no directory changed since) so lookups by
+# // name don't walk the device each time.
+# //
+# // 18/10/2026 13:31:09
+# // (c) 2026 Juan M. Casillas <juanm.casillas@gmail.com>
+# //
+# /////////////////////////////////////////////////////////////////////////////
+
+import os
+import json
+import tempfile
+import unicodedata
+
+
+def normalize_name(name):
+    "mac stores names decomposed (NFD), iTunes exports them composed. Ignore that and the case"
+    return unicodedata.normalize('NFC', name).casefold()
+
+
+class MusicIndex:
+    SNAPSHOT_VERSION = 1
+
+    def __init__(self, root, snapshot_file=None, verbose=False):
+        self.root = root
+        self.snapshot_file = snapshot_file
+        self.verbose = verbose
+        # relative dir ('' for root, '/' separated) -> mtime_ns
+        self.dirs = {}
+        # relative dir -> file names
+        self.files = {}
+        self.by_name = {}
+        self.by_norm = {}
+        self.dirty = False
+
+    def load(self):
+        "load the snapshot if it's still fresh, else walk the tree. Returns self"
+        if self.load_snapshot() and self.is_fresh():
+            if self.verbose:
+                print("music index: using snapshot %s (%d files)" % (self.snapshot_file, len(self)))
+        else:
+            self.build()
+        return self
+
+    def build(self):
+        self.dirs = {}
+        self.files = {}
+        if os.path.isdir(self.root):
+            self.scan("")
+        self.rebuild_names()
+        self.dirty = True
+        if self.verbose:
+            print("music index: built %s (%d files)" % (self.root, len(self)))
+
+    def scan(self, reldir):
+        directory = os.path.join(self.root, reldir) if reldir else self.root
+        self.dirs[reldir] = os.stat(directory).st_mtime_ns
+        names = []
+        subdirs = []
+        with os.scandir(directory) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.name)
+                else:
+                    names.append(entry.name)
+        self.files[reldir] = names
+        for sub in subdirs:
+            self.scan("%s/%s" % (reldir, sub) if reldir else sub)
+
+    def is_fresh(self):
+        "a directory mtime changes when a file is added, removed or renamed in it"
+        for reldir, mtime_ns in self.dirs.items():
+            try:
+                if os.stat(self.full_dir(reldir)).st_mtime_ns != mtime_ns:
+                    return False
+            except OSError:
+                return False
+        return True
+
+    def full_dir(self, reldir):
+        if not reldir:
+            return self.root
+        return os.path.join(self.root, *reldir.split("/"))
+
+    def rebuild_names(self):
+        self.by_name = {}
+        self.by_norm = {}
+        for reldir, names in self.files.items():
+            for name in names:
+                self.add_name(reldir, name)
+
+    def add_name(self, reldir, name):
+        full = os.path.join(self.full_dir(reldir), name)
+        self.by_name.setdefault(name, []).append(full)
+        self.by_norm.setdefault(normalize_name(name), []).append(full)
+
+    def remove_name(self, reldir, name):
+        full = os.path.join(self.full_dir(reldir), name)
+        for table, key in ((self.by_name, name), (self.by_norm, normalize_name(name))):
+            paths = table.get(key, [])
+            if full in paths:
+                paths.remove(full)
+            if not paths:
+                table.pop(key, None)
+
+    def relative(self, full_path):
+        rel = os.path.relpath(full_path, self.root).replace(os.path.sep, "/")
+        reldir, name = rel.rsplit("/", 1) if "/" in rel else ("", rel)
+        return reldir, name
+
+    def relative_dir(self, full_path):
+        rel = os.path.relpath(full_path, self.root).replace(os.path.sep, "/")
+        return "" if rel == "." else rel
+
+    def find_all(self, name):
+        "all the paths with that name, or with the same normalized name"
+        paths = self.by_name.get(name)
+        if not paths:
+            paths = self.by_norm.get(normalize_name(name), [])
+        return list(paths)
+
+    def find(self, name):
+        paths = self.find_all(name)
+        if not paths:
+            return None
+        return paths[0]
+
+    def add(self, full_path):
+        "keep the index updated when we create a file in the tree"
+        reldir, name = self.relative(full_path)
+        parts = reldir.split("/") if reldir else []
+        for i in range(len(parts) + 1):
+            d = "/".join(parts[:i])
+            if d not in self.files:
+                self.files[d] = []
+                # a new directory: its parent changed too
+                if i:
+                    self.touched("/".join(parts[:i - 1]))
+                self.touched(d)
+        if name not in self.files[reldir]:
+            self.files[reldir].append(name)
+            self.add_name(reldir, name)
+        self.touched(reldir)
+        self.dirty = True
+
+    def remove(self, full_path):
+        reldir, name = self.relative(full_path)
+        if name in self.files.get(reldir, []):
+            self.files[reldir].remove(name)
+            self.remove_name(reldir, name)
+        self.touched(reldir)
+        self.dirty = True
+
+    def remove_dir(self, full_path):
+        "we removed an empty directory of the tree"
+        reldir = self.relative_dir(full_path)
+        self.files.pop(reldir, None)
+        self.dirs.pop(reldir, None)
+        self.touched(reldir.rsplit("/", 1)[0] if "/" in reldir else "")
+        self.dirty = True
+
+    def touched(self, reldir):
+        """we changed reldir (and kept the index updated): take its new mtime. Only ours, so a change made by
+        someone else in another directory still makes the snapshot stale"""
+        try:
+            self.dirs[reldir] = os.stat(self.full_dir(reldir)).st_mtime_ns
+        except OSError:
+            # gone: the snapshot is stale
+            self.dirs[reldir] = None
+
+    def move(self, src, tgt):
+        self.remove(src)
+        self.add(tgt)
+
+    def __len__(self):
+        return sum(len(names) for names in self.files.values())
+
+    def __iter__(self):
+        for reldir, names in self.files.items():
+            for name in names:
+                yield os.path.join(self.full_dir(reldir), name)
+
+    def load_snapshot(self):
+        if not self.snapshot_file or not os.path.exists(self.snapshot_file):
+            return False
+        try:
+            with open(self.snapshot_file, encoding='utf-8') as fd:
+                data = json.load(fd)
+        except (OSError, ValueError):
+            return False
+        if data.get('version') != self.SNAPSHOT_VERSION or data.get('root') != os.path.abspath(self.root):
+            return False
+        self.dirs = data['dirs']
+        self.files = data['files']
+        self.rebuild_names()
+        self.dirty = False
+        return True
+
+    def save(self):
+        "store the snapshot, with the mtimes of the directories when they were scanned, or when we changed them"
+        if not self.snapshot_file or not self.dirty:
+            return
+        data = {
+            'version': self.SNAPSHOT_VERSION,
+            'root': os.path.abspath(self.root),
+            'dirs': self.dirs,
+            'files': self.files
+        }
+        directory = os.path.dirname(os.path.abspath(self.snapshot_file))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory)
+        with os.fdopen(fd, "w", encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp, self.snapshot_file)
+        self.dirty = False
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+# /////////////////////////////////////////////////////////////////////////////
+# //
+# // pipeline.py
+# //
+# // parallel migration: probe & plan on the caller thread, artwork on a
+# // worker pool, copies to the device on writer threads
+# //
+# // 18/10/2026 11:58:40
+# // (c) 2026 Juan M. Casillas <juanm.casillas@gmail.com>
+# //
+# /////////////////////////////////////////////////////////////////////////////
+
+import os
+import sys
+import threading
+from contextlib import redirect_stdout
+
+
+class ByteBudget:
+    "counting semaphore in bytes. Keeps the memory of the files in flight bounded"
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.used = 0
+        self.cond = threading.Condition()
+
+    def acquire(self, size):
+        # a file bigger than the budget goes alone
+        size = min(size, self.limit)
+        with self.cond:
+            while self.used and self.used + size > self.limit:
+                self.cond.wait()
+            self.used += size
+        return size
+
+    def release(self, size):
+        with self.cond:
+            self.used -= size
+            self.cond.notify_all()
+
+
+class LineWriter:
+    "stdout of the pipeline: what each thread prints is written a whole line at a time, so the lines don't mix"
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.lock = threading.Lock()
+        # text of this thread after its last newline
+        self.local = threading.local()
+
+    def write(self, text):
+        pending = getattr(self.local, "pending", "") + text
+        end = pending.rfind("\n") + 1
+        if end:
+            with self.lock:
+                self.stream.write(pending[:end])
+        self.local.pending = pending[end:]
+        return len(text)
+
+    def flush(self):
+        pending = getattr(self.local, "pending", "")
+        self.local.pending = ""
+        with self.lock:
+            if pending:
+                self.stream.write(pending)
+            self.stream.flush()
+
+    def __getattr__(self, name):
+        # isatty, encoding...
+        return getattr(self.stream, name)
+
+
+class MigrationPipeline:
+    MAX_INFLIGHT = 64 * 1024 * 1024
+
+    def __init__(self, pm, jobs=None, io_jobs=2, max_inflight=MAX_INFLIGHT):
+        self.pm = pm
+        self.jobs = jobs or os.cpu_count() or 1
+        self.io_jobs = io_jobs or 1
+        self.budget = ByteBudget(max_inflight)
+
+    def migrate(self, playlist_data, from_dir_path, to_dir_path, use_hash=True, journal=None, copied=None):
+        "copy the files of playlist_data to the device, return the new playlist (same order as playlist_data)"
+        from concurrent.futures import ThreadPoolExecutor
+        pm = self.pm
+        new_playlist = []
+        scheduled = set()
+        pending = []
+
+        # the cpu pool is closed first, as its tasks submit the writes to the io pool
+        out = LineWriter(sys.stdout)
+        with redirect_stdout(out), ThreadPoolExecutor(self.io_jobs) as io_pool, ThreadPoolExecutor(self.jobs) as cpu_pool:
+            for item in playlist_data:
+                tgt_file = pm.resumed_copy(item, from_dir_path, copied)
+                if tgt_file:
+                    pm.skipped(pm.item_source(item, from_dir_path))
+                    item.file = pm.jam_music_entry_dir(tgt_file)
+                    new_playlist.append(item)
+                    continue
+
+                # tags and target are resolved here, in order, so the
+                # playlist (and the tag cache) are only touched by this thread
+                src_file, tgt_file, probe = pm.plan_track(item, from_dir_path, to_dir_path, use_hash)
+
+                if pm.verbose:
+                    print("copying %s -> %s" % (src_file, tgt_file))
+
+                if tgt_file not in scheduled and not os.path.exists(tgt_file) and \
+                    os.path.abspath(src_file) != os.path.abspath(tgt_file):
+                    scheduled.add(tgt_file)
+                    # waiting here means the writers are the bottleneck
+                    with pm.metrics.stage("budget wait"):
+                        charged = self.budget.acquire(os.path.getsize(src_file))
+                    plan_id = journal.plan("copy", src_file, tgt_file) if journal else None
+                    future = cpu_pool.submit(self.prepare, io_pool, src_file, tgt_file, probe, charged, journal, plan_id)
+                    pending.append((src_file, tgt_file, future))
+                else:
+                    # already there, or copied for an earlier entry
+                    pm.skipped(src_file)
+                    if os.path.exists(tgt_file):
+                        pm.metrics.count('files on device')
+                        pm.manifest_track(tgt_file, None, probe.cached)
+
+                item.file = pm.jam_music_entry_dir(tgt_file)
+                new_playlist.append(item)
+
+            errors = []
+            writes = []
+            for src_file, tgt_file, future in pending:
+                try:
+                    writes.append((src_file, tgt_file, future.result()))
+                except Exception as e:
+                    errors.append((src_file, e))
+            for src_file, tgt_file, future in writes:
+                try:
+                    future.result()
+                    # the index is only touched by this thread, and only for the files written
+                    pm.index_added(tgt_file)
+                except Exception as e:
+                    errors.append((src_file, e))
+
+        if errors:
+            for src_file, e in errors:
+                print("Error copying %s: %s" % (src_file, e))
+            raise errors[0][1]
+
+        return new_playlist
+
+    def prepare(self, io_pool, src_file, tgt_file, probe, charged, journal, plan_id):
+        try:
+            data = self.pm.prepare_track(src_file, probe)
+        except:
+            self.budget.release(charged)
+            raise
+        return io_pool.submit(self.write, src_file, tgt_file, data, charged, probe.cached, journal, plan_id)
+
+    def write(self, src_file, tgt_file, data, charged, info, journal, plan_id):
+        try:
+            if journal:
+                # write-ahead: the plan is on disk before the copy starts
+                journal.durable(plan_id)
+            self.pm.write_track(src_file, tgt_file, data=data, info=info)
+            if journal:
+                journal.done(plan_id)
+        finally:
+            self.budget.release(charged)
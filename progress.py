@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+# /////////////////////////////////////////////////////////////////////////////
+# //
+# // progress.py
+# //
+# // progress of the long copies (migrate, export) and moves (convert,
+# // revert): current file, files and bytes done, MB/s over the last
+# // seconds and ETA. A status line on a terminal, or a JSON line every
+# // few seconds when the output is a file or a pipe. The copy workers
+# // call it from their threads, once per chunk.
+# //
+# // 18/10/2026 21:24:05
+# // (c) 2026 Juan M. Casillas <juanm.casillas@gmail.com>
+# //
+# /////////////////////////////////////////////////////////////////////////////
+
+import os
+import sys
+import json
+import time
+import shutil
+import threading
+from collections import deque
+
+MB = 1024 * 1024
+MODES = ("auto", "bar", "lines", "none")
+
+
+def human_size(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return ("%d %s" if unit == "B" else "%.1f %s") % (size, unit)
+        size /= 1024.0
+
+
+def human_time(seconds):
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return "%d:%02d:%02d" % (seconds // 3600, seconds % 3600 // 60, seconds % 60)
+    return "%d:%02d" % (seconds // 60, seconds % 60)
+
+
+class Progress:
+    "files and bytes done of totals known ahead (see expect), drawn every interval seconds"
+
+    # MB/s and ETA over the last seconds
+    WINDOW = 10.0
+    BAR_INTERVAL = 0.2
+    LINES_INTERVAL = 5.0
+
+    def __init__(self, label="copying", mode="none", interval=None, stream=None, verbose=False):
+        if mode not in MODES:
+            raise ValueError("unknown progress mode %s (%s)" % (mode, ", ".join(MODES)))
+        self.stream = stream or sys.stderr
+        if mode == "auto":
+            # the verbose output would break the status line
+            tty = hasattr(self.stream, "isatty") and self.stream.isatty()
+            mode = "bar" if tty and not verbose else "lines"
+        self.mode = mode
+        self.label = label
+        self.interval = interval or (self.BAR_INTERVAL if mode == "bar" else self.LINES_INTERVAL)
+        self.lock = threading.Lock()
+        self.files = self.total_files = 0
+        self.bytes = self.total_bytes = 0
+        self.current = None
+        self.started = time.perf_counter()
+        self.last = self.started
+        # (time, bytes, files) samples for the rate
+        self.samples = deque([ (self.started, 0, 0) ])
+        self.width = 0
+
+    @property
+    def active(self):
+        "False if nothing is shown: callers can take the fast paths"
+        return self.mode != "none"
+
+    def expect(self, sizes):
+        "add files (their sizes) to the totals"
+        with self.lock:
+            for size in sizes:
+                self.total_files += 1
+                self.total_bytes += size
+
+    def skip(self, size):
+        "an expected file that doesn't need the work (e.g. already in the device)"
+        with self.lock:
+            self.total_files -= 1
+            self.total_bytes -= size
+        self.tick()
+
+    def start(self, name):
+        self.current = str(name)
+
+    def advance(self, nbytes):
+        with self.lock:
+            self.bytes += nbytes
+        self.tick()
+
+    def done(self, expected=0, written=0):
+        "a file finished: expected is its size in the totals, written what it took (e.g. after resizing the cover)"
+        with self.lock:
+            self.files += 1
+            self.total_bytes += written - expected
+        self.tick()
+
+    def rate(self, now):
+        "(bytes/s, files/s) over the window"
+        t0, bytes0, files0 = self.samples[0]
+        elapsed = now - t0
+        if elapsed <= 0:
+            return 0.0, 0.0
+        return (self.bytes - bytes0) / elapsed, (self.files - files0) / elapsed
+
+    def eta(self, now):
+        "seconds left, or None if there's no rate yet"
+        bytes_rate, files_rate = self.rate(now)
+        if self.total_bytes and bytes_rate > 0:
+            return max(0, self.total_bytes - self.bytes) / bytes_rate
+        if files_rate > 0:
+            return max(0, self.total_files - self.files) / files_rate
+        return None
+
+    def tick(self):
+        if self.mode == "none":
+            return
+        now = time.perf_counter()
+        if now - self.last < self.interval:
+            return
+        with self.lock:
+            if now - self.last < self.interval:
+                # other thread drew it
+                return
+            self.last = now
+            self.samples.append((now, self.bytes, self.files))
+            while len(self.samples) > 2 and now - self.samples[0][0] > self.WINDOW:
+                self.samples.popleft()
+            self.draw(now)
+
+    def status(self, now, finished=False):
+        bytes_rate, files_rate = self.rate(now) if not finished else (self.bytes / max(now - self.started, 1e-6), 0.0)
+        return {
+            'progress': self.label,
+            'files': self.files,
+            'total_files': self.total_files,
+            'bytes': self.bytes,
+            'total_bytes': self.total_bytes,
+            'mb_s': round(bytes_rate / MB, 2),
+            'eta': None if finished else self.eta(now),
+            'elapsed': round(now - self.started, 1),
+            'file': None if finished else self.current,
+            'done': finished
+        }
+
+    def draw(self, now, finished=False):
+        status = self.status(now, finished)
+        if self.mode == "lines":
+            if status['eta'] is not None:
+                status['eta'] = round(status['eta'], 1)
+            self.stream.write("%s\n" % json.dumps(status))
+            self.stream.flush()
+            return
+
+        line = "%s %d/%d files" % (self.label, status['files'], status['total_files'])
+        if status['total_bytes']:
+            line += ", %s of %s" % (human_size(status['bytes']), human_size(status['total_bytes']))
+        if status['bytes']:
+            line += ", %.1f MB/s" % status['mb_s']
+        if finished:
+            line += ", %s" % human_time(status['elapsed'])
+        elif status['eta'] is not None:
+            line += ", ETA %s" % human_time(status['eta'])
+        if status['file']:
+            line += "  %s" % os.path.basename(str(status['file']))
+        columns = shutil.get_terminal_size().columns - 1
+        line = line[:columns]
+        # pad over the longer line drawn before
+        self.stream.write("\r%s%s" % (line, " " * max(0, self.width - len(line))))
+        self.width = len(line)
+        if finished:
+            self.stream.write("\n")
+        self.stream.flush()
+
+    def close(self):
+        "draw the final state (if something was done)"
+        if self.mode == "none" or not (self.files or self.total_files):
+            return
+        with self.lock:
+            self.draw(time.perf_counter(), finished=True)
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+# /////////////////////////////////////////////////////////////////////////////
+# //
+# // tag_cache.py
+# //
+# // persistent tag/duration cache for the PlayListManager (sqlite)
+# //
+# // 18/10/2026 10:02:11
+# // (c) 2026 Juan M. Casillas <juanm.casillas@gmail.com>
+# //
+# /////////////////////////////////////////////////////////////////////////////
+
+import os
+import platform
+
+
+def user_cache_dir(appname="playlists"):
+    "return the per user cache directory for this platform"
+    system = platform.system()
+    if system == 'Darwin':
+        base = os.path.expanduser("~/Library/Caches")
+    elif system == 'Windows':
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~\\AppData\\Local")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(base, appname)
+
+
+class TagCache:
+    "store the tags, duration and artwork fingerprint of a file, keyed by (path, size, mtime_ns)"
+
+    SCHEMA_VERSION = 2
+    CACHE_FILE = "tags.sqlite"
+    COMMIT_EVERY = 500
+    FIELDS = ('title', 'artist', 'album', 'genre', 'duration', 'artwork', 'error', 'estimated')
+
+    def __init__(self, cache_file=None, rebuild=False, verbose=False):
+        self.verbose = verbose
+        if not cache_file:
+            cache_file = os.path.join(user_cache_dir(), self.CACHE_FILE)
+        self.cache_file = cache_file
+        self.hits = 0
+        self.misses = 0
+        self.pending = 0
+
+        cache_dir = os.path.dirname(os.path.abspath(cache_file))
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir, exist_ok=True)
+
+        # here, so importing the module (for user_cache_dir) doesn't load sqlite
+        import sqlite3
+        self.db = sqlite3.connect(cache_file)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.create_schema(rebuild)
+
+    def create_schema(self, rebuild=False):
+        version = self.db.execute("PRAGMA user_version").fetchone()[0]
+        if rebuild or version != self.SCHEMA_VERSION:
+            if self.verbose and (rebuild or version):
+                print("rebuilding tag cache: %s" % self.cache_file)
+            self.db.execute("DROP TABLE IF EXISTS tracks")
+
+        self.db.execute("""CREATE TABLE IF NOT EXISTS tracks (
+                            path TEXT PRIMARY KEY,
+                            size INTEGER NOT NULL,
+                            mtime_ns INTEGER NOT NULL,
+                            title TEXT,
+                            artist TEXT,
+                            album TEXT,
+                            genre TEXT,
+                            duration REAL,
+                            artwork TEXT,
+                            error TEXT,
+                            estimated INTEGER)""")
+        self.db.execute("PRAGMA user_version=%d" % self.SCHEMA_VERSION)
+        self.db.commit()
+
+    def key(self, music_file, st=None):
+        if st is None:
+            st = os.stat(music_file)
+        return os.path.abspath(music_file), st.st_size, st.st_mtime_ns
+
+    def get(self, music_file, st=None, estimated=False):
+        "return the cached info for music_file, or None if missing or stale. estimated: a fast probe duration will do"
+        try:
+            path, size, mtime_ns = self.key(music_file, st)
+        except OSError:
+            self.misses += 1
+            return None
+
+        row = self.db.execute("SELECT size, mtime_ns, %s FROM tracks WHERE path=?" % ", ".join(self.FIELDS),
+                              (path,)).fetchone()
+        if not row or row[0] != size or row[1] != mtime_ns:
+            self.misses += 1
+            return None
+        info = dict(zip(self.FIELDS, row[2:]))
+        if info['estimated'] and not estimated:
+            # parsed with --fast-probe, the duration may be off
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return info
+
+    def put(self, music_file, info, st=None):
+        try:
+            path, size, mtime_ns = self.key(music_file, st)
+        except OSError:
+            return
+
+        values = [ info.get(k) for k in self.FIELDS ]
+        self.db.execute("INSERT OR REPLACE INTO tracks (path, size, mtime_ns, %s) VALUES (?, ?, ?, %s)" %
+                        (", ".join(self.FIELDS), ", ".join("?" * len(self.FIELDS))),
+                        [path, size, mtime_ns] + values)
+        self.pending += 1
+        if self.pending >= self.COMMIT_EVERY:
+            self.commit()
+
+    def prune(self, directory):
+        "remove the entries of the files under directory that don't exist anymore, and compact the file. Returns how many"
+        # only under a directory we know is there: the files of an unmounted disk are still good
+        prefix = os.path.join(os.path.abspath(directory), "")
+        rows = self.db.execute("SELECT path FROM tracks WHERE path >= ? AND path < ?",
+                               (prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)))
+        gone = [ (p,) for (p,) in rows.fetchall() if not os.path.exists(p) ]
+        if not gone:
+            return 0
+        self.db.executemany("DELETE FROM tracks WHERE path=?", gone)
+        self.pending += len(gone)
+        self.commit()
+        self.db.execute("VACUUM")
+        if self.verbose:
+            print("tag cache: %d entries of files that don't exist removed" % len(gone))
+        return len(gone)
+
+    def commit(self):
+        if self.pending:
+            self.db.commit()
+            self.pending = 0
+
+    def close(self):
+        if self.db:
+            self.commit()
+            self.db.close()
+            self.db = None
+
+    def stats(self):
+        return "tag cache: %d hits, %d misses (%s)" % (self.hits, self.misses, self.cache_file)
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+# /////////////////////////////////////////////////////////////////////////////
+# //
+# // track.py
+# //
+# // one song of a playlist, as read from a m3u, a directory or the iTunes
+# // library and written to the jam. Slotted: an "all music" playlist keeps
+# // hundreds of thousands of them, a dict each was most of the memory.
+# //
+# // 18/10/2026 19:12:47
+# // (c) 2026 Juan M. Casillas <juanm.casillas@gmail.com>
+# //
+# /////////////////////////////////////////////////////////////////////////////
+
+
+class Track:
+    "title, file (as written in the playlist), path (native) and duration of a song"
+
+    __slots__ = ('title', 'file', 'path', 'duration', 'info', 'src')
+
+    def __init__(self, title, file, path=None, duration=None, info=None):
+        self.title = title
+        self.file = file
+        self.path = path if path is not None else file
+        self.duration = duration
+        # tags known without reading the file (iTunes library), else None
+        self.info = info
+        # absolute source file, while migrate-all joins the playlists
+        self.src = None
+
+    def copy(self, file=None):
+        "a new Track with the same song, pointing to file"
+        return Track(self.title, self.file if file is None else file, self.path, self.duration, self.info)
+
+    def __repr__(self):
+        return "Track(%r, %r, %r, %r)" % (self.title, self.file, self.path, self.duration)
@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+# /////////////////////////////////////////////////////////////////////////////
+# //
+# // track_probe.py
+# //
+# // parse the tags of a mp3 file once, and share the result
+# //
+# // 18/10/2026 10:41:36
+# // (c) 2026 Juan M. Casillas <juanm.casillas@gmail.com>
+# //
+# /////////////////////////////////////////////////////////////////////////////
+
+import hashlib
+from collections import deque
+from mp3_header import mp3_duration
+# mutagen and the process pool are imported when a file is parsed (or the
+# pool started): the listings import this module, and never parse
+
+# the keys of TrackProbe.info(), in the order probe_values sends them
+INFO_FIELDS = ('title', 'artist', 'album', 'genre', 'duration', 'artwork', 'error', 'estimated')
+# files a worker probes in one go
+CHUNK_FILES = 16
+
+
+class TrackProbe:
+    "lazy, single parse of a mp3 file: easy fields, duration and APIC payload"
+
+    # the EasyID3 keys we use, and the frame behind them
+    EASY_FRAMES = {
+        'title': 'TIT2',
+        'artist': 'TPE1',
+        'album': 'TALB',
+        'genre': 'TCON'
+    }
+
+    def __init__(self, music_file, fast=False):
+        self.music_file = music_file
+        # fast: only the tag and the MPEG headers are read (see mp3_header)
+        self.fast = fast
+        self.parsed = False
+        self.mp3file = None
+        self.id3 = None
+        self.length = None
+        # the duration was estimated from the MPEG headers (fast)
+        self.estimated = False
+        self.error = None
+        # info() of this file, as returned by the tag cache or the parse
+        self.cached = None
+
+    def parse(self):
+        if self.parsed:
+            return self
+        self.parsed = True
+        if self.fast and self.parse_fast():
+            self.estimated = True
+            return self
+        from mutagen.mp3 import MP3
+        from mutagen.id3 import ID3
+        try:
+            self.mp3file = MP3(self.music_file, ID3=ID3)
+        except Exception as e:
+            self.error = "Invalid MP3 file: %s" % e
+            return self
+
+        self.id3 = self.mp3file.tags
+        self.length = self.mp3file.info.length
+        if not self.mp3file.tags:
+            self.error = "Invalid ID3 tags: %s doesn't have an ID3 tag" % self.music_file
+        return self
+
+    def parse_fast(self):
+        "False if the file needs the full parse"
+        from mutagen.id3 import ID3, ID3NoHeaderError
+        try:
+            self.length = mp3_duration(self.music_file)
+            if self.length is None:
+                return False
+            self.id3 = ID3(self.music_file)
+        except ID3NoHeaderError:
+            self.error = "Invalid ID3 tags: %s doesn't have an ID3 tag" % self.music_file
+        except Exception:
+            # let the full parse tell what's wrong
+            self.length = None
+            return False
+        return True
+
+    @property
+    def tags(self):
+        self.parse()
+        return self.id3
+
+    @property
+    def duration(self):
+        self.parse()
+        return self.length
+
+    def easy(self, key, default=None):
+        "same value EasyID3 returns for key (first item), or default"
+        tags = self.tags
+        if not tags:
+            return default
+        frame = tags.get(self.EASY_FRAMES[key])
+        if not frame:
+            return default
+        values = frame.genres if key == 'genre' else frame.text
+        if len(values) < 1:
+            return default
+        return str(values[0])
+
+    @property
+    def apic(self):
+        "first APIC frame, or None"
+        tags = self.tags
+        if not tags:
+            return None
+        pictures = tags.getall("APIC")
+        if not pictures:
+            return None
+        return pictures[0]
+
+    @property
+    def artwork(self):
+        apic = self.apic
+        if not apic:
+            return None
+        return hashlib.sha1(apic.data).hexdigest()
+
+    def info(self):
+        "the data stored in the tag cache"
+        info = {
+            'duration': self.duration,
+            'artwork': self.artwork,
+            'error': self.error,
+            'estimated': self.estimated
+        }
+        for key in self.EASY_FRAMES.keys():
+            info[key] = self.easy(key)
+        return info
+
+    def save(self, music_file=None):
+        "write the (modified) tags to music_file, by default the probed one"
+        self.tags.save(music_file or self.music_file)
+
+
+def probe_values(music_file, fast=False):
+    "info() of music_file as a tuple of INFO_FIELDS (less to pickle back from a worker). Never raises"
+    try:
+        info = TrackProbe(music_file, fast).info()
+    except Exception as e:
+        info = dict.fromkeys(INFO_FIELDS)
+        info['error'] = "Can't read %s: %s" % (music_file, e)
+    return tuple(info[key] for key in INFO_FIELDS)
+
+
+def probe_chunk(files, fast=False):
+    "probe_values of each file, run in the worker"
+    return [ probe_values(music_file, fast) for music_file in files ]
+
+
+def probe_pool(files, jobs, fast=False, lookup=None, store=None):
+    """generator of (file, info) of the files (any iterable), in the same order. lookup(file) gives the
+    known info (tag cache) or None; the others are probed in chunks on a pool of jobs processes, a few
+    chunks ahead, and passed to store(file, info). lookup and store only run in the caller thread"""
+    from concurrent.futures import ProcessPoolExecutor
+    queue = deque()
+
+    def ready(block, future):
+        values = iter(future.result()) if future else None
+        for music_file, info in block:
+            if info is None:
+                info = dict(zip(INFO_FIELDS, next(values)))
+                if store:
+                    store(music_file, info)
+            yield music_file, info
+
+    with ProcessPoolExecutor(jobs) as pool:
+        try:
+            block, misses = [], []
+            for music_file in files:
+                info = lookup(music_file) if lookup else None
+                block.append((music_file, info))
+                if info is None:
+                    misses.append(music_file)
+                if len(misses) == CHUNK_FILES or len(block) == CHUNK_FILES * 4:
+                    queue.append((block, pool.submit(probe_chunk, misses, fast) if misses else None))
+                    block, misses = [], []
+                    while len(queue) > jobs * 2:
+                        yield from ready(*queue.popleft())
+            if block:
+                queue.append((block, pool.submit(probe_chunk, misses, fast) if misses else None))
+            while queue:
+                yield from ready(*queue.popleft())
+        finally:
+            # the caller stopped early
+            for block, future in queue:
+                if future:
+                    future.cancel()
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+# /////////////////////////////////////////////////////////////////////////////
+# //
+# // walker.py
+# //
+# // directory walker on os.scandir: the extension is checked on the name
+# // before anything is built, and the stat data comes from the DirEntry.
+# // Directories can be listed ahead on a thread pool, for slow mounts
+# // (the jam over USB, network shares).
+# //
+# // 18/10/2026 17:31:26
+# // (c) 2026 Juan M. Casillas <juanm.casillas@gmail.com>
+# //
+# /////////////////////////////////////////////////////////////////////////////
+
+import os
+from collections import namedtuple
+
+# rel is '/' separated, relative to the walked root. size and mtime_ns are None without stat
+FileRecord = namedtuple('FileRecord', ('rel', 'path', 'size', 'mtime_ns'))
+
+
+def scan_dir(directory, reldir, ext=None, stat=False):
+    "(files, subdirs) of one directory. Unreadable directories are empty, as in os.walk"
+    files = []
+    subdirs = []
+    try:
+        it = os.scandir(directory)
+    except OSError:
+        return files, subdirs
+    with it:
+        for entry in it:
+            name = entry.name
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                is_dir = False
+            if is_dir:
+                # like os.walk, symlinks to directories are not followed
+                if not entry.is_symlink():
+                    subdirs.append((entry.path, "%s/%s" % (reldir, name) if reldir else name))
+                continue
+            if ext and not name.lower().endswith(ext):
+                continue
+            rel = "%s/%s" % (reldir, name) if reldir else name
+            if stat:
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                files.append(FileRecord(rel, entry.path, st.st_size, st.st_mtime_ns))
+            else:
+                files.append(FileRecord(rel, entry.path, None, None))
+    return files, subdirs
+
+
+def walk_files(root, ext=None, sort=False, stat=False, jobs=1):
+    """generator of the FileRecord of the files under root. ext: tuple of lower case extensions.
+    sort: names in order, each directory before its subdirectories. jobs > 1 lists the directories ahead"""
+    if jobs > 1:
+        # only then: concurrent.futures is slow to import
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(jobs) as pool:
+            yield from walk(root, ext, sort, stat, pool)
+    else:
+        yield from walk(root, ext, sort, stat, None)
+
+
+def walk(root, ext, sort, stat, pool):
+    def scan(directory, reldir):
+        if pool:
+            return pool.submit(scan_dir, directory, reldir, ext, stat)
+        return (directory, reldir)
+
+    def result(pending):
+        if pool:
+            return pending.result()
+        return scan_dir(pending[0], pending[1], ext, stat)
+
+    stack = [ scan(root, "") ]
+    try:
+        while stack:
+            files, subdirs = result(stack.pop())
+            if sort:
+                files.sort()
+                subdirs.sort()
+            # all the subdirectories are listed (in the pool) while we go down the first one
+            stack.extend(scan(directory, reldir) for directory, reldir in reversed(subdirs))
+            yield from files
+    finally:
+        if pool:
+            # the caller stopped early
+            for pending in stack:
+                pending.cancel()
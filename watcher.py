@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+# /////////////////////////////////////////////////////////////////////////////
+# //
+# // watcher.py
+# //
+# // changes of files under some paths (playlist folders, music roots), for
+# // the watch command: inotify on linux (through ctypes, no module to
+# // install), else polling, comparing the size and mtime of the files
+# // every few seconds. The changes come in batches: a burst (iTunes
+# // exporting 30 playlists, a tagger saving a whole album) is waited for
+# // until the paths are quiet for a while.
+# //
+# // 18/10/2026 23:08:40
+# // (c) 2026 Juan M. Casillas <juanm.casillas@gmail.com>
+# //
+# /////////////////////////////////////////////////////////////////////////////
+
+import os
+import sys
+import time
+import struct
+import select
+from walker import walk_files, scan_dir
+
+
+def watched_dirs(paths):
+    "[(directory, recursive)] to watch for paths: a directory and its subdirectories, or the directory of a file"
+    dirs = {}
+    for path in paths:
+        path = os.path.abspath(path)
+        if os.path.isdir(path):
+            dirs[path] = True
+        else:
+            dirs.setdefault(os.path.dirname(path), False)
+    return list(dirs.items())
+
+
+class PollWatcher:
+    "size and mtime of every file under the paths, compared each interval seconds"
+
+    INTERVAL = 2.0
+
+    def __init__(self, paths, interval=None):
+        self.dirs = watched_dirs(paths)
+        self.interval = interval or self.INTERVAL
+        self.files = self.scan()
+        self.last = time.monotonic()
+
+    def scan(self):
+        files = {}
+        for directory, recursive in self.dirs:
+            records = walk_files(directory, stat=True) if recursive else scan_dir(directory, "", stat=True)[0]
+            for record in records:
+                files[record.path] = (record.size, record.mtime_ns)
+        return files
+
+    def changes(self, timeout=None):
+        "the paths changed (added, modified, removed) since the last call, waiting up to timeout seconds for some"
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self.last + self.interval - time.monotonic()
+            if deadline is not None:
+                wait = min(wait, deadline - time.monotonic())
+            if wait > 0:
+                time.sleep(wait)
+            if time.monotonic() >= self.last + self.interval:
+                self.last = time.monotonic()
+                files = self.scan()
+                changed = { path for path in files.keys() | self.files.keys() if files.get(path) != self.files.get(path) }
+                self.files = files
+                if changed:
+                    return changed
+            if deadline is not None and time.monotonic() >= deadline:
+                return set()
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    "inotify watches on the directories under the paths (new directories are watched as they show up)"
+
+    # inotify(7). Here, as os.O_NONBLOCK (used by __init__) only exists in posix
+    IN_ATTRIB = 0x00000004
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_DELETE_SELF = 0x00000400
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ISDIR = 0x40000000
+    IN_CLOEXEC = 0o2000000
+    EVENT = struct.Struct("iIII")
+    MASK = IN_CLOSE_WRITE | IN_ATTRIB | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+
+    def __init__(self, paths):
+        import ctypes
+        import ctypes.util
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.add_watch = libc.inotify_add_watch
+        self.add_watch.argtypes = [ ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32 ]
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | self.IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.get_errno = ctypes.get_errno
+        # watch descriptor -> (directory, recursive)
+        self.watches = {}
+        self.dirs = watched_dirs(paths)
+        try:
+            for directory, recursive in self.dirs:
+                if recursive:
+                    self.watch_tree(directory)
+                else:
+                    self.watch(directory, False)
+        except OSError:
+            self.close()
+            raise
+
+    def watch(self, directory, recursive=True):
+        wd = self.add_watch(self.fd, os.fsencode(directory), self.MASK)
+        if wd < 0:
+            # ENOSPC: fs.inotify.max_user_watches is too low for the tree
+            raise OSError(self.get_errno(), "can't watch %s" % directory)
+        # a directory given and the parent of a file given may be the same: recursive wins
+        self.watches[wd] = (directory, recursive or self.watches.get(wd, (None, False))[1])
+
+    def watch_tree(self, directory):
+        self.watch(directory)
+        for root, subdirs, files in os.walk(directory):
+            for subdir in subdirs:
+                self.watch(os.path.join(root, subdir))
+
+    def read_events(self):
+        "paths of the events waiting in the queue"
+        changed = set()
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return changed
+        offset = 0
+        while offset < len(data):
+            wd, mask, cookie, length = self.EVENT.unpack_from(data, offset)
+            offset += self.EVENT.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+            if mask & self.IN_Q_OVERFLOW:
+                # events were lost: everything may have changed
+                changed.update(directory for directory, recursive in self.dirs)
+                continue
+            if mask & self.IN_IGNORED:
+                self.watches.pop(wd, None)
+                continue
+            if wd not in self.watches:
+                continue
+            directory, recursive = self.watches[wd]
+            path = os.path.join(directory, name) if name else directory
+            if mask & self.IN_ISDIR:
+                if not recursive:
+                    continue
+                if mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                    # files copied into it before the watch are missed: the whole directory counts as changed
+                    self.watch_tree(path)
+                    changed.add(path)
+                elif mask & (self.IN_DELETE | self.IN_MOVED_FROM):
+                    changed.add(path)
+                continue
+            changed.add(path)
+        return changed
+
+    def changes(self, timeout=None):
+        "the paths changed since the last call, waiting up to timeout seconds for some"
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = None if deadline is None else max(0, deadline - time.monotonic())
+            ready, _, _ = select.select([ self.fd ], [], [], wait)
+            if ready:
+                changed = self.read_events()
+                if changed:
+                    return changed
+            elif deadline is not None:
+                return set()
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+def open_watcher(paths, poll=False, interval=None, verbose=False):
+    "an InotifyWatcher if the platform has it (and not poll), else a PollWatcher"
+    if not poll and sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(paths)
+        except (OSError, AttributeError) as e:
+            if verbose:
+                print("inotify not available (%s), polling every %.1fs" % (e, interval or PollWatcher.INTERVAL))
+    return PollWatcher(paths, interval)
+
+
+def batches(watcher, debounce=1.0):
+    "generator of the sets of paths changed in each burst: after a change, until debounce seconds without changes"
+    # polling, a burst is over when a scan finds nothing new
+    quiet = max(debounce, getattr(watcher, "interval", 0))
+    while True:
+        changed = watcher.changes()
+        while True:
+            more = watcher.changes(quiet)
+            if not more:
+                break
+            changed |= more
+        yield changed